@@ -0,0 +1,116 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import zzz_download
+from zzz_http import HttpClient
+
+# ================= 分段下载基准测试 =================
+# 用法: python bench_download.py [文件大小MB] [单连接限速MB/s]
+# 在本地起一个支持 Range 的模拟下载服务器，每个连接单独限速 (模拟网盘 CDN 的单连接限速)，
+# 分别用 1 段 (单连接) 和多段下载同一个文件，比较吞吐并校验内容。
+# 每次运行把结果追加到 data/bench_download.jsonl。
+
+HISTORY_FILE = "data/bench_download.jsonl"
+DEFAULT_SIZE_MB = 64
+DEFAULT_RATE_MB = 8  # 单连接限速 MB/s
+SEGMENT_COUNTS = (1, 4, 8)
+SEND_CHUNK = 64 * 1024
+
+FILE_DATA = b""
+RATE = DEFAULT_RATE_MB * 1024 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        start, end = 0, len(FILE_DATA) - 1
+        status = 200
+        m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if m:
+            start = int(m.group(1))
+            end = int(m.group(2)) if m.group(2) else end
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", '"bench"')
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(FILE_DATA)}")
+        self.end_headers()
+        # 按单连接限速发送
+        began = time.monotonic()
+        sent = 0
+        try:
+            for pos in range(start, end + 1, SEND_CHUNK):
+                chunk = FILE_DATA[pos:min(pos + SEND_CHUNK, end + 1)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                ahead = sent / RATE - (time.monotonic() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+        except OSError:
+            # 分段下载只读响应头就关闭的首个请求
+            self.close_connection = True
+
+
+def run(base_url, work_dir, segments):
+    dest = os.path.join(work_dir, f"bench_{segments}.bin")
+    client = HttpClient(max_per_host=max(segments, 1) + 1, timeout=60)
+    start = time.perf_counter()
+    size = zzz_download.download_file(client, base_url + "/bench.bin", dest, segments=segments)
+    elapsed = time.perf_counter() - start
+    with open(dest, "rb") as f:
+        ok = f.read() == FILE_DATA
+    os.remove(dest)
+    return elapsed, size, ok
+
+
+def main():
+    global FILE_DATA, RATE
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE_MB
+    rate_mb = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RATE_MB
+    FILE_DATA = os.urandom(size_mb * 1024 * 1024)
+    RATE = rate_mb * 1024 * 1024
+    # 保证测试文件一定走分段逻辑
+    zzz_download.SEGMENT_THRESHOLD = min(zzz_download.SEGMENT_THRESHOLD, len(FILE_DATA))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    work_dir = tempfile.mkdtemp(prefix="bench_download_")
+    print(f"[Bench] 文件 {size_mb} MB | 单连接限速 {rate_mb:g} MB/s")
+
+    record = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "mb": size_mb, "rate_mb_s": rate_mb}
+    baseline = None
+    try:
+        for segments in SEGMENT_COUNTS:
+            elapsed, size, ok = run(base_url, work_dir, segments)
+            speed = size / 1048576 / elapsed
+            baseline = baseline or elapsed
+            print(f"  segments={segments:<3} {elapsed:7.2f} s | {speed:7.1f} MB/s | 加速 {baseline / elapsed:5.2f}x | 校验 {'OK' if ok else 'FAIL'}")
+            record[f"seg{segments}_mb_s"] = round(speed, 2)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    try:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"[Bench Warn] 结果写入失败: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+from zzz_link_extract import extract_cloud_info
+
+# ================= 云盘链接提取基准测试 =================
+# 用法: python bench_link_extract.py [语料目录]
+# 语料目录下的 .html / .txt 文件视为保存下来的文章正文 (如 page.content() 的输出)；
+# 各爬虫运行时会把抓到的正文存到 ARTICLE_CORPUS_DIR (默认 DATA_DIR/article_corpus)，可直接作为语料目录；
+# 目录不存在或为空时使用内置的合成语料。
+# 每次运行把结果追加到 data/bench_link_extract.jsonl，便于跟踪每 MB 的提取耗时。
+
+DEFAULT_CORPUS_DIR = "data/article_corpus"
+HISTORY_FILE = "data/bench_link_extract.jsonl"
+REPEAT = 5  # 每种实现重复次数，取最快一次
+
+# 合成语料片段
+SYNTH_SNIPPETS = [
+    '<p>绝区零全新壁纸分享！下载地址：<a href="https://minas.mihoyo.com/s/{id}">https://minas.mihoyo.com/s/{id}</a>，提取码：<b>{code}</b></p>',
+    '<div class="text">百度网盘 https://pan.baidu.com/s/1{id} 提取码: {code}</div>',
+    '<p>阿里云盘：https://www.alipan.com/s/{id} 访问码：{code}</p>',
+    '<p>夸克 https://pan.quark.cn/s/{id} 密码 : {code}</p>',
+    '<p>活动说明：参与活动即可获得丰厚奖励，详情请查看 <a href="https://zzz.mihoyo.com/news/{id}">官网公告</a>。</p>',
+    '<img src="https://upload-bbs.miyoushe.com/upload/2024/01/01/{id}.png" />',
+    '<p>代理人们好！本期版本更新内容包括新角色、新邦布以及全新的主线剧情，敬请期待。</p>' * 4,
+]
+
+
+def legacy_extract(text):
+    """旧实现 (滚动爬虫的 extract_cloud_info_from_text)，仅用于对比"""
+    pan_domains = [
+        r"pan\.baidu\.com/s/[\w-]+",
+        r"yun\.baidu\.com/s/[\w-]+",
+        r"aliyundrive\.com/s/[\w-]+",
+        r"alipan\.com/s/[\w-]+",
+        r"cloud\.189\.cn/t/[\w-]+",
+        r"lanzou\w?\.com/[\w]+",
+        r"quark\.cn/s/[\w-]+",
+        r"123pan\.com/s/[\w-]+"
+    ]
+    urls = re.findall(r"https?://[^\s\"')<>]+", text)
+    minas_links = [u for u in urls if "minas.mihoyo.com" in u]
+    other_links = []
+    for u in urls:
+        for domain_pat in pan_domains:
+            if re.search(domain_pat, u):
+                other_links.append(u)
+                break
+    codes = []
+    code_patterns = [
+        r"(?:密码|提取码|访问码|口令)\s*[:：]\s*([A-Za-z0-9]{4,})",
+        r"(?:code)\s*[:：]\s*([A-Za-z0-9]{4,})"
+    ]
+    for pat in code_patterns:
+        codes.extend(re.findall(pat, text))
+    return list(set(minas_links + other_links)), list(set(codes))
+
+
+def load_corpus(corpus_dir):
+    docs = []
+    if os.path.isdir(corpus_dir):
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.endswith((".html", ".txt")):
+                with open(os.path.join(corpus_dir, name), "r", encoding="utf-8", errors="ignore") as f:
+                    docs.append(f.read())
+    return docs
+
+
+def build_synthetic_corpus(doc_count=300, snippets_per_doc=60):
+    rng = random.Random(42)
+    docs = []
+    for _ in range(doc_count):
+        parts = []
+        for _ in range(snippets_per_doc):
+            snippet = rng.choice(SYNTH_SNIPPETS)
+            parts.append(snippet.format(id=rng.randrange(10 ** 8), code="".join(rng.choice("abcdefgh23456789") for _ in range(4))))
+        docs.append("\n".join(parts))
+    return docs
+
+
+def run(func, docs):
+    best = None
+    found = 0
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        found = 0
+        for doc in docs:
+            links, _ = func(doc)
+            found += len(links)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, found
+
+
+def main():
+    corpus_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS_DIR
+    docs = load_corpus(corpus_dir)
+    source = corpus_dir
+    if not docs:
+        docs = build_synthetic_corpus()
+        source = "synthetic"
+    size_mb = sum(len(d.encode("utf-8")) for d in docs) / (1024 * 1024)
+    print(f"[Bench] 语料: {source} | 文档 {len(docs)} 篇 | {size_mb:.2f} MB")
+
+    record = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "corpus": source, "docs": len(docs), "mb": round(size_mb, 3)}
+    for name, func in (("extract_cloud_info", extract_cloud_info), ("legacy", legacy_extract)):
+        elapsed, found = run(func, docs)
+        ms_per_mb = elapsed * 1000 / size_mb if size_mb else 0
+        print(f"  {name:<20} {elapsed * 1000:8.1f} ms | {ms_per_mb:7.1f} ms/MB | 链接 {found}")
+        record[name + "_ms_per_mb"] = round(ms_per_mb, 2)
+
+    try:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"[Bench Warn] 结果写入失败: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import io
+import os
+import sys
+import json
+import shutil
+import zipfile
+import tempfile
+import zzz_download
+from zzz_extract import extract_zip
+from zzz_http import HttpClient
+from share_stub_server import StubShareServer, SHARE_TOKEN
+
+# ================= 下载引擎自检 =================
+# 用法: python check_download.py
+# 在本地起模拟分享服务器 (share_stub_server.py)，不依赖 Playwright 和真实网盘，逐项检查 zzz_download：
+#   普通下载 (Cookie 校验 + 跨 host 重定向 + Content-Disposition 文件名)、传输中断后续传、
+#   上次运行留下 .part 时续传、分段下载、404 失败、只有 ZIP 的分享解压后重跑跳过。任一项失败时以退出码 1 结束。
+
+SMALL_SIZE = 3 * 1024 * 1024
+BIG_SIZE = 8 * 1024 * 1024
+
+
+def check_plain(server, client, work_dir):
+    headers = {"Cookie": f"share_token={SHARE_TOKEN}"}
+    name, size = zzz_download.download_to_dir(client, server.share_url("plain.png"), work_dir, headers=headers)
+    with open(os.path.join(work_dir, name), "rb") as f:
+        assert f.read() == server.files["plain.png"], "内容不一致"
+    assert name == "plain.png" and size == SMALL_SIZE, f"文件名 / 大小不对: {name} {size}"
+    cdn = server.requests_for("/cdn/plain.png")
+    assert cdn and all("Cookie" not in h for _, h in cdn), "跨 host 重定向后仍携带了 Cookie"
+    assert not os.path.exists(os.path.join(work_dir, name + ".part")), "遗留 .part"
+
+
+def check_forbidden(server, client, work_dir):
+    try:
+        zzz_download.download_to_dir(client, server.share_url("plain.png"), work_dir)
+    except RuntimeError as e:
+        assert "403" in str(e), e
+        return
+    raise AssertionError("没有 Cookie 时应失败")
+
+
+def check_resume_after_drop(server, client, work_dir):
+    headers = {"Cookie": f"share_token={SHARE_TOKEN}"}
+    server.drop_after("drop.zip", SMALL_SIZE // 3)
+    dest = os.path.join(work_dir, "drop.zip")
+    size = zzz_download.download_file(client, server.share_url("drop.zip"), dest, headers=headers, segments=1)
+    with open(dest, "rb") as f:
+        assert f.read() == server.files["drop.zip"], "续传后内容不一致"
+    ranged = [h.get("Range") for _, h in server.requests_for("/cdn/drop.zip") if h.get("Range")]
+    assert size == SMALL_SIZE and ranged, f"没有按 Range 续传: {ranged}"
+
+
+def check_resume_from_part(server, client, work_dir):
+    """模拟上次运行中断：留下前一半的 .part 和 sidecar"""
+    data = server.files["resume.mp4"]
+    dest = os.path.join(work_dir, "resume.mp4")
+    url = server.share_url("resume.mp4")
+    with open(dest + ".part", "wb") as f:
+        f.write(data[:len(data) // 2])
+    with open(dest + ".part.json", "w", encoding="utf-8") as f:
+        json.dump({"url": url, "size": len(data), "etag": f'"resume.mp4-{len(data)}"', "last_modified": None}, f)
+    headers = {"Cookie": f"share_token={SHARE_TOKEN}"}
+    zzz_download.download_file(client, url, dest, headers=headers, segments=1)
+    with open(dest, "rb") as f:
+        assert f.read() == data, "续传后内容不一致"
+    ranged = [h.get("Range") for _, h in server.requests_for("/cdn/resume.mp4")]
+    assert ranged == [f"bytes={len(data) // 2}-"], f"应只请求后一半: {ranged}"
+
+
+def check_segments(server, client, work_dir):
+    headers = {"Cookie": f"share_token={SHARE_TOKEN}"}
+    dest = os.path.join(work_dir, "big.zip")
+    zzz_download.download_file(client, server.share_url("big.zip"), dest, headers=headers, segments=4)
+    with open(dest, "rb") as f:
+        assert f.read() == server.files["big.zip"], "分段下载内容不一致"
+    ranged = [h.get("Range") for _, h in server.requests_for("/cdn/big.zip") if h.get("Range")]
+    assert len(ranged) == 4, f"应分 4 段: {ranged}"
+
+
+def check_not_found(server, client, work_dir):
+    try:
+        zzz_download.download_to_dir(client, server.base_url + "/share/missing.png", work_dir)
+    except RuntimeError as e:
+        assert "404" in str(e), e
+        return
+    raise AssertionError("404 时应失败")
+
+
+def make_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def check_zip_rerun(server, client, work_dir):
+    """与爬虫的 ZIP 流程相同：下载 -> 解压 -> 记下 ZIP 信息 -> 删除 ZIP；远程未变时重跑不再下载，变化后重新下载"""
+    headers = {"Cookie": f"share_token={SHARE_TOKEN}"}
+    url = server.share_url("pack.zip")
+    zip_dir = os.path.join(work_dir, "pack")
+    os.makedirs(zip_dir)
+    remote = zzz_download.remote_stamp(client, url, headers)
+    assert remote["size"] == len(server.files["pack.zip"]) and remote["etag"], f"远程信息不对: {remote}"
+    name, _ = zzz_download.download_to_dir(client, url, zip_dir, headers=headers)
+    zip_path = os.path.join(zip_dir, name)
+    extract_zip(zip_path, zip_dir)
+    zzz_download.save_zip_stamp(zip_path, zip_dir, remote)
+    os.remove(zip_path)
+
+    members = zzz_download.zip_unchanged(zip_dir, remote=zzz_download.remote_stamp(client, url, headers))
+    assert sorted(members or []) == ["a.png", "sub/b.png"], f"远程未变化时应跳过: {members}"
+    assert zzz_download.zip_unchanged(zip_dir, name="pack.zip") and not zzz_download.zip_unchanged(zip_dir, name="other.zip")
+    os.remove(os.path.join(zip_dir, "sub", "b.png"))
+    assert zzz_download.zip_unchanged(zip_dir, name="pack.zip") is None, "成员缺失时不应跳过"
+    with open(os.path.join(zip_dir, "sub", "b.png"), "wb") as f:
+        f.write(b"B" * 2000)
+    server.files["pack.zip"] = make_zip({"a.png": b"A" * 1000, "sub/b.png": b"B" * 3000})
+    assert zzz_download.zip_unchanged(zip_dir, remote=zzz_download.remote_stamp(client, url, headers)) is None, "远程 ZIP 变化后不应跳过"
+
+
+CHECKS = [
+    ("普通下载 + 跨 host 重定向", check_plain),
+    ("缺少 Cookie 时 403", check_forbidden),
+    ("传输中断后续传", check_resume_after_drop),
+    ("从上次的 .part 续传", check_resume_from_part),
+    ("分段下载", check_segments),
+    ("404", check_not_found),
+    ("只有 ZIP 的分享重跑跳过", check_zip_rerun),
+]
+
+
+def main():
+    files = {name: os.urandom(SMALL_SIZE) for name in ("plain.png", "drop.zip", "resume.mp4")}
+    files["big.zip"] = os.urandom(BIG_SIZE)
+    files["pack.zip"] = make_zip({"a.png": b"A" * 1000, "sub/b.png": b"B" * 2000})
+    zzz_download.SEGMENT_THRESHOLD = BIG_SIZE  # 只让 big.zip 走分段
+    server = StubShareServer(files).start()
+    client = HttpClient(max_per_host=8, timeout=10)
+    work_dir = tempfile.mkdtemp(prefix="check_download_")
+    failed = 0
+    try:
+        for title, check in CHECKS:
+            try:
+                check(server, client, work_dir)
+                print(f"[Check] OK   {title}")
+            except Exception as e:
+                failed += 1
+                print(f"[Check] FAIL {title}: {e!r}")
+    finally:
+        client.close()
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"[Check] {len(CHECKS) - failed}/{len(CHECKS)} 通过")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
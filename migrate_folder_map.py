@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+from zzz_link_extract import canonical_cloud_url
+from zzz_verify import MANIFEST_NAME, write_manifest
+
+# ================= folder_map.json 一次性迁移 =================
+# 用法: python migrate_folder_map.py <folder_map.json> [...] [--apply]
+# 旧版本按原始写法记录云盘链接 (http/https、子域名、?pwd=、结尾 / 等)，同一个分享可能占了好几个条目和文件夹。
+# 本脚本按 canonical_cloud_url 把条目分组：
+#   * 每组选一个主文件夹 (优先本地已有文件且文件最多的)，其余文件夹里的文件移入主文件夹：
+#     同名同大小的视为同一文件直接丢弃，同名不同大小的改名为 "名称 (2).ext" 保留
+#   * 搬空的重复文件夹删除，提取码合并 (主条目没有时取其他条目记下的)，条目改用规范 key
+# 默认只打印计划 (dry run)，加 --apply 才执行；写回前先备份为 folder_map.json.bak。
+# 重复文件夹的 .checksums.json 直接丢弃，合并后重新生成主文件夹的清单 (增量：原有文件不重新哈希)。
+
+SKIP_NAMES = (MANIFEST_NAME, ".zip_source.json")
+
+
+def count_files(path):
+    if not path or not os.path.isdir(path):
+        return 0
+    return sum(len(names) for _, _, names in os.walk(path))
+
+
+def load_map(map_file):
+    with open(map_file, "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+    # 兼容旧格式：值直接是路径字符串
+    return {k: (v if isinstance(v, dict) else {"path": v}) for k, v in mapping.items()}
+
+
+def group_entries(mapping):
+    """{规范 key: [(原 key, 条目)]}，保持原顺序；条目记有原始链接 (url) 时按它分组"""
+    groups = {}
+    for key, entry in mapping.items():
+        groups.setdefault(canonical_cloud_url(entry.get("url") or key), []).append((key, entry))
+    return groups
+
+
+def pick_primary(entries):
+    """主条目：本地文件最多的；都没有文件时取第一个有路径的"""
+    with_path = [e for e in entries if e[1].get("path")]
+    if not with_path:
+        return entries[0]
+    return max(with_path, key=lambda e: count_files(e[1]["path"]))
+
+
+def _free_name(path):
+    root, ext = os.path.splitext(path)
+    n = 2
+    while os.path.exists(f"{root} ({n}){ext}"):
+        n += 1
+    return f"{root} ({n}){ext}"
+
+
+def merge_folder(src, dest, apply, stats):
+    """把 src 里的文件移入 dest (保持相对路径)，返回是否已搬空"""
+    for root, _, names in os.walk(src):
+        for name in names:
+            src_path = os.path.join(root, name)
+            if name in SKIP_NAMES:
+                if apply:
+                    os.remove(src_path)
+                continue
+            dest_path = os.path.join(dest, os.path.relpath(src_path, src))
+            if os.path.exists(dest_path):
+                if os.path.getsize(dest_path) == os.path.getsize(src_path):
+                    stats["duplicates"] += 1
+                    print(f"    [重复] {src_path}")
+                    if apply:
+                        os.remove(src_path)
+                    continue
+                dest_path = _free_name(dest_path)
+                stats["renamed"] += 1
+                print(f"    [改名] {src_path} -> {dest_path}")
+            else:
+                stats["moved"] += 1
+            if apply:
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                shutil.move(src_path, dest_path)
+    if not apply:
+        return False
+    # 自底向上删除空目录
+    for root, _, _ in sorted(os.walk(src), key=lambda w: -len(w[0])):
+        try: os.rmdir(root)
+        except OSError: pass
+    return not os.path.exists(src)
+
+
+def migrate(map_file, apply=False):
+    mapping = load_map(map_file)
+    groups = group_entries(mapping)
+    stats = {"merged_keys": 0, "moved": 0, "duplicates": 0, "renamed": 0, "removed_dirs": 0, "manifests": 0}
+    new_map = {}
+    for key, entries in groups.items():
+        primary_key, primary = pick_primary(entries)
+        merged = dict(primary)
+        # 旧 key 就是原始链接，改用规范 key 后记下来，补下时用它打开
+        merged.setdefault("url", primary_key)
+        if len(entries) > 1 or primary_key != key:
+            print(f"[Migrate] {key}")
+            for old_key, entry in entries:
+                print(f"    {'*' if old_key == primary_key else ' '} {old_key} -> {entry.get('path')}")
+        if merged.get("pwd") is None:
+            merged.pop("pwd", None)
+            pwds = [e.get("pwd") for _, e in entries if e.get("pwd") is not None]
+            if pwds:
+                merged["pwd"] = pwds[0]
+        dest = primary.get("path")
+        merged_dirs = 0
+        for old_key, entry in entries:
+            if old_key == primary_key:
+                continue
+            stats["merged_keys"] += 1
+            path = entry.get("path")
+            if not path or not dest or os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(dest)):
+                continue
+            if os.path.isdir(path):
+                if apply:
+                    os.makedirs(dest, exist_ok=True)
+                merged_dirs += 1
+                if merge_folder(path, dest, apply, stats):
+                    stats["removed_dirs"] += 1
+        if apply and merged_dirs and os.path.isdir(dest):
+            hashed = write_manifest(dest)
+            stats["manifests"] += 1
+            print(f"    [清单] 已更新 {dest}{os.sep}{MANIFEST_NAME} (新哈希 {hashed} 个文件)")
+        new_map[key] = merged
+
+    print(f"[Migrate] {map_file}: {len(mapping)} 个条目 -> {len(new_map)} 个 | 合并 {stats['merged_keys']} 个重复链接 | "
+          f"移动 {stats['moved']} 个文件, 重复丢弃 {stats['duplicates']} 个, 改名 {stats['renamed']} 个 | "
+          f"删除空文件夹 {stats['removed_dirs']} 个, 更新清单 {stats['manifests']} 个")
+    if not apply:
+        print("[Migrate] dry run，未做任何修改；确认无误后加 --apply 执行")
+        return stats
+    shutil.copy2(map_file, map_file + ".bak")
+    with open(map_file, "w", encoding="utf-8") as f:
+        json.dump(new_map, f, indent=2, ensure_ascii=False)
+    print(f"[Migrate] 已写回 {map_file} (备份: {map_file}.bak)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按规范化的云盘链接合并 folder_map.json 中的重复条目")
+    parser.add_argument("map_files", nargs="+", metavar="FOLDER_MAP", help="folder_map.json 路径，可传多个")
+    parser.add_argument("--apply", action="store_true", help="执行迁移 (默认只打印计划)")
+    args = parser.parse_args()
+
+    failed = False
+    for map_file in args.map_files:
+        try:
+            migrate(map_file, args.apply)
+        except (OSError, ValueError) as e:
+            print(f"[Migrate Error] {map_file}: {e}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
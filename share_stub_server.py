@@ -0,0 +1,138 @@
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+# ================= 本地模拟分享服务器 =================
+# 不依赖真实网盘检验 zzz_download (见 check_download.py)，模拟网盘下载链路的几个关键行为：
+#   /share/<名称>  需要 Cookie share_token=<token>，否则 403；通过后 302 跳到 CDN 地址
+#                  (CDN 用另一个 host 名 localhost，检验跨 host 重定向不再携带 Cookie)
+#   /cdn/<名称>    返回文件内容，支持 Range / If-Range，带 ETag 与 Content-Disposition 文件名
+#   其他路径       404
+# drop_after(名称, 字节数) 让下一次该文件的响应发到指定字节数后断开连接，用于检验续传。
+
+SHARE_TOKEN = "stub-token"
+SEND_CHUNK = 64 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _empty(self, status, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        stub.log(self.path, self.headers)
+        m = re.match(r"/(share|cdn)/([^/]+)$", parts.path)
+        if not m or m.group(2) not in stub.files:
+            return self._empty(404)
+        kind, name = m.groups()
+        if kind == "share":
+            if f"share_token={SHARE_TOKEN}" not in self.headers.get("Cookie", ""):
+                return self._empty(403)
+            return self._empty(302, {"Location": f"{stub.cdn_url}/cdn/{name}?sig=1"})
+        if dict(parse_qsl(parts.query)).get("sig") != "1":
+            return self._empty(403)
+        self._send_file(name, stub.files[name])
+
+    def _send_file(self, name, data):
+        stub = self.server.stub
+        etag = f'"{name}-{len(data)}"'
+        start, end, status = 0, len(data) - 1, 200
+        m = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if m and (if_range is None or if_range == etag):
+            start = int(m.group(1))
+            end = int(m.group(2)) if m.group(2) else end
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+
+        drop = stub.take_drop(name)
+        sent = 0
+        try:
+            for pos in range(start, end + 1, SEND_CHUNK):
+                if drop is not None and sent >= drop:
+                    # 模拟传输中途断线
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                chunk = data[pos:min(pos + SEND_CHUNK, end + 1)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        except OSError:
+            # 客户端提前关闭 (如分段下载只读响应头的首个请求)
+            self.close_connection = True
+
+
+class StubShareServer:
+    """
+    用法:
+        server = StubShareServer({"a.zip": b"..."}).start()
+        url = server.share_url("a.zip")   # 带 Cookie: share_token=SHARE_TOKEN 访问
+        server.stop()
+    """
+    def __init__(self, files):
+        self.files = dict(files)
+        self.requests = []  # [(路径, 请求头 dict)]
+        self._drops = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def cdn_url(self):
+        return f"http://localhost:{self.port}"
+
+    def share_url(self, name):
+        return f"{self.base_url}/share/{name}"
+
+    def drop_after(self, name, nbytes):
+        with self._lock:
+            self._drops[name] = nbytes
+
+    def take_drop(self, name):
+        with self._lock:
+            return self._drops.pop(name, None)
+
+    def log(self, path, headers):
+        with self._lock:
+            self.requests.append((path, dict(headers)))
+
+    def requests_for(self, prefix):
+        with self._lock:
+            return [(p, h) for p, h in self.requests if p.startswith(prefix)]
@@ -1,12 +1,12 @@
 import os
-import re
 import json
 import time
-import random
-import urllib.request
-import urllib.parse
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from zzz_http import HttpClient, ResponseCache
+from zzz_link_extract import extract_cloud_pairs, canonical_cloud_url, save_article_sample
+from zzz_rate_limit import limiter, throttle
 
 # ================= 配置区域 =================
 # 米游社 API 配置
@@ -17,10 +17,22 @@ MIYOUSHE_API_DETAIL = "https://bbs-api-static.miyoushe.com/post/wapi/getPostFull
 DATA_DIR = "d:/Users/22542/Desktop/zzzspider/data"
 DOWNLOAD_ROOT = "d:/Users/22542/Desktop/zzzspider/downloads"
 CLOUD_LINKS_FILE = os.path.join(DATA_DIR, "cloud_links.jsonl")
+SCANNED_POSTS_FILE = os.path.join(DATA_DIR, "scanned_posts.json")  # 已抓过详情的帖子 (含无云盘链接的)
 
 # 爬取配置
 MAX_PAGES = 5  # 每次运行爬取列表页数
+HTTP_MAX_PER_HOST = 4  # 每个 host 同时在途的请求数 (详情页并发抓取上限)
+KNOWN_POST_STOP_RUN = 20  # 连续遇到 N 个已处理帖子即停止翻页 (0 = 不提前停止)
+
+# 接口响应磁盘缓存 (重跑/调试时几乎不走网络)
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, "http_cache")
+HTTP_CACHE_TTL_LIST = 10 * 60            # 列表页会出新帖，缓存时间短
+HTTP_CACHE_TTL_DETAIL = 7 * 24 * 3600    # 帖子正文基本不变，缓存时间长
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024 # 超出后按 LRU 淘汰
+ARTICLE_CORPUS_DIR = os.path.join(DATA_DIR, "article_corpus") # 保存帖子正文作 bench_link_extract.py 的语料 (None = 不保存)
 HEADLESS_MODE = False # 调试时设为 False，实际部署可 True (但也建议False以便人工接入)
+SLOW_MO = 0 # 浏览器操作延迟 (ms)，限频由 zzz_rate_limit 按 host 统一控制
 
 # ================= 工具函数 =================
 def ensure_dirs():
@@ -40,41 +52,82 @@ def load_processed_posts():
                 except: pass
     return ids
 
+# 详情页并发处理时多个线程会同时追加记录
+record_lock = threading.Lock()
+
+def load_scanned_posts():
+    if os.path.exists(SCANNED_POSTS_FILE):
+        try:
+            with open(SCANNED_POSTS_FILE, "r", encoding="utf-8") as f:
+                return set(json.load(f))
+        except: pass
+    return set()
+
+def save_scanned_posts(ids):
+    try:
+        with open(SCANNED_POSTS_FILE, "w", encoding="utf-8") as f:
+            json.dump(sorted(ids), f, indent=2)
+    except: pass
+
 def save_cloud_record(record):
-    with open(CLOUD_LINKS_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    with record_lock:
+        with open(CLOUD_LINKS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
 # ================= Part A: 发现阶段 (Discovery) =================
 
+def api_ok(data):
+    """米游社接口是否返回成功 (HTTP 200 也可能是 retcode != 0 的错误)"""
+    return isinstance(data, dict) and data.get("retcode") == 0
+
+
 class MiyousheScanner:
     def __init__(self):
         self.processed_posts = load_processed_posts()
+        # 抓过详情但没有云盘链接的帖子不会写进 cloud_links.jsonl，单独记录
+        self.scanned_posts = load_scanned_posts()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Referer": "https://www.miyoushe.com/"
         }
+        # keep-alive 连接池，列表页与详情页都复用同一批连接
+        cache = None
+        if HTTP_CACHE_ENABLED:
+            cache = ResponseCache(HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL_DETAIL, max_bytes=HTTP_CACHE_MAX_BYTES)
+        self.http = HttpClient(headers=self.headers, max_per_host=HTTP_MAX_PER_HOST, cache=cache, limiter=limiter)
 
-    def fetch_json(self, url):
+    def fetch_json(self, url, cache_ttl=None):
         try:
-            req = urllib.request.Request(url, headers=self.headers)
-            with urllib.request.urlopen(req) as resp:
-                if resp.status == 200:
-                    return json.loads(resp.read().decode('utf-8'))
+            # 只缓存 retcode == 0 的响应，风控 / 错误响应不能被当作帖子内容缓存一周
+            return self.http.get_json(url, cache_ttl=cache_ttl, validate=api_ok)
         except Exception as e:
             print(f"[API Error] {url}: {e}")
         return None
 
     def scan_news_list(self):
+        print(f"--> 开始扫描米游社资讯列表 (前 {MAX_PAGES} 页)...")
+        
+        # 一整页的详情并发抓取，单页耗时取决于最慢的那一个详情请求
+        pool = ThreadPoolExecutor(max_workers=HTTP_MAX_PER_HOST)
+        try:
+            found_items = self._scan_pages(pool)
+        finally:
+            pool.shutdown(wait=True)
+            self.http.close()
+        if self.http.cache:
+            print(f"--> [Cache] {self.http.cache.summary()}")
+        return found_items
+
+    def _scan_pages(self, pool):
         last_id = ""
         found_items = []
-        
-        print(f"--> 开始扫描米游社资讯列表 (前 {MAX_PAGES} 页)...")
+        known_run = 0  # 连续遇到的已处理帖子数 (跨页累计)
         
         for page_num in range(MAX_PAGES):
             target_url = MIYOUSHE_API_LIST.format(last_id)
             print(f"    Scanning Page {page_num+1}...")
             
-            data = self.fetch_json(target_url)
+            data = self.fetch_json(target_url, cache_ttl=HTTP_CACHE_TTL_LIST)
             if not data or data.get("retcode") != 0:
                 print("    API返回异常或结束")
                 break
@@ -84,6 +137,7 @@ class MiyousheScanner:
                 print("    本页无数据")
                 break
             
+            page_posts = []
             for item in posts:
                 post_info = item.get("post", {})
                 post_id = post_info.get("post_id")
@@ -92,19 +146,36 @@ class MiyousheScanner:
                 # 更新 last_id 用于翻页
                 last_id = post_id
                 
-                # 如果这个帖子已经处理过（且没有增量更新需求），理论上可以跳过
-                # 但为了防止之前漏抓，暂不在此处强跳过，除非量非常大
-                # 这里先只打印
-                # print(f"      Check: {post_id} - {subject}")
-                
-                details = self.process_post_detail(post_id, subject)
+                # 已处理过的帖子不再抓详情 (也就不会重复追加记录)
+                if self.is_known_post(post_id):
+                    known_run += 1
+                    continue
+                known_run = 0
+                page_posts.append((post_id, subject))
+            
+            print(f"    本页 {len(posts)} 条，新帖 {len(page_posts)} 条")
+            
+            futures = [pool.submit(self.process_post_detail, pid, subj) for pid, subj in page_posts]
+            for fut in futures:
+                try:
+                    details = fut.result()
+                except Exception as e:
+                    print(f"    [Detail Error] {e}")
+                    continue
                 if details:
                     found_items.extend(details)
-                    
-            time.sleep(random.uniform(1.0, 2.0)) # 礼貌限频
+            save_scanned_posts(self.scanned_posts)
+            
+            # 本页末尾已连续出现足够多的旧帖，后面的页只会更旧
+            if KNOWN_POST_STOP_RUN and known_run >= KNOWN_POST_STOP_RUN:
+                print(f"    连续 {known_run} 个帖子已处理过，停止翻页")
+                break
 
         return found_items
 
+    def is_known_post(self, post_id):
+        return post_id in self.processed_posts or post_id in self.scanned_posts
+
     def process_post_detail(self, post_id, title):
         # 结果暂存
         records = []
@@ -117,6 +188,8 @@ class MiyousheScanner:
         if data and data.get("retcode") == 0:
             post_data = data.get("data", {}).get("post", {})
             content = post_data.get("content", "") # HTML content
+            with record_lock:
+                self.scanned_posts.add(post_id)
             # 也有 structured_content，但 content 是 html 包含链接更直观
             
             # 如果 API 没有内容，可能需要 Playwright (作为 Fallback，暂略，遵循 '优先 JSON' 指示)
@@ -124,55 +197,15 @@ class MiyousheScanner:
         if not content:
             return []
 
-        # 2. 提取云盘链接
-        # 识别常见网盘域名
-        pan_domains = [
-            r"pan\.baidu\.com/s/[\w-]+", 
-            r"yun\.baidu\.com/s/[\w-]+",
-            r"aliyundrive\.com/s/[\w-]+",
-            r"alipan\.com/s/[\w-]+",
-            r"cloud\.189\.cn/t/[\w-]+",
-            r"lanzou\w?\.com/[\w]+",
-            r"quark\.cn/s/[\w-]+",
-            r"123pan\.com/s/[\w-]+"
-        ]
-        
-        text_for_search = re.sub(r'<[^>]+>', ' ', content) # 简单去标点方便搜密码
-        
-        # 查找所有链接
-        # HTML 中的 href
-        hrefs = re.findall(r'href=[\'"]?(https?://[^\'" >]+)', content)
-        # 纯文本中的链接
-        text_links = re.findall(r'https?://[a-zA-Z0-9./?&_=-]+', text_for_search)
-        
-        all_candidates = set(hrefs + text_links)
-        
-        valid_links = []
-        for link in all_candidates:
-            for domain_pat in pan_domains:
-                if re.search(domain_pat, link):
-                    valid_links.append(link)
-                    break
-        
+        save_article_sample(ARTICLE_CORPUS_DIR, post_id, content)
+
+        # 2. 提取云盘链接和提取码 (content 为 HTML，href 中的链接也会保留)
+        valid_links, codes, paired = extract_cloud_pairs(content, is_html=True)
         if not valid_links:
             return []
 
         print(f"    [Post {post_id}] 发现 {len(valid_links)} 个潜在云盘链接: {title}")
         
-        # 3. 提取密码 (简单上下文搜索)
-        # 在整个文本中搜可能的密码，简单起见，不针对每个链接做极其复杂的距离计算
-        # 而是提取所有 "码: XXXX" 形式，然后尝试匹配
-        codes = []
-        code_patterns = [
-            r"(?:密码|提取码|访问码|口令)\s*[:：]\s*([A-Za-z0-9]{4})",
-            r"(?:code)\s*[:：]\s*([A-Za-z0-9]{4})"
-        ]
-        for pat in code_patterns:
-            found = re.findall(pat, text_for_search)
-            codes.extend(found)
-        
-        # 去重
-        codes = list(set(codes))
         default_code = codes[0] if codes else None
         
         for v_link in valid_links:
@@ -183,7 +216,7 @@ class MiyousheScanner:
                 "title": title,
                 "article_url": f"https://www.miyoushe.com/zzz/article/{post_id}",
                 "cloud_url": v_link,
-                "code": default_code, # 暂时只关联找到的第一个码，多码情况需要更复杂逻辑
+                "code": paired.get(canonical_cloud_url(v_link), default_code), # 与链接位置最近的码，找不到时用第一个码
                 "found_context": "API/Regex",
                 "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
                 "status": "pending" # pending, downloading, done, failed
@@ -194,7 +227,9 @@ class MiyousheScanner:
             # 检查是否重复 (简单检查内存中的 processed_posts 是不够的，因为一个 post 可能有多个 link)
             # 这里简单追加，execute 阶段再去重处理
             save_cloud_record(rec)
-            
+        
+        with record_lock:
+            self.processed_posts.add(post_id)
         return records
 
 # ================= Part B: 执行阶段 (Execution) =================
@@ -207,7 +242,7 @@ class CloudDownloader:
     
     def start(self):
         self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=HEADLESS_MODE, slow_mo=1000)
+        self.browser = self.playwright.chromium.launch(headless=HEADLESS_MODE, slow_mo=SLOW_MO)
         self.context = self.browser.new_context(accept_downloads=True)
     
     def stop(self):
@@ -270,6 +305,7 @@ class CloudDownloader:
     def adapter_baidu(self, page, url, code, post_id):
         # 1. 打开页面
         try:
+            throttle(url)
             page.goto(url, wait_until="domcontentloaded", timeout=30000)
         except:
             return "failed", "timeout_load"
@@ -284,13 +320,10 @@ class CloudDownloader:
                 
                 page.fill("input#accessCode", code)
                 page.click("a#getfileBtn, a.g-button[title='提取文件']")
-                # 等待跳转
+                # 提取码输入框消失即提取成功，超时视为提取码错误
                 try:
-                    page.wait_for_navigation(timeout=5000)
-                except: time.sleep(2)
-                
-                # 检查是否密码错误
-                if page.locator("input#accessCode").is_visible():
+                    page.locator("input#accessCode").wait_for(state="hidden", timeout=5000)
+                except PlaywrightTimeoutError:
                     return "failed", "wrong_code"
         except: pass
 
@@ -346,9 +379,12 @@ class CloudDownloader:
         if check_all.is_visible():
             # 全选
             check_all.click()
-            time.sleep(1)
-            # 再找下载按钮
+            # 再找下载按钮 (全选后才出现)
             download_btn = page.locator("a[title='下载'], a.g-button:has-text('下载')").first
+            try:
+                download_btn.wait_for(state="visible", timeout=3000)
+            except PlaywrightTimeoutError:
+                pass
             if download_btn.is_visible():
                 # 同上下载逻辑... (略，复用上方代码块结构)
                 pass
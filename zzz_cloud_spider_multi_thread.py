@@ -1,27 +1,59 @@
 import re
 import json
 import os
+import sys
 import time
 import zipfile
 import asyncio
-from urllib.parse import urljoin, urlparse
+import urllib.request
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from zzz_http import HttpClient
+from zzz_download import COLLECT_SHARE_FILES_JS, VALID_EXTS, GLOBAL_MAX_DOWNLOADS, share_headers, download_to_dir, download_share_files, fetch_remote_sizes, diff_manifest, remote_stamp, save_zip_stamp, zip_unchanged
+from zzz_extract import extract_zip
+from zzz_dedup import DedupStore
+from zzz_verify import ChecksumWriter, REDOWNLOAD_QUEUE_NAME, load_redownload_queue, save_redownload_queue
+from zzz_link_extract import extract_cloud_pairs, order_candidates, canonical_cloud_url, save_article_sample
+from zzz_rate_limit import limiter, throttle, throttle_async
+from zzz_concurrency import AdaptiveLimiter, SingleFlight, classify_outcome
 
 # ================= 配置区域 =================
 # 是否无头模式 (User requested True, and original was False but user asked to not popup browser)
 HEADLESS = True
-# 操作减速 (毫秒)
-SLOW_MO = 100
+# 操作减速 (毫秒)，限频改由 zzz_rate_limit 按 host 统一控制，无需再给每个操作加延迟
+SLOW_MO = 0
 # 目录页入口
 CATALOG_URL = "https://zzz.mihoyo.com/news?utm_source=oolandingpage"
 # 基础数据存目录
 DATA_DIR = "d:/Users/22542/Desktop/zzzspider/data"
 # 下载保存目录
 DOWNLOAD_ROOT = "d:/Users/22542/Desktop/zzzspider/downloads"
-# 最大并发任务数 (建议 3-5，过高会导致内存/CPU 压力大或被封禁)
+# 初始并发任务数 (运行中按 AIMD 自适应调整：健康时逐步增加，遇到 429/超时/soft 404 时减半)
 CONCURRENCY_LIMIT = 3
+# 自适应并发的上下限
+CONCURRENCY_MIN = 1
+CONCURRENCY_MAX = 12
 # 最大处理新闻数 (设置为 None 则处理所有采集到的)
 MAX_NEWS_LIMIT = None 
+# 目录采集模式: "api" = 嗅探页面加载的新闻列表接口后直接请求接口翻页 (失败自动回退), "dom" = 点击分页器翻页
+CATALOG_DISCOVERY_MODE = "api"
+# 接口翻页的最大页数 (防止死循环)
+CATALOG_API_MAX_PAGES = 200
+# 是否强制全量重扫目录 (False = 增量: 翻到整页都是已知新闻即停止; 也可用命令行参数 --full 临时开启)
+CATALOG_FULL_SWEEP = False
+# 云盘页等待上限 (毫秒)：打开后等密码框/文件列表出现、提交提取码后等密码框消失，条件满足即继续
+CLOUD_READY_TIMEOUT = 10000
+LOGIN_WAIT_TIMEOUT = 5000
+# 云盘文件下载方式: "http" = 浏览器解锁后直连流式下载 (带上浏览器的 Cookie), "browser" = 全部经浏览器下载
+DOWNLOAD_MODE = "http"
+# 直连模式下单个分享内同时下载的文件数 (全进程另有 zzz_download.GLOBAL_MAX_DOWNLOADS 上限)
+SHARE_DOWNLOAD_PARALLEL = 4
+# 下载完成的文件按内容哈希去重，重复文件改为硬链接 (存储在 DOWNLOAD_ROOT/.blobs)
+DEDUP_ENABLED = True
+# 每个分享文件夹写 .checksums.json (SHA-256)，供 zzz_verify.py 校验
+CHECKSUM_MANIFEST = True
+# 保存新闻正文作 bench_link_extract.py 的语料 (None = 不保存)
+ARTICLE_CORPUS_DIR = os.path.join(DATA_DIR, "article_corpus")
 # ===========================================
 
 # 确保目录存在
@@ -49,27 +81,38 @@ async def safe_write_json(filepath, data):
 # Part 1: 详情页处理器 (Async版)
 # ==============================================================================
 
-def extract_from_text(text):
-    """从文本中提取云盘链接和密码"""
-    all_urls = re.findall(r"https?://[^\s)\"'>]+", text)
-    cloud_links = []
-    seen = set()
-    for link in all_urls:
-        if "minas.mihoyo.com" in link and link not in seen:
-            cloud_links.append(link)
-            seen.add(link)
-    
-    pwd_pattern = re.compile(r"(?:密码|提取码)\s*[:：]\s*([A-Za-z0-9_-]{4,})")
-    passwords = []
-    seen_pwds = set()
-    for match in pwd_pattern.findall(text):
-        if match not in seen_pwds:
-            passwords.append(match)
-            seen_pwds.add(match)
-    return cloud_links, passwords
-
-async def attempt_cloud_login(page, password_candidates):
-    """尝试云盘登录"""
+# 云盘页就绪判断：出现密码框、打包按钮或文件链接 (或已是 404 页) 即视为就绪
+CLOUD_READY_JS = """
+() => {
+    if (document.title.includes("404") || (document.body && document.body.innerText.includes("页面不存在"))) return true;
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const pwd = document.querySelectorAll("input[type='password'], input[placeholder*='密码'], input[placeholder*='提取']");
+    if (Array.from(pwd).some(visible)) return true;
+    const exts = [".jpg", ".png", ".gif", ".zip", ".rar", ".7z", ".mp4"];
+    return Array.from(document.querySelectorAll("a[href], button")).some((el) => {
+        if (!visible(el)) return false;
+        const t = (el.innerText || "").trim().toLowerCase();
+        return /zip|打包|全部下载/.test(t) || exts.some((e) => t.endsWith(e));
+    });
+}
+"""
+
+async def wait_cloud_ready(page, timeout=CLOUD_READY_TIMEOUT):
+    """等待云盘页就绪 (条件满足立即返回，超时不报错，交给后续逻辑判断)"""
+    try:
+        await page.wait_for_function(CLOUD_READY_JS, timeout=timeout)
+        return True
+    except:
+        return False
+
+async def attempt_cloud_login(page, password_candidates, known_pwd=None):
+    """
+    尝试云盘登录 (候选码按优先级排列，与该链接配对的码在最前)。
+    known_pwd 为上次记下的提取码 / NO_PASSWORD。返回可用的提取码，无需密码返回 NO_PASSWORD，失败返回 None。
+    """
+    if known_pwd:
+        password_candidates = [known_pwd] + [c for c in password_candidates if c != known_pwd]
+
     input_selectors = ["input[type='password']", "input[placeholder*='密码']", "input[placeholder*='提取']"]
     confirm_selectors = ["button:has-text('确认')", "button:has-text('确定')", "button:has-text('进入')"]
 
@@ -80,10 +123,13 @@ async def attempt_cloud_login(page, password_candidates):
             break
             
     if not found_input:
-        return None  # 无需密码
+        return NO_PASSWORD  # 无需密码
 
+    if known_pwd == NO_PASSWORD:
+        # 上次记为无需密码，分享后来加了密码：改用候选码，成功后覆盖记录
+        print("      [Login] 原记录无需密码，但出现了密码框，改用候选码尝试")
     print(f"      [Login] 发现密码框，开始尝试...")
-    for pwd in password_candidates:
+    for attempt, pwd in enumerate(password_candidates, 1):
         try:
             await page.fill(found_input, pwd)
             clicked = False
@@ -95,9 +141,14 @@ async def attempt_cloud_login(page, password_candidates):
             if not clicked:
                 await page.press(found_input, "Enter")
             
-            await asyncio.sleep(1.5)
-            if not await page.locator(found_input).is_visible():
-                return pwd
+            # 密码框消失即登录成功，超时视为密码错误
+            try:
+                await page.locator(found_input).first.wait_for(state="hidden", timeout=LOGIN_WAIT_TIMEOUT)
+            except:
+                continue
+            print(f"      [Login] 第 {attempt} 次尝试成功")
+            await wait_cloud_ready(page)
+            return pwd
         except:
             pass
     return None
@@ -125,12 +176,66 @@ async def determine_local_folder(page, url):
             
     return sanitize_filename(folder_name)
 
+# 直连下载共用的 keep-alive 连接池 (请求同样经过共享限频器)，每个 host 的连接数与全局下载上限一致
+DOWNLOAD_CLIENT = HttpClient(max_per_host=GLOBAL_MAX_DOWNLOADS, timeout=60, limiter=limiter)
+# 内容寻址去重存储，哈希在后台线程池里做，不阻塞下载
+DEDUP_STORE = DedupStore(os.path.join(DOWNLOAD_ROOT, ".blobs")) if DEDUP_ENABLED else None
+# 校验清单在后台线程里增量更新；zzz_verify.py --requeue 写入的重下队列在启动时先处理
+CHECKSUM_WRITER = ChecksumWriter() if CHECKSUM_MANIFEST else None
+REDOWNLOAD_QUEUE_FILE = os.path.join(DATA_DIR, REDOWNLOAD_QUEUE_NAME)
+# 同一分享链接 (按规范化 URL) 同时只由一个任务下载，其余任务等待并复用结果
+CLOUD_FLIGHTS = SingleFlight("云盘链接")
+
+async def share_request_headers(page):
+    """直连请求头：浏览器会话的 Cookie + UA，Referer 为分享页"""
+    cookies = await page.context.cookies()
+    return share_headers(cookies, page.url, await page.evaluate("navigator.userAgent"))
+
+async def collect_share_files(page):
+    """直连模式：收集已解锁分享页上的文件 ([{name, url}]) 及请求头"""
+    found = await page.evaluate(COLLECT_SHARE_FILES_JS, list(VALID_EXTS))
+    files = [{"name": sanitize_filename(f["name"]), "url": f["url"]} for f in found]
+    return files, await share_request_headers(page)
+
+async def share_manifest(page):
+    """清单：已解锁分享页上的文件 ([{name, url, size}]) 及请求头，直连模式下补全远程大小；失败返回 ([], None)"""
+    try:
+        files, headers = await collect_share_files(page)
+    except Exception as e:
+        print(f"      [Manifest] 列出文件失败: {e}")
+        return [], None
+    if files and DOWNLOAD_MODE == "http":
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, fetch_remote_sizes, DOWNLOAD_CLIENT, files, headers, SHARE_DOWNLOAD_PARALLEL)
+    return files, headers
+
+async def direct_zip_url(page, btn):
+    """打包按钮是真实下载地址的 <a href> 时返回绝对地址，否则返回 None (只能点击后由浏览器下载)"""
+    try:
+        href = await btn.get_attribute("href")
+    except:
+        return None
+    url = urljoin(page.url, href) if href else ""
+    return url if url.startswith(("http://", "https://")) else None
+
 async def download_content(page, local_dir):
     """核心下载逻辑：优先ZIP，降级逐个文件"""
     downloaded_files = []
     mode = "failed"
     
-    # 1. 尝试 ZIP
+    # 0. 清单比对：列出分享里的文件及大小，与本地文件夹比较；已完整则整个跳过，只缺部分时只补缺的文件
+    files, headers = await share_manifest(page)
+    complete = []
+    if files:
+        missing, complete = diff_manifest(files, local_dir)
+        if not missing:
+            print(f"      [Manifest] 本地已完整 ({len(complete)} 个文件)，跳过下载")
+            return "up_to_date", complete
+        if complete:
+            print(f"      [Manifest] 本地已有 {len(complete)}/{len(files)} 个文件，只补下缺少的 {len(missing)} 个")
+        files = missing
+    
+    # 1. 尝试 ZIP (本地已有部分文件时不再整包下载)
     zip_btns = await page.locator("button, a").filter(has_text=re.compile("ZIP|打包|全部下载", re.IGNORECASE)).all()
     target_btn = None
     for btn in zip_btns:
@@ -139,24 +244,52 @@ async def download_content(page, local_dir):
             target_btn = btn
             break
             
-    if target_btn:
+    if target_btn and not complete:
         print(f"      [ZIP] 发现打包下载按钮，尝试下载...")
         try:
-            async with page.expect_download(timeout=60000) as download_info:
-                await target_btn.click()
-            
-            download = await download_info.value
-            safe_name = sanitize_filename(download.suggested_filename)
+            remote = None
+            zip_url = await direct_zip_url(page, target_btn) if DOWNLOAD_MODE == "http" else None
+            if zip_url:
+                # 直连流式下载 (阻塞 IO 放到线程池)；远程 ZIP 与上次解压的一致且成员都在时不再下载
+                headers = await share_request_headers(page)
+                loop = asyncio.get_running_loop()
+                try:
+                    remote = await loop.run_in_executor(None, remote_stamp, DOWNLOAD_CLIENT, zip_url, headers)
+                except Exception:
+                    remote = None
+                members = zip_unchanged(local_dir, remote=remote) if remote else None
+                if members:
+                    print(f"      [ZIP] 远程 ZIP 未变化，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                safe_name, _ = await loop.run_in_executor(None, download_to_dir, DOWNLOAD_CLIENT, zip_url, local_dir, headers, sanitize_filename)
+            else:
+                await throttle_async(page.url)
+                async with page.expect_download(timeout=60000) as download_info:
+                    await target_btn.click()
+                
+                download = await download_info.value
+                safe_name = sanitize_filename(download.suggested_filename)
+                # 浏览器下载拿不到大小，按文件名与解压出的成员判断
+                members = zip_unchanged(local_dir, name=safe_name)
+                if members:
+                    await download.cancel()
+                    print(f"      [ZIP] {safe_name} 上次已解压，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                if os.path.exists(os.path.join(local_dir, safe_name)):
+                    # 上次已下载 (未解压或不是 ZIP)，不再重复下载
+                    await download.cancel()
+                    print(f"      [Skip] 文件已存在: {safe_name}")
+                else:
+                    await download.save_as(os.path.join(local_dir, safe_name))
             save_path = os.path.join(local_dir, safe_name)
-            await download.save_as(save_path)
             
-            # 解压处理 (IO密集型，放到线程池里避免阻塞 Loop)
-            # 但这里为了简单，且 zip 操作可能较快，暂且同步执行
+            # 解压处理 (逐个成员增量解压，放到线程池里避免阻塞 Loop)
             if zipfile.is_zipfile(save_path):
                 try:
-                    with zipfile.ZipFile(save_path, 'r') as zf:
-                        zf.extractall(local_dir)
-                        downloaded_files.extend(zf.namelist())
+                    loop = asyncio.get_running_loop()
+                    names, _ = await loop.run_in_executor(None, extract_zip, save_path, local_dir)
+                    downloaded_files.extend(names)
+                    save_zip_stamp(save_path, local_dir, remote) # 删除前记下 ZIP 的大小 / ETag 与成员，重跑时据此跳过
                     os.remove(save_path) # 删除原 ZIP
                     mode = "zip_extracted"
                 except Exception as e:
@@ -173,6 +306,16 @@ async def download_content(page, local_dir):
     # 2. 降级：逐个文件
     print("      [Fallback] 尝试逐个文件下载...")
     valid_exts = ('.jpg', '.png', '.gif', '.zip', '.rar', '.7z', '.mp4')
+    if DOWNLOAD_MODE == "http":
+        # 文件链接在清单阶段已收集 (只剩本地缺少的)
+        if files:
+            print(f"      [HTTP] 直连下载 {len(files)} 个文件...")
+            loop = asyncio.get_running_loop()
+            downloaded, failed = await loop.run_in_executor(None, download_share_files, DOWNLOAD_CLIENT, files, local_dir, headers, SHARE_DOWNLOAD_PARALLEL)
+            if not failed:
+                return "http_files", complete + downloaded
+            # 已下载的文件在下面的循环里会按 "已存在" 跳过
+            print(f"      [HTTP] {len(failed)} 个文件直连失败，交给浏览器补下...")
     try:
         links = await page.locator("a[href]").all()
         # 需异步过滤
@@ -191,7 +334,7 @@ async def download_content(page, local_dir):
             safe_fname = sanitize_filename(fname)
             
             # 检查文件是否已存在 (去重)
-            if os.path.exists(os.path.join(local_dir, safe_fname)):
+            if safe_fname in complete or os.path.exists(os.path.join(local_dir, safe_fname)):
                 print(f"      [Skip] 文件已存在: {safe_fname}")
                 downloaded_files.append(safe_fname)
                 continue
@@ -199,16 +342,16 @@ async def download_content(page, local_dir):
             # 重试逻辑
             for attempt in range(2):
                 try:
+                    await throttle_async(page.url)
                     async with page.expect_download(timeout=15000) as di:
                         await link.click(timeout=3000)
                     dl = await di.value
                     sname = sanitize_filename(dl.suggested_filename) or safe_fname
                     await dl.save_as(os.path.join(local_dir, sname))
                     downloaded_files.append(sname)
-                    await asyncio.sleep(0.5)
                     break
                 except:
-                    if attempt == 0: await asyncio.sleep(1)
+                    pass
         
         if downloaded_files:
             mode = "individual_files"
@@ -222,29 +365,60 @@ async def download_content(page, local_dir):
 # ==============================================================================
 FOLDER_MAP_FILE = os.path.join(DATA_DIR, "folder_map.json")
 
+# folder_map.json: 规范化的云盘 URL -> {"path": 本地目录, "pwd": 上次可用的提取码, "url": 原始链接}
+# 无需密码的云盘记为 pwd = NO_PASSWORD，下次不再试提取码 (若又出现密码框仍会用候选码重试并覆盖)
+NO_PASSWORD = ""
+
+def load_folder_map():
+    mapping = {}
+    if os.path.exists(FOLDER_MAP_FILE):
+        try:
+            with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
+                mapping = json.load(f)
+        except: pass
+    # 兼容旧格式：值直接是路径字符串
+    for key, entry in mapping.items():
+        if not isinstance(entry, dict):
+            mapping[key] = {"path": entry}
+    return mapping
+
+def save_folder_map(mapping):
+    try:
+        with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, indent=2, ensure_ascii=False)
+    except: pass
+
+def share_map_key(mapping, cloud_url):
+    """
+    云盘链接在 folder_map 中的 key：统一用规范形式 (canonical_cloud_url)，
+    迁移前按原始写法保存的旧条目、或按旧规则规范化的条目 (其 url 为原始链接) 若规范形式相同则沿用旧 key。
+    """
+    key = canonical_cloud_url(cloud_url)
+    if key in mapping:
+        return key
+    for old_key, entry in mapping.items():
+        if canonical_cloud_url(entry.get("url") or old_key) == key:
+            return old_key
+    return key
+
 async def get_assigned_folder_async(cloud_url, suggested_name, root_dir):
     """
     根据云盘 URL 获取固定的本地文件夹路径。
     Async 版本的封装，主要是为了加锁读取/写入，防止多线程竞争文件。
     """
     async with file_lock:
-        mapping = {}
-        if os.path.exists(FOLDER_MAP_FILE):
-            try:
-                with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
-                    mapping = json.load(f)
-            except: pass
+        mapping = load_folder_map()
         
-        map_key = cloud_url
+        map_key = share_map_key(mapping, cloud_url)
         
-        if map_key in mapping:
-            assigned_path = mapping[map_key]
+        if mapping.get(map_key, {}).get("path"):
+            assigned_path = mapping[map_key]["path"]
             return assigned_path
         
         base_path = os.path.join(root_dir, suggested_name)
         final_path = base_path
         
-        used_paths = set(p.lower().replace('\\', '/') for p in mapping.values())
+        used_paths = set(e["path"].lower().replace('\\', '/') for e in mapping.values() if e.get("path"))
         
         counter = 1
         while True:
@@ -258,14 +432,87 @@ async def get_assigned_folder_async(cloud_url, suggested_name, root_dir):
             final_path = f"{base_path}_{counter:02d}"
             counter += 1
             
-        mapping[map_key] = final_path
-        try:
-            with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
-                json.dump(mapping, f, indent=2, ensure_ascii=False)
-        except: pass
+        entry = mapping.setdefault(map_key, {})
+        entry["path"] = final_path
+        entry.setdefault("url", cloud_url)  # 原始链接，按重下队列补下时用它打开
+        save_folder_map(mapping)
         
         return final_path
 
+async def get_share_password(cloud_url):
+    """上次可用的提取码；NO_PASSWORD 表示无需密码，None 表示未知"""
+    async with file_lock:
+        mapping = load_folder_map()
+        return mapping.get(share_map_key(mapping, cloud_url), {}).get("pwd")
+
+async def remember_share_password(cloud_url, pwd):
+    """登录成功后记下可用的提取码 (pwd 为 None 表示登录失败，不记录)"""
+    if pwd is None:
+        return
+    async with file_lock:
+        mapping = load_folder_map()
+        entry = mapping.setdefault(share_map_key(mapping, cloud_url), {})
+        if entry.get("pwd") != pwd:
+            entry["pwd"] = pwd
+            save_folder_map(mapping)
+
+async def download_share(page, link, pwds, paired, output_root):
+    """打开分享、登录并下载到映射的文件夹，返回 {pwd, local_folder, mode, files}；登录失败时另带 tried (试过的码)"""
+    share = {}
+    await throttle_async(link)
+    await page.goto(link, wait_until="domcontentloaded", timeout=45000)
+    await wait_cloud_ready(page)
+    
+    # 登录成功后会等到文件列表出现
+    known_pwd = await get_share_password(link)
+    candidates = order_candidates(link, pwds, paired)
+    used_pwd = await attempt_cloud_login(page, candidates, known_pwd)
+    await remember_share_password(link, used_pwd)
+    share["pwd"] = used_pwd
+    if used_pwd is None:
+        share["tried"] = [c for c in [known_pwd] + candidates if c]
+    
+    folder_name = await determine_local_folder(page, link)
+    local_path = await get_assigned_folder_async(link, folder_name, output_root)
+    
+    if not os.path.exists(local_path):
+        os.makedirs(local_path)
+    
+    share["local_folder"] = local_path
+    print(f"    -> [Disk] 下载到: {local_path}")
+    
+    mode, files = await download_content(page, local_path)
+    if DEDUP_STORE and files:
+        DEDUP_STORE.submit_dir(local_path)
+    if CHECKSUM_WRITER and files:
+        CHECKSUM_WRITER.submit(local_path)
+    share["mode"] = mode
+    share["files"] = files
+
+    if not files:
+        try:
+            if not os.listdir(local_path):
+                os.rmdir(local_path)
+                print(f"    -> [Cleanup] 空目录已删除: {local_path}")
+        except Exception as clean_err:
+            print(f"    -> [Cleanup Warn] {clean_err}")
+    return share
+
+def retry_with_own_codes(pwds):
+    """SingleFlight 的 retry：执行者登录失败，而本篇新闻有它没试过的提取码时，自己重新打开分享"""
+    return lambda share: share.get("pwd") is None and bool(set(pwds) - set(share.get("tried", ())))
+
+# 官网 soft 404 / 风控页特征 (HTTP 200 但内容是错误页)
+SOFT_404_KEYWORDS = ["页面不存在", "页面丢失", "404 Not Found", "系统繁忙", "访问过于频繁", "偏离了地球"]
+
+async def is_soft_404_page(page):
+    try:
+        page_title = await page.title()
+        page_text_start = (await page.inner_text("body"))[:500]
+    except Exception:
+        return False
+    return any(k in page_title or k in page_text_start for k in SOFT_404_KEYWORDS)
+
 async def process_news_detail(context, news_url, output_root, processed_set, full_results, processed_file, results_file):
     """处理单个新闻详情页 (Async)"""
     result = {
@@ -280,13 +527,22 @@ async def process_news_detail(context, news_url, output_root, processed_set, ful
     
     try:
         print(f"  > [Detail] 打开新闻页: {news_url}")
-        await page.goto(news_url, wait_until="domcontentloaded", timeout=45000)
+        await throttle_async(news_url)
+        response = await page.goto(news_url, wait_until="domcontentloaded", timeout=45000)
+        result["http_status"] = response.status if response else None
+        if result["http_status"] in (429, 503):
+            raise RuntimeError(f"HTTP {result['http_status']} (限流)")
         try:
             await page.wait_for_load_state("networkidle", timeout=5000)
         except: pass
+        if await is_soft_404_page(page):
+            # 交给 task_runner 按 soft 404 反馈给并发限制器 (连续出现时减半并发)
+            result["soft_404"] = True
+            raise RuntimeError("soft 404 (页面内容异常)")
         
         text = await page.inner_text("body")
-        cloud_links, pwds = extract_from_text(text)
+        save_article_sample(ARTICLE_CORPUS_DIR, news_url, text, ext=".txt")
+        cloud_links, pwds, paired = extract_cloud_pairs(text, minas_only=True)
         result["cloud_links_found"] = cloud_links
         
         if not cloud_links:
@@ -303,41 +559,13 @@ async def process_news_detail(context, news_url, output_root, processed_set, ful
                     "files": []
                 }
                 
-                created_dir_path = None
-
                 try:
-                    await page.goto(link, wait_until="domcontentloaded", timeout=45000)
-                    await asyncio.sleep(1)
-                    
-                    used_pwd = await attempt_cloud_login(page, pwds)
-                    disk_res["pwd"] = used_pwd
-                    
-                    try:
-                        await page.wait_for_load_state("networkidle", timeout=5000)
-                    except: pass
-                    
-                    folder_name = await determine_local_folder(page, link)
-                    local_path = await get_assigned_folder_async(link, folder_name, output_root)
-                    
-                    if not os.path.exists(local_path):
-                        os.makedirs(local_path)
-                    created_dir_path = local_path
-                    
-                    disk_res["local_folder"] = local_path
-                    print(f"    -> [Disk] 下载到: {local_path}")
-                    
-                    mode, files = await download_content(page, local_path)
-                    disk_res["mode"] = mode
-                    disk_res["files"] = files
-
-                    if not files and created_dir_path:
-                        try:
-                            if not os.listdir(created_dir_path):
-                                os.rmdir(created_dir_path)
-                                print(f"    -> [Cleanup] 空目录已删除: {created_dir_path}")
-                        except Exception as clean_err:
-                            print(f"    -> [Cleanup Warn] {clean_err}")
-                    
+                    # 同一分享正被其他新闻下载时不再重复打开，等待并复用其结果
+                    share, shared = await CLOUD_FLIGHTS.run(canonical_cloud_url(link), download_share, page, link, pwds, paired, output_root,
+                                                            retry=retry_with_own_codes(pwds))
+                    if shared:
+                        print(f"    -> [SingleFlight] {link} 正由其他任务下载，复用其结果")
+                    disk_res.update(share)
                 except Exception as e:
                     print(f"    -> [Disk Error] {e}")
                     disk_res["error"] = str(e)
@@ -353,7 +581,9 @@ async def process_news_detail(context, news_url, output_root, processed_set, ful
         
     # 保存结果 (使用锁)
     async with file_lock:
-        processed_set.add(news_url)
+        # 被限流 / soft 404 的新闻不记为已处理，下次运行重试
+        if result.get("http_status") not in (429, 503) and not result.get("soft_404"):
+            processed_set.add(news_url)
         full_results.append(result)
         
         # 写入文件
@@ -371,13 +601,223 @@ async def process_news_detail(context, news_url, output_root, processed_set, ful
 # Part 2: 目录页采集器 (保持逻辑复刻 Async 版)
 # ==============================================================================
 
-async def collect_news_urls(page, catalog_url):
+# ------------------------------------------------------------------------------
+# 2.1 接口优先采集：嗅探目录页自己加载的新闻列表 JSON，之后直接请求该接口翻页
+# ------------------------------------------------------------------------------
+CATALOG_API_CACHE_FILE = os.path.join(DATA_DIR, "catalog_api.json")
+NEWS_URL_PREFIX = "https://zzz.mihoyo.com/news/"
+# 列表项中可能的新闻 ID 字段 / URL 中可能的页码参数
+NEWS_ID_KEYS = ("iInfoId", "contentId", "content_id", "id")
+PAGE_PARAM_KEYS = ("iPage", "page", "pageNum", "page_num", "pageNo", "current")
+API_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Referer": "https://zzz.mihoyo.com/"
+}
+
+def looks_like_news_list_api(url):
+    """启发式判断是否为新闻列表接口 (思路同 mystry.py 的 looks_like_list_api)"""
+    u = url.lower()
+    return "mihoyo" in u and "api" in u and ("list" in u or "content" in u)
+
+def extract_news_ids(data):
+    """在 JSON 中找到第一个带数字 ID 字段的对象列表，返回其中的新闻 ID"""
+    if isinstance(data, list):
+        items = [x for x in data if isinstance(x, dict)]
+        if items:
+            for key in NEWS_ID_KEYS:
+                ids = [str(x[key]) for x in items if str(x.get(key, "")).isdigit()]
+                if ids:
+                    return ids
+        for x in data:
+            ids = extract_news_ids(x)
+            if ids:
+                return ids
+    elif isinstance(data, dict):
+        for v in data.values():
+            ids = extract_news_ids(v)
+            if ids:
+                return ids
+    return []
+
+def build_api_page_url(api_url, page_num):
+    """把接口 URL 中的页码参数替换为 page_num，没有页码参数时返回 None"""
+    parts = urlsplit(api_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    keys = [k for k, _ in query]
+    page_key = next((k for k in PAGE_PARAM_KEYS if k in keys), None)
+    if not page_key:
+        return None
+    query = [(k, str(page_num) if k == page_key else v) for k, v in query]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def fetch_catalog_json(url):
+    """直接请求接口 (不经过浏览器)，失败或 retcode 异常返回 None"""
+    try:
+        throttle(url)
+        req = urllib.request.Request(url, headers=API_HEADERS)
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            data = json.loads(resp.read().decode("utf-8"))
+        if isinstance(data, dict) and data.get("retcode", 0) != 0:
+            return None
+        return data
+    except Exception as e:
+        print(f"      [API Warn] {url}: {e}")
+    return None
+
+async def sniff_news_list_apis(page, catalog_url):
+    """打开目录页并监听 response，记录页面自身请求过的疑似新闻列表接口"""
+    candidates = []
+
+    def on_response(resp):
+        try:
+            ct = (resp.headers.get("content-type") or "").lower()
+            if "json" in ct and looks_like_news_list_api(resp.url) and resp.url not in candidates:
+                candidates.append(resp.url)
+        except: pass
+
+    print(f"--> [Collector] 嗅探新闻列表接口: {catalog_url}")
+    await throttle_async(catalog_url)
+    page.on("response", on_response)
+    try:
+        try:
+            await page.goto(catalog_url, wait_until="networkidle", timeout=60000)
+        except:
+            await page.goto(catalog_url, wait_until="load", timeout=60000)
+    finally:
+        page.remove_listener("response", on_response)
+    return candidates
+
+def pick_news_list_api(candidates):
+    """从候选接口中挑出第一页新闻最多且支持页码翻页的那个"""
+    best_url, best_count = None, 0
+    for url in candidates:
+        first_page_url = build_api_page_url(url, 1)
+        if not first_page_url:
+            continue
+        data = fetch_catalog_json(first_page_url)
+        count = len(extract_news_ids(data)) if data is not None else 0
+        if count > best_count:
+            best_url, best_count = url, count
+    return best_url
+
+def collect_news_urls_via_api(api_url, known_urls=None, newest_id=None):
+    """直接请求新闻列表接口逐页采集，接口不可用时返回 None"""
+    if not build_api_page_url(api_url, 1):
+        return None
+
+    collected_ids = set()
+    for page_num in range(1, CATALOG_API_MAX_PAGES + 1):
+        data = fetch_catalog_json(build_api_page_url(api_url, page_num))
+        if data is None:
+            if page_num == 1:
+                return None
+            break
+
+        ids = extract_news_ids(data)
+        new_ids = [i for i in ids if i not in collected_ids]
+        collected_ids.update(new_ids)
+        print(f"    [API] [Page {page_num}] 本页识别: {len(ids)} 条 | 新增: {len(new_ids)} | 总计: {len(collected_ids)}")
+
+        # 空页或整页都是重复数据 -> 已到末页
+        if not new_ids:
+            break
+        if known_urls is not None and is_page_known([f"{NEWS_URL_PREFIX}{i}" for i in ids], known_urls, newest_id):
+            print("    -> [Incremental] 整页均为已知新闻，停止翻页。")
+            break
+
+    if not collected_ids:
+        return None
+    return sorted([f"{NEWS_URL_PREFIX}{i}" for i in collected_ids], reverse=True)
+
+def load_cached_catalog_api():
+    if os.path.exists(CATALOG_API_CACHE_FILE):
+        try:
+            with open(CATALOG_API_CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f).get("api_url")
+        except: pass
+    return None
+
+def save_cached_catalog_api(api_url):
+    try:
+        with open(CATALOG_API_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"api_url": api_url, "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+    except: pass
+
+# ------------------------------------------------------------------------------
+# 增量采集：记录见过的最新新闻 ID (高水位)，翻到整页都已知时停止
+# ------------------------------------------------------------------------------
+CATALOG_STATE_FILE = os.path.join(DATA_DIR, "catalog_state.json")
+
+def news_id_of(url):
+    m = re.search(r"/news/(\d+)", url)
+    return int(m.group(1)) if m else None
+
+def is_page_known(page_urls, known_urls, newest_id):
+    """整页新闻都已见过 (在已知集合中，或 ID 不高于高水位)"""
+    if not page_urls:
+        return False
+    for u in page_urls:
+        if u in known_urls:
+            continue
+        nid = news_id_of(u)
+        if newest_id is not None and nid is not None and nid <= newest_id:
+            continue
+        return False
+    return True
+
+def load_catalog_state():
+    if os.path.exists(CATALOG_STATE_FILE):
+        try:
+            with open(CATALOG_STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except: pass
+    return {}
+
+def save_catalog_state(news_urls):
+    ids = [i for i in (news_id_of(u) for u in news_urls) if i is not None]
+    if not ids:
+        return
+    try:
+        with open(CATALOG_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"newest_id": max(ids), "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+    except: pass
+
+async def collect_news_urls(page, catalog_url, known_urls=None, newest_id=None):
+    """
+    采集所有新闻链接。
+    接口模式下先用缓存的接口地址直接翻页 (无需渲染页面)，缓存失效再嗅探目录页，
+    都不可用时回退到分页器翻页。
+    传入 known_urls (增量模式) 时，遇到整页都已知的页面即停止翻页。接口请求是阻塞 IO，放到线程池执行。
+    """
+    if CATALOG_DISCOVERY_MODE == "api":
+        loop = asyncio.get_running_loop()
+        api_url = load_cached_catalog_api()
+        urls = await loop.run_in_executor(None, collect_news_urls_via_api, api_url, known_urls, newest_id) if api_url else None
+        if urls is None:
+            candidates = await sniff_news_list_apis(page, catalog_url)
+            api_url = await loop.run_in_executor(None, pick_news_list_api, candidates)
+            urls = await loop.run_in_executor(None, collect_news_urls_via_api, api_url, known_urls, newest_id) if api_url else None
+
+        if urls is not None:
+            save_cached_catalog_api(api_url)
+            print(f"--> [Collector] 接口采集完成: {api_url}")
+            return urls
+        print("--> [Collector] 未找到可用的新闻列表接口，回退到分页器翻页...")
+
+    return await collect_news_urls_by_pager(page, catalog_url, known_urls, newest_id)
+
+# ------------------------------------------------------------------------------
+# 2.2 分页器采集 (回退方案)
+# ------------------------------------------------------------------------------
+
+async def collect_news_urls_by_pager(page, catalog_url, known_urls=None, newest_id=None):
     """
     采集所有新闻链接 (支持分页 + URL 归一化)
     """
     collected_urls = set()
     tabs = ["最新"]
     
+    await throttle_async(catalog_url)
     print(f"--> [Collector] 访问目录页: {catalog_url}")
     try:
         await page.goto(catalog_url, wait_until="networkidle", timeout=60000)
@@ -458,6 +898,10 @@ async def collect_news_urls(page, catalog_url):
             else:
                 empty_page_count = 0
 
+            if known_urls is not None and is_page_known(current_page_urls, known_urls, newest_id):
+                print("    -> [Incremental] 整页均为已知新闻，停止翻页。")
+                break
+
             try:
                 current_active = page.locator("a.mihoyo-pager-rich__button.mihoyo-pager-rich__current").first
                 if not await current_active.is_visible():
@@ -469,6 +913,7 @@ async def collect_news_urls(page, catalog_url):
                 next_page_btn = current_active.locator("xpath=following-sibling::a[contains(@class,'mihoyo-pager-rich__button')][1]")
                 
                 if await next_page_btn.count() > 0 and await next_page_btn.is_visible():
+                    await throttle_async(page.url)
                     await next_page_btn.click()
                     
                     page_changed = False
@@ -505,12 +950,46 @@ async def collect_news_urls(page, catalog_url):
 # Part 3: 主控逻辑
 # ==============================================================================
 
-async def task_runner(sem, context, url, output_root, processed_set, full_results, processed_file, results_file):
+async def task_runner(concurrency, context, url, output_root, processed_set, full_results, processed_file, results_file):
     """
-    带信号量的任务包装器
+    带自适应并发限制的任务包装器，任务结果反馈给 concurrency 用于调整并发
     """
-    async with sem:
-        await process_news_detail(context, url, output_root, processed_set, full_results, processed_file, results_file)
+    async with concurrency.slot() as slot:
+        result = await process_news_detail(context, url, output_root, processed_set, full_results, processed_file, results_file)
+        slot.outcome = classify_outcome(status_code=result.get("http_status"), error=result.get("error_msg"),
+                                        soft_404=result.get("soft_404", False))
+
+async def process_redownload_queue(context):
+    """启动时先补下 zzz_verify.py --requeue 记录的损坏 / 缺失文件 (用记住的提取码直接打开分享)"""
+    queue = load_redownload_queue(REDOWNLOAD_QUEUE_FILE)
+    if not queue:
+        return
+    print(f"--> [Requeue] 重下队列中有 {len(queue)} 个分享")
+    page = await context.new_page()
+    remaining = []
+    for item in queue:
+        link, local_path = item["url"], item["path"]
+        try:
+            await throttle_async(link)
+            await page.goto(link, wait_until="domcontentloaded", timeout=45000)
+            await wait_cloud_ready(page)
+            candidates = [item["pwd"]] if item.get("pwd") else []
+            if await attempt_cloud_login(page, candidates, await get_share_password(link)) is None:
+                raise Exception("提取码已失效")
+            os.makedirs(local_path, exist_ok=True)
+            mode, files = await download_content(page, local_path)
+            print(f"    -> [Requeue] {local_path}: {mode}, {len(files)} 个文件")
+            if mode in ("failed", "no_files_found"):
+                raise Exception(mode)
+            if DEDUP_STORE:
+                DEDUP_STORE.submit_dir(local_path)
+            if CHECKSUM_WRITER:
+                CHECKSUM_WRITER.submit(local_path)
+        except Exception as e:
+            print(f"    -> [Requeue Warn] {link}: {e}")
+            remaining.append(item)
+    await page.close()
+    save_redownload_queue(REDOWNLOAD_QUEUE_FILE, remaining)
 
 async def main():
     print("=== 全站采集脚本(多线程异步版) 启动 ===")
@@ -537,14 +1016,29 @@ async def main():
             accept_downloads=True,
             viewport={'width': 1920, 'height': 1080}
         )
+        await process_redownload_queue(context)
         
         # 1. 采集目录 (单线程采集，因为翻页依赖上下文)
         page = await context.new_page()
+        # 增量模式：以上次的目录 + 已处理记录 + 高水位 ID 判断"已知"，只翻到出现整页已知为止
+        previous_urls = []
+        if os.path.exists(news_urls_file):
+            try:
+                with open(news_urls_file, "r", encoding="utf-8") as f:
+                    previous_urls = json.load(f)
+            except: pass
+        full_sweep = CATALOG_FULL_SWEEP or "--full" in sys.argv or not previous_urls
+        known_urls = None if full_sweep else set(previous_urls) | processed_set
+        newest_id = None if full_sweep else load_catalog_state().get("newest_id")
+        print(f"--> 目录采集模式: {'全量' if full_sweep else f'增量 (高水位 ID: {newest_id})'}")
         try:
-            all_news_urls = await collect_news_urls(page, CATALOG_URL)
+            all_news_urls = await collect_news_urls(page, CATALOG_URL, known_urls, newest_id)
         except Exception as e:
             print(f"采集出错: {e}")
             all_news_urls = []
+        if not full_sweep:
+            all_news_urls = sorted(set(all_news_urls) | set(previous_urls), reverse=True)
+        save_catalog_state(all_news_urls)
         await page.close()
         
         with open(news_urls_file, "w", encoding="utf-8") as f:
@@ -572,15 +1066,15 @@ async def main():
             except: pass
 
         # 3. 并发执行
-        # 使用 Semaphore 限制并发数
-        sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
+        # 使用自适应并发限制器 (AIMD) 控制同时处理的任务数
+        concurrency = AdaptiveLimiter(CONCURRENCY_LIMIT, CONCURRENCY_MIN, CONCURRENCY_MAX, name="新闻并发")
         
-        print(f"--> 开始并发处理，并发数限制: {CONCURRENCY_LIMIT}")
+        print(f"--> 开始并发处理，初始并发数: {CONCURRENCY_LIMIT} (自适应范围 {CONCURRENCY_MIN}-{CONCURRENCY_MAX})")
         
         await_tasks = []
         for url in tasks_to_run:
             t = asyncio.create_task(
-                task_runner(sem, context, url, DOWNLOAD_ROOT, processed_set, full_results, processed_file, results_file)
+                task_runner(concurrency, context, url, DOWNLOAD_ROOT, processed_set, full_results, processed_file, results_file)
             )
             await_tasks.append(t)
             
@@ -588,6 +1082,14 @@ async def main():
             # gather 会等待所有任务完成
             await asyncio.gather(*await_tasks)
         
+        print(f"--> [Metrics] {concurrency.summary()}")
+        print(f"--> [Metrics] {CLOUD_FLIGHTS.summary()}")
+        if DEDUP_STORE:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, DEDUP_STORE.close)
+        if CHECKSUM_WRITER:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, CHECKSUM_WRITER.close)
         print("\n=== 全部任务结束 ===")
         await browser.close()
 
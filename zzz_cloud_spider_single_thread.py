@@ -1,17 +1,26 @@
 import re
 import json
 import os
+import sys
 import time
 import zipfile
 import shutil
-from urllib.parse import urljoin, urlparse
+import urllib.request
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from zzz_http import HttpClient
+from zzz_download import COLLECT_SHARE_FILES_JS, VALID_EXTS, GLOBAL_MAX_DOWNLOADS, share_headers, download_to_dir, download_share_files, fetch_remote_sizes, diff_manifest, remote_stamp, save_zip_stamp, zip_unchanged
+from zzz_extract import extract_zip
+from zzz_dedup import DedupStore
+from zzz_verify import ChecksumWriter, REDOWNLOAD_QUEUE_NAME, load_redownload_queue, save_redownload_queue
+from zzz_link_extract import extract_cloud_pairs, order_candidates, canonical_cloud_url, save_article_sample
+from zzz_rate_limit import limiter, throttle
 
 # ================= 配置区域 =================
 # 是否无头模式 (True=不显示浏览器, False=显示)
 HEADLESS = False
-# 操作减速 (毫秒)
-SLOW_MO = 100
+# 操作减速 (毫秒)，限频改由 zzz_rate_limit 按 host 统一控制，无需再给每个操作加延迟
+SLOW_MO = 0
 # 目录页入口
 CATALOG_URL = "https://zzz.mihoyo.com/news?utm_source=oolandingpage"
 # 基础数据存目录
@@ -20,6 +29,25 @@ DATA_DIR = "d:/Users/22542/Desktop/zzzspider/data"
 DOWNLOAD_ROOT = "d:/Users/22542/Desktop/zzzspider/downloads"
 # 最大处理新闻数 (设置为 None 则处理所有采集到的)
 MAX_NEWS_LIMIT = None 
+# 目录采集模式: "api" = 嗅探页面加载的新闻列表接口后直接请求接口翻页 (失败自动回退), "dom" = 点击分页器翻页
+CATALOG_DISCOVERY_MODE = "api"
+# 接口翻页的最大页数 (防止死循环)
+CATALOG_API_MAX_PAGES = 200
+# 是否强制全量重扫目录 (False = 增量: 翻到整页都是已知新闻即停止; 也可用命令行参数 --full 临时开启)
+CATALOG_FULL_SWEEP = False
+# 云盘页等待上限 (毫秒)：打开后等密码框/文件列表出现、提交提取码后等密码框消失，条件满足即继续
+CLOUD_READY_TIMEOUT = 10000
+LOGIN_WAIT_TIMEOUT = 5000
+# 云盘文件下载方式: "http" = 浏览器解锁后直连流式下载 (带上浏览器的 Cookie), "browser" = 全部经浏览器下载
+DOWNLOAD_MODE = "http"
+# 直连模式下单个分享内同时下载的文件数 (全进程另有 zzz_download.GLOBAL_MAX_DOWNLOADS 上限)
+SHARE_DOWNLOAD_PARALLEL = 4
+# 下载完成的文件按内容哈希去重，重复文件改为硬链接 (存储在 DOWNLOAD_ROOT/.blobs)
+DEDUP_ENABLED = True
+# 每个分享文件夹写 .checksums.json (SHA-256)，供 zzz_verify.py 校验
+CHECKSUM_MANIFEST = True
+# 保存新闻正文作 bench_link_extract.py 的语料 (None = 不保存)
+ARTICLE_CORPUS_DIR = os.path.join(DATA_DIR, "article_corpus")
 # ===========================================
 
 # 确保目录存在
@@ -38,27 +66,38 @@ def sanitize_filename(name, max_length=80):
 # Part 1: 详情页处理器 (复用并封装之前的逻辑)
 # ==============================================================================
 
-def extract_from_text(text):
-    """从文本中提取云盘链接和密码"""
-    all_urls = re.findall(r"https?://[^\s)\"'>]+", text)
-    cloud_links = []
-    seen = set()
-    for link in all_urls:
-        if "minas.mihoyo.com" in link and link not in seen:
-            cloud_links.append(link)
-            seen.add(link)
-    
-    pwd_pattern = re.compile(r"(?:密码|提取码)\s*[:：]\s*([A-Za-z0-9_-]{4,})")
-    passwords = []
-    seen_pwds = set()
-    for match in pwd_pattern.findall(text):
-        if match not in seen_pwds:
-            passwords.append(match)
-            seen_pwds.add(match)
-    return cloud_links, passwords
-
-def attempt_cloud_login(page, password_candidates):
-    """尝试云盘登录"""
+# 云盘页就绪判断：出现密码框、打包按钮或文件链接 (或已是 404 页) 即视为就绪
+CLOUD_READY_JS = """
+() => {
+    if (document.title.includes("404") || (document.body && document.body.innerText.includes("页面不存在"))) return true;
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const pwd = document.querySelectorAll("input[type='password'], input[placeholder*='密码'], input[placeholder*='提取']");
+    if (Array.from(pwd).some(visible)) return true;
+    const exts = [".jpg", ".png", ".gif", ".zip", ".rar", ".7z", ".mp4"];
+    return Array.from(document.querySelectorAll("a[href], button")).some((el) => {
+        if (!visible(el)) return false;
+        const t = (el.innerText || "").trim().toLowerCase();
+        return /zip|打包|全部下载/.test(t) || exts.some((e) => t.endsWith(e));
+    });
+}
+"""
+
+def wait_cloud_ready(page, timeout=CLOUD_READY_TIMEOUT):
+    """等待云盘页就绪 (条件满足立即返回，超时不报错，交给后续逻辑判断)"""
+    try:
+        page.wait_for_function(CLOUD_READY_JS, timeout=timeout)
+        return True
+    except:
+        return False
+
+def attempt_cloud_login(page, password_candidates, known_pwd=None):
+    """
+    尝试云盘登录 (候选码按优先级排列，与该链接配对的码在最前)。
+    known_pwd 为上次记下的提取码 / NO_PASSWORD。返回可用的提取码，无需密码返回 NO_PASSWORD，失败返回 None。
+    """
+    if known_pwd:
+        password_candidates = [known_pwd] + [c for c in password_candidates if c != known_pwd]
+
     input_selectors = ["input[type='password']", "input[placeholder*='密码']", "input[placeholder*='提取']"]
     confirm_selectors = ["button:has-text('确认')", "button:has-text('确定')", "button:has-text('进入')"]
 
@@ -69,10 +108,13 @@ def attempt_cloud_login(page, password_candidates):
             break
             
     if not found_input:
-        return None  # 无需密码
+        return NO_PASSWORD  # 无需密码
 
+    if known_pwd == NO_PASSWORD:
+        # 上次记为无需密码，分享后来加了密码：改用候选码，成功后覆盖记录
+        print("      [Login] 原记录无需密码，但出现了密码框，改用候选码尝试")
     print(f"      [Login] 发现密码框，开始尝试...")
-    for pwd in password_candidates:
+    for attempt, pwd in enumerate(password_candidates, 1):
         try:
             page.fill(found_input, pwd)
             clicked = False
@@ -84,9 +126,14 @@ def attempt_cloud_login(page, password_candidates):
             if not clicked:
                 page.press(found_input, "Enter")
             
-            time.sleep(1.5)
-            if not page.locator(found_input).is_visible():
-                return pwd
+            # 密码框消失即登录成功，超时视为密码错误
+            try:
+                page.locator(found_input).first.wait_for(state="hidden", timeout=LOGIN_WAIT_TIMEOUT)
+            except:
+                continue
+            print(f"      [Login] 第 {attempt} 次尝试成功")
+            wait_cloud_ready(page)
+            return pwd
         except:
             pass
     return None
@@ -114,12 +161,63 @@ def determine_local_folder(page, url):
             
     return sanitize_filename(folder_name)
 
+# 直连下载共用的 keep-alive 连接池 (请求同样经过共享限频器)，每个 host 的连接数与全局下载上限一致
+DOWNLOAD_CLIENT = HttpClient(max_per_host=GLOBAL_MAX_DOWNLOADS, timeout=60, limiter=limiter)
+# 内容寻址去重存储，哈希在后台线程池里做，不阻塞下载
+DEDUP_STORE = DedupStore(os.path.join(DOWNLOAD_ROOT, ".blobs")) if DEDUP_ENABLED else None
+# 校验清单在后台线程里增量更新；zzz_verify.py --requeue 写入的重下队列在启动时先处理
+CHECKSUM_WRITER = ChecksumWriter() if CHECKSUM_MANIFEST else None
+REDOWNLOAD_QUEUE_FILE = os.path.join(DATA_DIR, REDOWNLOAD_QUEUE_NAME)
+
+def share_request_headers(page):
+    """直连请求头：浏览器会话的 Cookie + UA，Referer 为分享页"""
+    cookies = page.context.cookies()
+    return share_headers(cookies, page.url, page.evaluate("navigator.userAgent"))
+
+def collect_share_files(page):
+    """直连模式：收集已解锁分享页上的文件 ([{name, url}]) 及请求头"""
+    found = page.evaluate(COLLECT_SHARE_FILES_JS, list(VALID_EXTS))
+    files = [{"name": sanitize_filename(f["name"]), "url": f["url"]} for f in found]
+    return files, share_request_headers(page)
+
+def share_manifest(page):
+    """清单：已解锁分享页上的文件 ([{name, url, size}]) 及请求头，直连模式下补全远程大小；失败返回 ([], None)"""
+    try:
+        files, headers = collect_share_files(page)
+    except Exception as e:
+        print(f"      [Manifest] 列出文件失败: {e}")
+        return [], None
+    if files and DOWNLOAD_MODE == "http":
+        fetch_remote_sizes(DOWNLOAD_CLIENT, files, headers, SHARE_DOWNLOAD_PARALLEL)
+    return files, headers
+
+def direct_zip_url(page, btn):
+    """打包按钮是真实下载地址的 <a href> 时返回绝对地址，否则返回 None (只能点击后由浏览器下载)"""
+    try:
+        href = btn.get_attribute("href")
+    except:
+        return None
+    url = urljoin(page.url, href) if href else ""
+    return url if url.startswith(("http://", "https://")) else None
+
 def download_content(page, local_dir):
     """核心下载逻辑：优先ZIP，降级逐个文件"""
     downloaded_files = []
     mode = "failed"
     
-    # 1. 尝试 ZIP
+    # 0. 清单比对：列出分享里的文件及大小，与本地文件夹比较；已完整则整个跳过，只缺部分时只补缺的文件
+    files, headers = share_manifest(page)
+    complete = []
+    if files:
+        missing, complete = diff_manifest(files, local_dir)
+        if not missing:
+            print(f"      [Manifest] 本地已完整 ({len(complete)} 个文件)，跳过下载")
+            return "up_to_date", complete
+        if complete:
+            print(f"      [Manifest] 本地已有 {len(complete)}/{len(files)} 个文件，只补下缺少的 {len(missing)} 个")
+        files = missing
+    
+    # 1. 尝试 ZIP (本地已有部分文件时不再整包下载)
     zip_btns = page.locator("button, a").filter(has_text=re.compile("ZIP|打包|全部下载", re.IGNORECASE)).all()
     target_btn = None
     for btn in zip_btns:
@@ -127,23 +225,50 @@ def download_content(page, local_dir):
             target_btn = btn
             break
             
-    if target_btn:
+    if target_btn and not complete:
         print(f"      [ZIP] 发现打包下载按钮，尝试下载...")
         try:
-            with page.expect_download(timeout=60000) as download_info:
-                target_btn.click()
-            
-            download = download_info.value
-            safe_name = sanitize_filename(download.suggested_filename)
+            remote = None
+            zip_url = direct_zip_url(page, target_btn) if DOWNLOAD_MODE == "http" else None
+            if zip_url:
+                # 直连流式下载；远程 ZIP 与上次解压的一致且成员都在时不再下载
+                headers = share_request_headers(page)
+                try:
+                    remote = remote_stamp(DOWNLOAD_CLIENT, zip_url, headers)
+                except Exception:
+                    remote = None
+                members = zip_unchanged(local_dir, remote=remote) if remote else None
+                if members:
+                    print(f"      [ZIP] 远程 ZIP 未变化，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                safe_name, _ = download_to_dir(DOWNLOAD_CLIENT, zip_url, local_dir, headers, sanitize_filename)
+            else:
+                throttle(page.url)
+                with page.expect_download(timeout=60000) as download_info:
+                    target_btn.click()
+                
+                download = download_info.value
+                safe_name = sanitize_filename(download.suggested_filename)
+                # 浏览器下载拿不到大小，按文件名与解压出的成员判断
+                members = zip_unchanged(local_dir, name=safe_name)
+                if members:
+                    download.cancel()
+                    print(f"      [ZIP] {safe_name} 上次已解压，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                if os.path.exists(os.path.join(local_dir, safe_name)):
+                    # 上次已下载 (未解压或不是 ZIP)，不再重复下载
+                    download.cancel()
+                    print(f"      [Skip] 文件已存在: {safe_name}")
+                else:
+                    download.save_as(os.path.join(local_dir, safe_name))
             save_path = os.path.join(local_dir, safe_name)
-            download.save_as(save_path)
             
-            # 解压处理
+            # 解压处理 (逐个成员增量解压，未变化的文件跳过)
             if zipfile.is_zipfile(save_path):
                 try:
-                    with zipfile.ZipFile(save_path, 'r') as zf:
-                        zf.extractall(local_dir)
-                        downloaded_files.extend(zf.namelist())
+                    names, _ = extract_zip(save_path, local_dir)
+                    downloaded_files.extend(names)
+                    save_zip_stamp(save_path, local_dir, remote) # 删除前记下 ZIP 的大小 / ETag 与成员，重跑时据此跳过
                     os.remove(save_path) # 删除原 ZIP
                     mode = "zip_extracted"
                 except Exception as e:
@@ -160,6 +285,15 @@ def download_content(page, local_dir):
     # 2. 降级：逐个文件
     print("      [Fallback] 尝试逐个文件下载...")
     valid_exts = ('.jpg', '.png', '.gif', '.zip', '.rar', '.7z', '.mp4')
+    if DOWNLOAD_MODE == "http":
+        # 文件链接在清单阶段已收集 (只剩本地缺少的)
+        if files:
+            print(f"      [HTTP] 直连下载 {len(files)} 个文件...")
+            downloaded, failed = download_share_files(DOWNLOAD_CLIENT, files, local_dir, headers, SHARE_DOWNLOAD_PARALLEL)
+            if not failed:
+                return "http_files", complete + downloaded
+            # 已下载的文件在下面的循环里会按 "已存在" 跳过
+            print(f"      [HTTP] {len(failed)} 个文件直连失败，交给浏览器补下...")
     try:
         links = page.locator("a[href]").all()
         file_links = [l for l in links if l.is_visible() and l.inner_text().lower().endswith(valid_exts)]
@@ -172,7 +306,7 @@ def download_content(page, local_dir):
             safe_fname = sanitize_filename(fname)
             
             # 检查文件是否已存在 (去重)
-            if os.path.exists(os.path.join(local_dir, safe_fname)):
+            if safe_fname in complete or os.path.exists(os.path.join(local_dir, safe_fname)):
                 print(f"      [Skip] 文件已存在: {safe_fname}")
                 downloaded_files.append(safe_fname)
                 continue
@@ -180,16 +314,16 @@ def download_content(page, local_dir):
             # 重试逻辑
             for attempt in range(2):
                 try:
+                    throttle(page.url)
                     with page.expect_download(timeout=15000) as di:
                         link.click(timeout=3000)
                     dl = di.value
                     sname = sanitize_filename(dl.suggested_filename) or safe_fname
                     dl.save_as(os.path.join(local_dir, sname))
                     downloaded_files.append(sname)
-                    time.sleep(0.5)
                     break
                 except:
-                    if attempt == 0: time.sleep(1)
+                    pass
         
         if downloaded_files:
             mode = "individual_files"
@@ -203,25 +337,56 @@ def download_content(page, local_dir):
 # ==============================================================================
 FOLDER_MAP_FILE = os.path.join(DATA_DIR, "folder_map.json")
 
-def get_assigned_folder(cloud_url, suggested_name, root_dir):
-    """
-    根据云盘 URL 获取固定的本地文件夹路径。
-    如果已存在映射，则复用；否则分配新名（处理重名）并保存映射。
-    """
-    # 1. 加载映射
+# folder_map.json: 规范化的云盘 URL -> {"path": 本地目录, "pwd": 上次可用的提取码, "url": 原始链接}
+# 无需密码的云盘记为 pwd = NO_PASSWORD，下次不再试提取码 (若又出现密码框仍会用候选码重试并覆盖)
+NO_PASSWORD = ""
+
+def load_folder_map():
     mapping = {}
     if os.path.exists(FOLDER_MAP_FILE):
         try:
             with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
                 mapping = json.load(f)
         except: pass
+    # 兼容旧格式：值直接是路径字符串
+    for key, entry in mapping.items():
+        if not isinstance(entry, dict):
+            mapping[key] = {"path": entry}
+    return mapping
+
+def save_folder_map(mapping):
+    try:
+        with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, indent=2, ensure_ascii=False)
+    except: pass
+
+def share_map_key(mapping, cloud_url):
+    """
+    云盘链接在 folder_map 中的 key：统一用规范形式 (canonical_cloud_url)，
+    迁移前按原始写法保存的旧条目、或按旧规则规范化的条目 (其 url 为原始链接) 若规范形式相同则沿用旧 key。
+    """
+    key = canonical_cloud_url(cloud_url)
+    if key in mapping:
+        return key
+    for old_key, entry in mapping.items():
+        if canonical_cloud_url(entry.get("url") or old_key) == key:
+            return old_key
+    return key
+
+def get_assigned_folder(cloud_url, suggested_name, root_dir):
+    """
+    根据云盘 URL 获取固定的本地文件夹路径。
+    如果已存在映射，则复用；否则分配新名（处理重名）并保存映射。
+    """
+    # 1. 加载映射
+    mapping = load_folder_map()
     
     # 2. 检查是否已分配
-    # 使用 url 的 path 部分作为 key 避免 query 参数干扰
-    map_key = cloud_url
+    # 按规范化后的链接作 key，同一分享的不同写法共用一个文件夹
+    map_key = share_map_key(mapping, cloud_url)
     
-    if map_key in mapping:
-        assigned_path = mapping[map_key]
+    if mapping.get(map_key, {}).get("path"):
+        assigned_path = mapping[map_key]["path"]
         return assigned_path
     
     # 3. 分配新路径
@@ -229,7 +394,7 @@ def get_assigned_folder(cloud_url, suggested_name, root_dir):
     final_path = base_path
     
     # 获取所有已经被占用的路径集合
-    used_paths = set(p.lower().replace('\\', '/') for p in mapping.values())
+    used_paths = set(e["path"].lower().replace('\\', '/') for e in mapping.values() if e.get("path"))
     
     counter = 1
     # 冲突检测：路径物理存在 OR 路径已被其他 URL 预占
@@ -245,14 +410,27 @@ def get_assigned_folder(cloud_url, suggested_name, root_dir):
         counter += 1
         
     # 4. 保存映射
-    mapping[map_key] = final_path
-    try:
-        with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
-            json.dump(mapping, f, indent=2, ensure_ascii=False)
-    except: pass
+    entry = mapping.setdefault(map_key, {})
+    entry["path"] = final_path
+    entry.setdefault("url", cloud_url)  # 原始链接，按重下队列补下时用它打开
+    save_folder_map(mapping)
     
     return final_path
 
+def get_share_password(cloud_url):
+    """上次可用的提取码；NO_PASSWORD 表示无需密码，None 表示未知"""
+    mapping = load_folder_map()
+    return mapping.get(share_map_key(mapping, cloud_url), {}).get("pwd")
+
+def remember_share_password(cloud_url, pwd):
+    """登录成功后记下可用的提取码 (pwd 为 None 表示登录失败，不记录)"""
+    if pwd is None:
+        return
+    mapping = load_folder_map()
+    entry = mapping.setdefault(share_map_key(mapping, cloud_url), {})
+    if entry.get("pwd") != pwd:
+        entry["pwd"] = pwd
+        save_folder_map(mapping)
 def process_news_detail(page, news_url, output_root):
     """处理单个新闻详情页"""
     result = {
@@ -265,13 +443,15 @@ def process_news_detail(page, news_url, output_root):
     
     try:
         print(f"  > [Detail] 打开新闻页: {news_url}")
+        throttle(news_url)
         page.goto(news_url, wait_until="domcontentloaded", timeout=45000)
         try:
             page.wait_for_load_state("networkidle", timeout=5000)
         except: pass
         
         text = page.inner_text("body")
-        cloud_links, pwds = extract_from_text(text)
+        save_article_sample(ARTICLE_CORPUS_DIR, news_url, text, ext=".txt")
+        cloud_links, pwds, paired = extract_cloud_pairs(text, minas_only=True)
         result["cloud_links_found"] = cloud_links
         
         if not cloud_links:
@@ -293,16 +473,15 @@ def process_news_detail(page, news_url, output_root):
             created_dir_path = None
 
             try:
+                throttle(link)
                 page.goto(link, wait_until="domcontentloaded", timeout=45000)
-                time.sleep(1)
+                wait_cloud_ready(page)
                 
-                used_pwd = attempt_cloud_login(page, pwds)
+                # 登录成功后会等到文件列表出现
+                used_pwd = attempt_cloud_login(page, order_candidates(link, pwds, paired), get_share_password(link))
+                remember_share_password(link, used_pwd)
                 disk_res["pwd"] = used_pwd
                 
-                try:
-                    page.wait_for_load_state("networkidle", timeout=5000)
-                except: pass
-                
                 # 确定文件夹名 (使用映射表管理)
                 folder_name = determine_local_folder(page, link)
                 local_path = get_assigned_folder(link, folder_name, output_root)
@@ -315,6 +494,10 @@ def process_news_detail(page, news_url, output_root):
                 print(f"    -> [Disk] 下载到: {local_path}")
                 
                 mode, files = download_content(page, local_path)
+                if DEDUP_STORE and files:
+                    DEDUP_STORE.submit_dir(local_path)
+                if CHECKSUM_WRITER and files:
+                    CHECKSUM_WRITER.submit(local_path)
                 disk_res["mode"] = mode
                 disk_res["files"] = files
 
@@ -347,7 +530,214 @@ def process_news_detail(page, news_url, output_root):
 # Part 2: 目录页采集器
 # ==============================================================================
 
-def collect_news_urls(page, catalog_url):
+# ------------------------------------------------------------------------------
+# 2.1 接口优先采集：嗅探目录页自己加载的新闻列表 JSON，之后直接请求该接口翻页
+# ------------------------------------------------------------------------------
+CATALOG_API_CACHE_FILE = os.path.join(DATA_DIR, "catalog_api.json")
+NEWS_URL_PREFIX = "https://zzz.mihoyo.com/news/"
+# 列表项中可能的新闻 ID 字段 / URL 中可能的页码参数
+NEWS_ID_KEYS = ("iInfoId", "contentId", "content_id", "id")
+PAGE_PARAM_KEYS = ("iPage", "page", "pageNum", "page_num", "pageNo", "current")
+API_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Referer": "https://zzz.mihoyo.com/"
+}
+
+def looks_like_news_list_api(url):
+    """启发式判断是否为新闻列表接口 (思路同 mystry.py 的 looks_like_list_api)"""
+    u = url.lower()
+    return "mihoyo" in u and "api" in u and ("list" in u or "content" in u)
+
+def extract_news_ids(data):
+    """在 JSON 中找到第一个带数字 ID 字段的对象列表，返回其中的新闻 ID"""
+    if isinstance(data, list):
+        items = [x for x in data if isinstance(x, dict)]
+        if items:
+            for key in NEWS_ID_KEYS:
+                ids = [str(x[key]) for x in items if str(x.get(key, "")).isdigit()]
+                if ids:
+                    return ids
+        for x in data:
+            ids = extract_news_ids(x)
+            if ids:
+                return ids
+    elif isinstance(data, dict):
+        for v in data.values():
+            ids = extract_news_ids(v)
+            if ids:
+                return ids
+    return []
+
+def build_api_page_url(api_url, page_num):
+    """把接口 URL 中的页码参数替换为 page_num，没有页码参数时返回 None"""
+    parts = urlsplit(api_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    keys = [k for k, _ in query]
+    page_key = next((k for k in PAGE_PARAM_KEYS if k in keys), None)
+    if not page_key:
+        return None
+    query = [(k, str(page_num) if k == page_key else v) for k, v in query]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def fetch_catalog_json(url):
+    """直接请求接口 (不经过浏览器)，失败或 retcode 异常返回 None"""
+    try:
+        throttle(url)
+        req = urllib.request.Request(url, headers=API_HEADERS)
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            data = json.loads(resp.read().decode("utf-8"))
+        if isinstance(data, dict) and data.get("retcode", 0) != 0:
+            return None
+        return data
+    except Exception as e:
+        print(f"      [API Warn] {url}: {e}")
+    return None
+
+def sniff_news_list_apis(page, catalog_url):
+    """打开目录页并监听 response，记录页面自身请求过的疑似新闻列表接口"""
+    candidates = []
+
+    def on_response(resp):
+        try:
+            ct = (resp.headers.get("content-type") or "").lower()
+            if "json" in ct and looks_like_news_list_api(resp.url) and resp.url not in candidates:
+                candidates.append(resp.url)
+        except: pass
+
+    print(f"--> [Collector] 嗅探新闻列表接口: {catalog_url}")
+    throttle(catalog_url)
+    page.on("response", on_response)
+    try:
+        try:
+            page.goto(catalog_url, wait_until="networkidle", timeout=60000)
+        except:
+            page.goto(catalog_url, wait_until="load", timeout=60000)
+    finally:
+        page.remove_listener("response", on_response)
+    return candidates
+
+def pick_news_list_api(candidates):
+    """从候选接口中挑出第一页新闻最多且支持页码翻页的那个"""
+    best_url, best_count = None, 0
+    for url in candidates:
+        first_page_url = build_api_page_url(url, 1)
+        if not first_page_url:
+            continue
+        data = fetch_catalog_json(first_page_url)
+        count = len(extract_news_ids(data)) if data is not None else 0
+        if count > best_count:
+            best_url, best_count = url, count
+    return best_url
+
+def collect_news_urls_via_api(api_url, known_urls=None, newest_id=None):
+    """直接请求新闻列表接口逐页采集，接口不可用时返回 None"""
+    if not build_api_page_url(api_url, 1):
+        return None
+
+    collected_ids = set()
+    for page_num in range(1, CATALOG_API_MAX_PAGES + 1):
+        data = fetch_catalog_json(build_api_page_url(api_url, page_num))
+        if data is None:
+            if page_num == 1:
+                return None
+            break
+
+        ids = extract_news_ids(data)
+        new_ids = [i for i in ids if i not in collected_ids]
+        collected_ids.update(new_ids)
+        print(f"    [API] [Page {page_num}] 本页识别: {len(ids)} 条 | 新增: {len(new_ids)} | 总计: {len(collected_ids)}")
+
+        # 空页或整页都是重复数据 -> 已到末页
+        if not new_ids:
+            break
+        if known_urls is not None and is_page_known([f"{NEWS_URL_PREFIX}{i}" for i in ids], known_urls, newest_id):
+            print("    -> [Incremental] 整页均为已知新闻，停止翻页。")
+            break
+
+    if not collected_ids:
+        return None
+    return sorted([f"{NEWS_URL_PREFIX}{i}" for i in collected_ids], reverse=True)
+
+def load_cached_catalog_api():
+    if os.path.exists(CATALOG_API_CACHE_FILE):
+        try:
+            with open(CATALOG_API_CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f).get("api_url")
+        except: pass
+    return None
+
+def save_cached_catalog_api(api_url):
+    try:
+        with open(CATALOG_API_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"api_url": api_url, "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+    except: pass
+
+# ------------------------------------------------------------------------------
+# 增量采集：记录见过的最新新闻 ID (高水位)，翻到整页都已知时停止
+# ------------------------------------------------------------------------------
+CATALOG_STATE_FILE = os.path.join(DATA_DIR, "catalog_state.json")
+
+def news_id_of(url):
+    m = re.search(r"/news/(\d+)", url)
+    return int(m.group(1)) if m else None
+
+def is_page_known(page_urls, known_urls, newest_id):
+    """整页新闻都已见过 (在已知集合中，或 ID 不高于高水位)"""
+    if not page_urls:
+        return False
+    for u in page_urls:
+        if u in known_urls:
+            continue
+        nid = news_id_of(u)
+        if newest_id is not None and nid is not None and nid <= newest_id:
+            continue
+        return False
+    return True
+
+def load_catalog_state():
+    if os.path.exists(CATALOG_STATE_FILE):
+        try:
+            with open(CATALOG_STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except: pass
+    return {}
+
+def save_catalog_state(news_urls):
+    ids = [i for i in (news_id_of(u) for u in news_urls) if i is not None]
+    if not ids:
+        return
+    try:
+        with open(CATALOG_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"newest_id": max(ids), "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+    except: pass
+
+def collect_news_urls(page, catalog_url, known_urls=None, newest_id=None):
+    """
+    采集所有新闻链接。
+    接口模式下先用缓存的接口地址直接翻页 (无需渲染页面)，缓存失效再嗅探目录页，
+    都不可用时回退到分页器翻页。
+    传入 known_urls (增量模式) 时，遇到整页都已知的页面即停止翻页。
+    """
+    if CATALOG_DISCOVERY_MODE == "api":
+        api_url = load_cached_catalog_api()
+        urls = collect_news_urls_via_api(api_url, known_urls, newest_id) if api_url else None
+        if urls is None:
+            api_url = pick_news_list_api(sniff_news_list_apis(page, catalog_url))
+            urls = collect_news_urls_via_api(api_url, known_urls, newest_id) if api_url else None
+
+        if urls is not None:
+            save_cached_catalog_api(api_url)
+            print(f"--> [Collector] 接口采集完成: {api_url}")
+            return urls
+        print("--> [Collector] 未找到可用的新闻列表接口，回退到分页器翻页...")
+
+    return collect_news_urls_by_pager(page, catalog_url, known_urls, newest_id)
+
+# ------------------------------------------------------------------------------
+# 2.2 分页器采集 (回退方案)
+# ------------------------------------------------------------------------------
+
+def collect_news_urls_by_pager(page, catalog_url, known_urls=None, newest_id=None):
     """
     采集所有新闻链接 (支持分页 + URL 归一化)
     返回: set(urls) 列表
@@ -355,6 +745,7 @@ def collect_news_urls(page, catalog_url):
     collected_urls = set()
     tabs = ["最新"]
     
+    throttle(catalog_url)
     print(f"--> [Collector] 访问目录页: {catalog_url}")
     try:
         page.goto(catalog_url, wait_until="networkidle", timeout=60000)
@@ -450,6 +841,10 @@ def collect_news_urls(page, catalog_url):
             else:
                 empty_page_count = 0
 
+            if known_urls is not None and is_page_known(current_page_urls, known_urls, newest_id):
+                print("    -> [Incremental] 整页均为已知新闻，停止翻页。")
+                break
+
             # D. 执行翻页 (Strategy A: current -> next sibling)
             try:
                 # 重新定位 current 元素确保不过期
@@ -477,6 +872,7 @@ def collect_news_urls(page, catalog_url):
                     except: pass
 
                     # 点击下一页
+                    throttle(page.url)
                     next_page_btn.click()
                     
                     # 等待翻页成功的信号 (current 页码变化)
@@ -516,6 +912,38 @@ def collect_news_urls(page, catalog_url):
     final_list = sorted(list(collected_urls), reverse=True)
     return final_list
 
+def process_redownload_queue(context):
+    """启动时先补下 zzz_verify.py --requeue 记录的损坏 / 缺失文件 (用记住的提取码直接打开分享)"""
+    queue = load_redownload_queue(REDOWNLOAD_QUEUE_FILE)
+    if not queue:
+        return
+    print(f"--> [Requeue] 重下队列中有 {len(queue)} 个分享")
+    page = context.new_page()
+    remaining = []
+    for item in queue:
+        link, local_path = item["url"], item["path"]
+        try:
+            throttle(link)
+            page.goto(link, wait_until="domcontentloaded", timeout=45000)
+            wait_cloud_ready(page)
+            candidates = [item["pwd"]] if item.get("pwd") else []
+            if attempt_cloud_login(page, candidates, get_share_password(link)) is None:
+                raise Exception("提取码已失效")
+            os.makedirs(local_path, exist_ok=True)
+            mode, files = download_content(page, local_path)
+            print(f"    -> [Requeue] {local_path}: {mode}, {len(files)} 个文件")
+            if mode in ("failed", "no_files_found"):
+                raise Exception(mode)
+            if DEDUP_STORE:
+                DEDUP_STORE.submit_dir(local_path)
+            if CHECKSUM_WRITER:
+                CHECKSUM_WRITER.submit(local_path)
+        except Exception as e:
+            print(f"    -> [Requeue Warn] {link}: {e}")
+            remaining.append(item)
+    page.close()
+    save_redownload_queue(REDOWNLOAD_QUEUE_FILE, remaining)
+
 # ==============================================================================
 # Part 3: 主控逻辑 (断点续跑 + 调度)
 # ==============================================================================
@@ -548,15 +976,30 @@ def main():
             accept_downloads=True,
             viewport={'width': 1920, 'height': 1080}
         )
+        process_redownload_queue(context)
         
         # 2.1 采集目录 (除非我们想跳过采集直接用本地缓存)
         # 这里每次都采集一下，防止有新内容
         page = context.new_page()
+        # 增量模式：以上次的目录 + 已处理记录 + 高水位 ID 判断"已知"，只翻到出现整页已知为止
+        previous_urls = []
+        if os.path.exists(news_urls_file):
+            try:
+                with open(news_urls_file, "r", encoding="utf-8") as f:
+                    previous_urls = json.load(f)
+            except: pass
+        full_sweep = CATALOG_FULL_SWEEP or "--full" in sys.argv or not previous_urls
+        known_urls = None if full_sweep else set(previous_urls) | processed_set
+        newest_id = None if full_sweep else load_catalog_state().get("newest_id")
+        print(f"--> 目录采集模式: {'全量' if full_sweep else f'增量 (高水位 ID: {newest_id})'}")
         try:
-            all_news_urls = collect_news_urls(page, CATALOG_URL)
+            all_news_urls = collect_news_urls(page, CATALOG_URL, known_urls, newest_id)
         except Exception as e:
             print(f"采集出错: {e}")
             all_news_urls = []
+        if not full_sweep:
+            all_news_urls = sorted(set(all_news_urls) | set(previous_urls), reverse=True)
+        save_catalog_state(all_news_urls)
         page.close()
         
         # 保存采集到的 URL 列表
@@ -604,10 +1047,11 @@ def main():
             
             with open(results_file, "w", encoding="utf-8") as f:
                 json.dump(full_results, f, indent=2, ensure_ascii=False)
-                
-            # 简单限频
-            time.sleep(1)
 
+        if DEDUP_STORE:
+            DEDUP_STORE.close()
+        if CHECKSUM_WRITER:
+            CHECKSUM_WRITER.close()
         print("\n=== 全部任务结束 ===")
         browser.close()
 
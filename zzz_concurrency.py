@@ -0,0 +1,201 @@
+import time
+import asyncio
+from collections import deque
+
+# ================= 自适应并发控制 (AIMD) =================
+# 替代固定大小的 asyncio.Semaphore：
+#   * 加性增 —— 近期错误率低、延迟没有明显变慢时，每成功完成 "当前上限" 个任务，上限 +1
+#              (只统计开始时并发已用满的任务：在途远低于上限时的成功不能证明更高的并发是安全的)
+#   * 乘性减 —— 遇到 429/503 (风控)、超时，或短时间内连续出现 soft 404 时，上限减半
+# 当前上限 (limit) 与各类结果计数通过 snapshot()/summary() 暴露，变化时也会打印出来。
+
+# 结果类型
+OUTCOME_OK = "ok"
+OUTCOME_THROTTLED = "throttled"  # 429 / 503
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_SOFT_404 = "soft404"     # HTTP 200 但内容是错误页 (通常也是风控)
+OUTCOME_ERROR = "error"          # 其他异常，只计入错误率
+
+
+def classify_outcome(status_code=None, error=None, soft_404=False):
+    """把一次任务的 HTTP 状态码 / 异常 / soft 404 标记归类为结果类型"""
+    if status_code in (429, 503):
+        return OUTCOME_THROTTLED
+    if soft_404:
+        return OUTCOME_SOFT_404
+    if error:
+        if isinstance(error, asyncio.TimeoutError) or "timeout" in str(error).lower():
+            return OUTCOME_TIMEOUT
+        return OUTCOME_ERROR
+    return OUTCOME_OK
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 并发限制器，需在事件循环内创建。
+    用法:
+        async with limiter.slot() as slot:
+            ...
+            slot.outcome = classify_outcome(...)
+    """
+    def __init__(self, initial, min_limit=1, max_limit=16, name="并发",
+                 window=20, max_error_rate=0.2, latency_factor=2.0,
+                 soft_404_burst=3, decrease_cooldown=10.0):
+        self.name = name
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_error_rate = max_error_rate
+        self.latency_factor = latency_factor
+        self.soft_404_burst = soft_404_burst
+        self.decrease_cooldown = decrease_cooldown
+
+        self.in_flight = 0
+        self.recent = deque(maxlen=window)  # 最近的结果类型
+        self.latency_ewma = None
+        self.successes_since_change = 0
+        self.last_decrease = 0.0
+        self.counts = {k: 0 for k in (OUTCOME_OK, OUTCOME_THROTTLED, OUTCOME_TIMEOUT, OUTCOME_SOFT_404, OUTCOME_ERROR)}
+        self._cond = asyncio.Condition()
+
+    def slot(self):
+        return _Slot(self)
+
+    async def acquire(self):
+        """占用一个名额，返回 (开始时间, 是否用满上限)"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            saturated = self.in_flight >= self.limit
+        return time.monotonic(), saturated
+
+    async def release(self, started, outcome=OUTCOME_OK, saturated=True):
+        latency = time.monotonic() - started
+        async with self._cond:
+            self.in_flight -= 1
+            self._record(latency, outcome, saturated)
+            self._cond.notify_all()
+
+    def _record(self, latency, outcome, saturated=True):
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        self.recent.append(outcome)
+
+        if outcome in (OUTCOME_THROTTLED, OUTCOME_TIMEOUT):
+            self._decrease(outcome)
+            return
+        if outcome == OUTCOME_SOFT_404:
+            if list(self.recent)[-10:].count(OUTCOME_SOFT_404) >= self.soft_404_burst:
+                self._decrease("soft404 burst")
+            return
+        if outcome != OUTCOME_OK:
+            return
+
+        # 延迟明显高于近期均值时不加并发 (均值仍然更新，持续变慢会被当作新常态)
+        slow = self.latency_ewma is not None and latency > self.latency_ewma * self.latency_factor
+        self.latency_ewma = latency if self.latency_ewma is None else self.latency_ewma * 0.9 + latency * 0.1
+        errors = sum(1 for o in self.recent if o != OUTCOME_OK)
+        if slow or errors > len(self.recent) * self.max_error_rate or not saturated:
+            return
+
+        self.successes_since_change += 1
+        if self.successes_since_change >= self.limit and self.limit < self.max_limit:
+            self._set_limit(self.limit + 1, "healthy")
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        # 同一波在途请求往往会一起失败，冷却时间内只减一次
+        if now - self.last_decrease < self.decrease_cooldown:
+            return
+        self.last_decrease = now
+        self._set_limit(max(self.min_limit, self.limit // 2), reason)
+
+    def _set_limit(self, new_limit, reason):
+        self.successes_since_change = 0
+        if new_limit == self.limit:
+            return
+        print(f"    [AIMD] {self.name}上限 {self.limit} -> {new_limit} ({reason})")
+        self.limit = new_limit
+
+    def snapshot(self):
+        """当前指标"""
+        data = {"limit": self.limit, "in_flight": self.in_flight, "latency_ewma": self.latency_ewma}
+        data.update(self.counts)
+        return data
+
+    def summary(self):
+        c = self.counts
+        return (f"{self.name}上限 {self.limit} | 在途 {self.in_flight} | 成功 {c[OUTCOME_OK]} | "
+                f"限流 {c[OUTCOME_THROTTLED]} | 超时 {c[OUTCOME_TIMEOUT]} | soft404 {c[OUTCOME_SOFT_404]} | 其他错误 {c[OUTCOME_ERROR]}")
+
+
+class _Slot:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.outcome = OUTCOME_OK
+        self.started = None
+        self.saturated = False
+
+    async def __aenter__(self):
+        self.started, self.saturated = await self.limiter.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.outcome == OUTCOME_OK:
+            self.outcome = classify_outcome(error=exc)
+        await self.limiter.release(self.started, self.outcome, self.saturated)
+        return False
+
+
+class SingleFlight:
+    """
+    进程内 single-flight 去重 (需在事件循环内使用)：同一个 key 同时只执行一次，
+    执行期间再来的协程不重复执行，等待第一个的结果 (或异常) 直接复用。
+    用法:
+        result, shared = await flights.run(key, func, *args)   # shared=True 表示复用了别人的结果
+    retry(result) 返回 True 时等待者不复用该结果，自己重新执行 (如执行者的提取码都不对，而等待者有别的候选码)。
+    """
+    def __init__(self, name="single-flight"):
+        self.name = name
+        self.runs = 0
+        self.hits = 0
+        self.retries = 0
+        self._inflight = {}
+
+    async def run(self, key, func, *args, retry=None):
+        while True:
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            self.hits += 1
+            try:
+                result = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise  # 自己被取消
+                # 执行者被取消：由当前协程重新执行
+                self.hits -= 1
+                continue
+            if retry is None or not retry(result):
+                return result, True
+            # 结果对自己无效：重新排队 (此时若已有别的等待者在重试，则等它的结果)
+            self.hits -= 1
+            self.retries += 1
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        self.runs += 1
+        try:
+            result = await func(*args)
+            fut.set_result(result)
+            return result, False
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # 标记已取出，没有等待者时不会打印 "exception was never retrieved"
+            raise
+        finally:
+            if not fut.done():
+                fut.cancel()
+            del self._inflight[key]
+
+    def summary(self):
+        return f"{self.name} 执行 {self.runs} 次 | 复用在途结果 {self.hits} 次 | 不复用重试 {self.retries} 次 | 在途 {len(self._inflight)}"
@@ -0,0 +1,159 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# ================= 内容寻址去重存储 =================
+# 同一张壁纸 / 角色立绘常被多篇新闻、多个分享重复发布，而 get_assigned_folder 给每个云盘链接单独分配文件夹，
+# 同样的文件会存很多份。这里按 SHA-256 把下载完成的文件收进 <store_dir>/<前2位>/<哈希>，
+# 分享文件夹里的文件替换为指向该 blob 的硬链接，同样的内容在磁盘上只占一份。
+#   * 哈希在后台线程池里做 (hashlib 处理大块数据时释放 GIL)，submit_dir 立即返回，不阻塞下载
+#   * 硬链接数 > 1 的文件视为已入库，重跑时不再重复哈希
+#   * 链接到已有 blob 前重新哈希 blob，内容已损坏 (位腐烂) 时改用新文件作 blob
+#   * 文件系统不支持硬链接 (如 FAT/exFAT、跨盘) 时保留原文件，只计数
+#   * store_dir 必须和下载目录在同一个盘上 (默认放在 DOWNLOAD_ROOT/.blobs)
+# 下载与解压都是 "写临时文件再改名"，不会原地改写已链接的文件，所以共享 inode 是安全的。
+
+HASH_CHUNK = 1024 * 1024
+DEDUP_WORKERS = 2          # 哈希线程数
+DEDUP_MIN_SIZE = 64 * 1024  # 小于此大小的文件不入库 (省下的空间不值一次哈希)
+SKIP_SUFFIXES = (".part", ".part.json", ".unzip", ".dedup", ".checksums.json", ".zip_source.json")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                return h.hexdigest()
+            h.update(chunk)
+
+
+class DedupStore:
+    """
+    用法:
+        store = DedupStore(os.path.join(DOWNLOAD_ROOT, ".blobs"))
+        store.submit_dir(local_dir)   # 每个分享下载完成后调用，立即返回
+        store.close()                 # 结束时等待哈希完成并输出节省的空间
+    """
+    def __init__(self, store_dir, workers=DEDUP_WORKERS, min_size=DEDUP_MIN_SIZE):
+        self.store_dir = store_dir
+        self.min_size = min_size
+        self.lock = threading.Lock()
+        self.stats = {"hashed": 0, "new_blobs": 0, "linked": 0, "bytes_saved": 0, "repaired": 0, "failed": 0}
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._scans = []
+        self._link_warned = False
+
+    def _count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def submit_dir(self, local_dir):
+        """把分享文件夹 (含解压出的子目录) 交给后台入库"""
+        self._scans.append(self._pool.submit(self._scan_dir, local_dir))
+
+    def _scan_dir(self, local_dir):
+        for root, _, names in os.walk(local_dir):
+            for name in names:
+                if not name.endswith(SKIP_SUFFIXES):
+                    self._pool.submit(self._ingest_safe, os.path.join(root, name))
+
+    def _ingest_safe(self, path):
+        try:
+            self.ingest(path)
+        except Exception as e:
+            self._count("failed")
+            print(f"      [Dedup Warn] {os.path.basename(path)}: {e}")
+
+    def ingest(self, path):
+        """哈希单个文件并链接到 blob，返回节省的字节数"""
+        st = os.stat(path)
+        if st.st_nlink > 1 or st.st_size < self.min_size:
+            return 0
+        digest = file_sha256(path)
+        self._count("hashed")
+        blob = os.path.join(self.store_dir, digest[:2], digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            # 首次出现：文件本身成为 blob (只加一个链接，不复制)
+            os.link(path, blob)
+            self._count("new_blobs")
+            return 0
+        except FileExistsError:
+            pass
+        except OSError as e:
+            self._link_unsupported(e)
+            return 0
+
+        blob_st = os.stat(blob)
+        if blob_st.st_ino == st.st_ino and blob_st.st_dev == st.st_dev:
+            return 0
+        # blob 与其他文件共享 inode，任何一处的位腐烂都会坏在 blob 上；链接前重新哈希确认内容，
+        # 不一致时用这份新文件替换掉坏 blob，而不是把新文件链接回去
+        if blob_st.st_size != st.st_size or file_sha256(blob) != digest:
+            self._replace_blob(path, blob)
+            return 0
+        tmp_path = path + ".dedup"
+        try:
+            os.link(blob, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            self._link_unsupported(e)
+            return 0
+        self._count("linked")
+        self._count("bytes_saved", st.st_size)
+        return st.st_size
+
+    def _replace_blob(self, path, blob):
+        tmp_path = blob + ".dedup"
+        try:
+            os.link(path, tmp_path)
+            os.replace(tmp_path, blob)
+        except OSError as e:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            self._link_unsupported(e)
+            return
+        self._count("repaired")
+        print(f"      [Dedup Warn] blob 内容与哈希不符，已用新文件替换: {blob}")
+
+    def _link_unsupported(self, error):
+        self._count("failed")
+        if not self._link_warned:
+            self._link_warned = True
+            print(f"      [Dedup Warn] 无法创建硬链接 ({error})，文件保持原样")
+
+    def disk_report(self):
+        """统计整个存储：blob 数、被多处引用的 blob 数、累计节省的字节数"""
+        blobs = shared = saved = 0
+        for root, _, names in os.walk(self.store_dir):
+            for name in names:
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                blobs += 1
+                # 链接数 = blob 本身 + 各分享文件夹里的副本，第一份副本之外都是省下的
+                if st.st_nlink > 2:
+                    shared += 1
+                    saved += st.st_size * (st.st_nlink - 2)
+        return {"blobs": blobs, "shared_blobs": shared, "bytes_saved": saved}
+
+    def summary(self):
+        s = self.stats
+        return (f"本次哈希 {s['hashed']} 个 | 新 blob {s['new_blobs']} | 去重链接 {s['linked']} 个 | "
+                f"节省 {s['bytes_saved'] / 1048576:.1f} MB | 修复坏 blob {s['repaired']} | 失败 {s['failed']}")
+
+    def close(self):
+        """等待后台入库完成，输出本次与累计节省的空间"""
+        # _scan_dir 会继续往池里提交任务，先等扫描任务把文件都提交完再关闭
+        wait(self._scans)
+        self._pool.shutdown(wait=True)
+        report = self.disk_report()
+        print(f"--> [Dedup] {self.summary()}")
+        print(f"--> [Dedup] 存储共 {report['blobs']} 个 blob, {report['shared_blobs']} 个被多处引用, 累计节省 {report['bytes_saved'] / 1048576:.1f} MB")
+        return report
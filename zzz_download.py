@@ -0,0 +1,462 @@
+import os
+import re
+import json
+import time
+import threading
+import zipfile
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+# ================= 直连下载引擎 =================
+# 浏览器只负责打开分享页并输入提取码；解锁后把文件链接 + 会话 Cookie 交给 zzz_http.HttpClient，
+# 复用 keep-alive 连接按块流式写盘，不再经过 Chromium 的下载管理器 (每个文件一次 expect_download 往返)。
+# 引擎本身不依赖 Playwright，只需要 URL 和请求头，可以直接对本地的模拟分享服务器测试。
+# 同一分享内的文件并行下载 (每个分享 share_parallel 个)，整个进程同时下载的文件数另有全局上限。
+# 断点续传：数据先写入 <文件名>.part，旁边的 <文件名>.part.json 记录 URL、期望大小和 ETag/Last-Modified；
+# 连接中断 (本次运行内或下次运行) 时带 Range + If-Range 从已有长度继续，下载完整后才原子改名为正式文件。
+# 分段下载：超过 SEGMENT_THRESHOLD 且支持 Range 的文件预分配 .part，拆成 SEGMENT_COUNT 段多连接并行写入，
+# 各段进度记在 sidecar 里，每段结束时校验 Content-Range 与长度，中断后按段续传。
+# 清单比对：下载前先用 Range: bytes=0-0 取每个远程文件的大小，与本地文件夹比较，只下载缺少或大小不符的文件。
+# 只有打包按钮的分享：ZIP 解压后即删除，另在文件夹里记下 ZIP 的名称 / 大小 / ETag 与解压出的成员 (ZIP_STAMP_NAME)，
+# 重跑时远程 ZIP 未变且成员都在就不再下载。
+
+CHUNK_SIZE = 1024 * 1024  # 每次读写 1MB
+SHARE_PARALLEL = 4        # 单个分享内同时下载的文件数
+GLOBAL_MAX_DOWNLOADS = 8  # 全进程同时下载的文件数 (多协程版本会同时处理多个分享)
+RESUME_RETRIES = 3        # 传输中断后立即续传的次数
+SEGMENT_THRESHOLD = 64 * 1024 * 1024  # 超过此大小的文件分段下载
+SEGMENT_COUNT = 4         # 分段数 (即单个文件同时使用的连接数)
+TEMP_SUFFIXES = (".part", ".part.json", ".unzip", ".dedup")
+ZIP_STAMP_NAME = ".zip_source.json"
+VALID_EXTS = ('.jpg', '.png', '.gif', '.zip', '.rar', '.7z', '.mp4')
+
+# 在已解锁的分享页上收集可直连下载的文件 (与逐个下载时点击的链接相同: 可见、文字以文件后缀结尾)
+COLLECT_SHARE_FILES_JS = """
+(exts) => {
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const files = [];
+    const seen = new Set();
+    document.querySelectorAll("a[href]").forEach((a) => {
+        if (!visible(a) || !/^https?:/i.test(a.href)) return;
+        const name = (a.innerText || "").trim();
+        if (!exts.some((e) => name.toLowerCase().endsWith(e)) || seen.has(a.href)) return;
+        seen.add(a.href);
+        files.push({ name: name, url: a.href });
+    });
+    return files;
+}
+"""
+
+_global_slots = threading.BoundedSemaphore(GLOBAL_MAX_DOWNLOADS)
+
+
+def share_headers(cookies, referer, user_agent=None):
+    """由浏览器上下文的 Cookie (context.cookies() 的返回值) 构造直连请求头"""
+    headers = {"Referer": referer}
+    if cookies:
+        headers["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+    if user_agent:
+        headers["User-Agent"] = user_agent
+    return headers
+
+
+def filename_from_response(resp, url):
+    """优先取 Content-Disposition 里的文件名，否则取 URL 路径最后一段"""
+    disposition = resp.headers.get("content-disposition", "")
+    m = re.search(r"filename\*\s*=\s*[^']*''([^;]+)", disposition, re.IGNORECASE)
+    if m:
+        return unquote(m.group(1).strip().strip('"'))
+    m = re.search(r'filename\s*=\s*"?([^";]+)"?', disposition, re.IGNORECASE)
+    if m:
+        return m.group(1).strip()
+    return unquote(urlsplit(resp.url or url).path.rstrip("/").split("/")[-1]) or f"file_{int(time.time())}"
+
+
+def _sidecar_path(part_path):
+    return part_path + ".json"
+
+
+def _load_meta(part_path):
+    try:
+        with open(_sidecar_path(part_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(part_path, meta):
+    with open(_sidecar_path(part_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def _content_range(resp):
+    """解析 206 的 Content-Range，返回 (起点, 总大小)，总大小未知为 None"""
+    m = re.match(r"bytes\s+(\d+)-\d+/(\d+|\*)", resp.headers.get("content-range", ""))
+    if not m:
+        return None, None
+    return int(m.group(1)), (int(m.group(2)) if m.group(2) != "*" else None)
+
+
+def _write_body(resp, url, part_path, offset, meta):
+    """
+    把响应体写入 .part 并返回 sidecar 信息：
+    206 且起点与已有长度一致时追加；200 (服务端不支持 Range 或文件已变化) 时从头写并重建 sidecar。
+    """
+    if resp.status == 206 and offset and _content_range(resp)[0] == offset:
+        mode = "ab"
+    elif resp.status == 200:
+        mode = "wb"
+        length = resp.headers.get("content-length")
+        meta = {
+            "url": url,
+            "size": int(length) if length is not None else None,
+            "etag": resp.headers.get("etag"),
+            "last_modified": resp.headers.get("last-modified"),
+        }
+        _save_meta(part_path, meta)
+    else:
+        raise RuntimeError(f"HTTP {resp.status}")
+    with open(part_path, mode) as f:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+    return meta
+
+
+def _finalize(part_path, dest_path, meta):
+    """校验长度后原子改名为正式文件；长度不符说明 .part 已损坏，删掉重下"""
+    size = os.path.getsize(part_path)
+    if meta.get("size") is not None and size != meta["size"]:
+        for path in (part_path, _sidecar_path(part_path)):
+            try: os.remove(path)
+            except OSError: pass
+        raise RuntimeError(f"长度不符: 期望 {meta['size']} 字节, 实际 {size} 字节")
+    os.replace(part_path, dest_path)
+    try: os.remove(_sidecar_path(part_path))
+    except OSError: pass
+    return size
+
+
+def _resume_headers(headers, meta, offset, end=None):
+    req = dict(headers or {})
+    req["Range"] = f"bytes={offset}-{'' if end is None else end}"
+    # If-Range: 文件在服务端变了就直接回 200 整个文件，避免把新旧内容拼在一起 (弱 ETag 不能用于 If-Range)
+    etag = meta.get("etag")
+    validator = etag if etag and not etag.startswith("W/") else meta.get("last_modified")
+    if validator:
+        req["If-Range"] = validator
+    return req
+
+
+def _should_segment(resp, segments):
+    length = resp.headers.get("content-length")
+    return (segments > 1 and resp.status == 200 and length is not None
+            and int(length) >= SEGMENT_THRESHOLD
+            and resp.headers.get("accept-ranges", "").lower() == "bytes")
+
+
+def _init_segments(resp, url, part_path, segments):
+    """预分配 .part 并把文件切成若干段，段信息 [起点, 终点, 已写字节] 记入 sidecar"""
+    size = int(resp.headers["content-length"])
+    with open(part_path, "wb") as f:
+        f.truncate(size)
+    step = -(-size // segments)
+    meta = {
+        "url": url,
+        "size": size,
+        "etag": resp.headers.get("etag"),
+        "last_modified": resp.headers.get("last-modified"),
+        "segments": [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)],
+    }
+    _save_meta(part_path, meta)
+    return meta
+
+
+def _start_body(resp, url, part_path, segments):
+    """新下载：大文件只建好分段信息 (响应体丢弃，由 _download_segments 并行拉取)，否则直接写入"""
+    if _should_segment(resp, segments):
+        return _init_segments(resp, url, part_path, segments)
+    return _write_body(resp, url, part_path, 0, None)
+
+
+def _download_segments(client, url, dest_path, headers, meta, retries=RESUME_RETRIES):
+    """多连接并行下载各段 (含续传)，全部段校验通过后改名"""
+    part_path = dest_path + ".part"
+    lock = threading.Lock()
+    remaining = sum(seg[1] - seg[0] + 1 - seg[2] for seg in meta["segments"])
+    print(f"      [Segment] {os.path.basename(dest_path)} {meta['size'] / 1048576:.1f} MB 分 {len(meta['segments'])} 段下载, 剩余 {remaining / 1048576:.1f} MB")
+
+    def fetch(seg):
+        for attempt in range(retries + 1):
+            pos = seg[0] + seg[2]
+            if pos > seg[1]:
+                return
+            req = _resume_headers(headers, meta, pos, seg[1])
+            try:
+                with client.stream("GET", url, headers=req) as resp:
+                    start, total = _content_range(resp)
+                    if resp.status != 206 or start != pos or total != meta["size"]:
+                        raise RuntimeError(f"分段响应不符: HTTP {resp.status} {resp.headers.get('content-range')}")
+                    with open(part_path, "r+b") as f:
+                        f.seek(pos)
+                        unsaved = 0
+                        for chunk in resp.iter_content(CHUNK_SIZE):
+                            if seg[0] + seg[2] + len(chunk) > seg[1] + 1:
+                                raise RuntimeError("分段数据超出范围")
+                            f.write(chunk)
+                            f.flush()  # 先落盘再记进度
+                            unsaved += len(chunk)
+                            with lock:
+                                seg[2] += len(chunk)
+                                if unsaved >= 32 * CHUNK_SIZE:
+                                    _save_meta(part_path, meta)
+                                    unsaved = 0
+                # 段结束校验：收到的字节数必须正好是该段长度
+                if seg[2] != seg[1] - seg[0] + 1:
+                    raise http.client.IncompleteRead(b"", seg[1] - seg[0] + 1 - seg[2])
+                return
+            except (http.client.HTTPException, OSError) as e:
+                if attempt == retries:
+                    raise
+                print(f"      [Segment] {os.path.basename(dest_path)} 第 {seg[0]}-{seg[1]} 段中断: {e}")
+            finally:
+                # 进度只记已落盘的字节，崩溃后续传不会留下空洞
+                with lock:
+                    _save_meta(part_path, meta)
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(meta["segments"])) as pool:
+            list(pool.map(fetch, meta["segments"]))
+    except RuntimeError:
+        # 服务端文件变化或不再支持 Range：分段数据作废，下次从头下载
+        for path in (part_path, _sidecar_path(part_path)):
+            try: os.remove(path)
+            except OSError: pass
+        raise
+    return _finalize(part_path, dest_path, meta)
+
+
+def download_file(client, url, dest_path, headers=None, retries=RESUME_RETRIES, segments=SEGMENT_COUNT):
+    """可续传地下载单个文件到 dest_path (大文件自动分段)，返回文件字节数"""
+    part_path = dest_path + ".part"
+    for attempt in range(retries + 1):
+        meta = _load_meta(part_path) if os.path.exists(part_path) else None
+        if meta and meta.get("url") != url:
+            meta = None
+        if meta and meta.get("segments"):
+            return _download_segments(client, url, dest_path, headers, meta, retries)
+        offset = os.path.getsize(part_path) if meta else 0
+        if meta and offset and offset == meta.get("size"):
+            # 上次已经下完，只是没来得及改名
+            return _finalize(part_path, dest_path, meta)
+
+        req = headers
+        if offset:
+            req = _resume_headers(headers, meta, offset)
+            print(f"      [Resume] {os.path.basename(dest_path)} 从 {offset / 1048576:.1f} MB 处续传")
+        try:
+            with client.stream("GET", url, headers=req) as resp:
+                if offset:
+                    meta = _write_body(resp, url, part_path, offset, meta)
+                else:
+                    meta = _start_body(resp, url, part_path, segments)
+            if meta.get("segments"):
+                return _download_segments(client, url, dest_path, headers, meta, retries)
+            return _finalize(part_path, dest_path, meta)
+        except (http.client.HTTPException, OSError) as e:
+            # 连接断开 / 超时：.part 与 sidecar 保留，下一轮按 Range 续传
+            if attempt == retries:
+                raise
+            print(f"      [Resume] {os.path.basename(dest_path)} 传输中断: {e}")
+
+
+def download_to_dir(client, url, local_dir, headers=None, sanitize=None, segments=SEGMENT_COUNT):
+    """下载到目录，文件名取自响应头 (sanitize 用于清洗文件名)，返回 (文件名, 字节数)"""
+    # 之前中断过：按 sidecar 里记录的 URL 找回文件名，直接续传
+    for name in os.listdir(local_dir):
+        if name.endswith(".part.json"):
+            dest_path = os.path.join(local_dir, name[:-len(".part.json")])
+            meta = _load_meta(dest_path + ".part")
+            if meta and meta.get("url") == url and os.path.exists(dest_path + ".part"):
+                return os.path.basename(dest_path), download_file(client, url, dest_path, headers, segments=segments)
+
+    with client.stream("GET", url, headers=headers) as resp:
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}")
+        name = filename_from_response(resp, url)
+        if sanitize:
+            name = sanitize(name) or name
+        dest_path = os.path.join(local_dir, name)
+        length = resp.headers.get("content-length")
+        if os.path.exists(dest_path) and length is not None and os.path.getsize(dest_path) == int(length):
+            print(f"      [Skip] 文件已存在: {name}")
+            return name, int(length)
+        part_path = dest_path + ".part"
+        try:
+            meta = _start_body(resp, url, part_path, segments)
+        except (http.client.HTTPException, OSError) as e:
+            print(f"      [Resume] {name} 传输中断: {e}")
+            meta = None
+    if meta is None:
+        return name, download_file(client, url, dest_path, headers, segments=segments)
+    if meta.get("segments"):
+        return name, _download_segments(client, url, dest_path, headers, meta)
+    return name, _finalize(part_path, dest_path, meta)
+
+
+def remote_stamp(client, url, headers=None):
+    """远程文件的 {size, etag, last_modified}：只请求第一个字节，大小取自 Content-Range (不支持 Range 时取 Content-Length)，未知为 None"""
+    req = dict(headers or {})
+    req["Range"] = "bytes=0-0"
+    stamp = {"size": None, "etag": None, "last_modified": None}
+    with client.stream("GET", url, headers=req) as resp:
+        if resp.status == 206:
+            stamp["size"] = _content_range(resp)[1]
+        elif resp.status == 200 and resp.headers.get("content-length") is not None:
+            stamp["size"] = int(resp.headers["content-length"])
+        else:
+            return stamp
+        stamp["etag"] = resp.headers.get("etag")
+        stamp["last_modified"] = resp.headers.get("last-modified")
+    return stamp
+
+
+def remote_size(client, url, headers=None):
+    """远程文件大小，未知返回 None"""
+    return remote_stamp(client, url, headers)["size"]
+
+
+def fetch_remote_sizes(client, files, headers=None, parallel=SHARE_PARALLEL):
+    """并行补全 files 里每个文件的远程大小 (写入 item["size"]，失败为 None)"""
+    def fetch(item):
+        try:
+            item["size"] = remote_size(client, item["url"], headers)
+        except Exception:
+            item["size"] = None
+
+    if files:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(files)))) as pool:
+            list(pool.map(fetch, files))
+    return files
+
+
+def local_inventory(local_dir):
+    """本地文件夹 (含 ZIP 解压出的子目录) 里的文件: {文件名: 大小}，跳过下载/解压中的临时文件"""
+    inventory = {}
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            if not name.endswith(TEMP_SUFFIXES):
+                try:
+                    inventory.setdefault(name, os.path.getsize(os.path.join(root, name)))
+                except OSError:
+                    pass
+    return inventory
+
+
+def diff_manifest(files, local_dir):
+    """
+    远程清单与本地文件夹比较，返回 (需要下载的文件, 本地已完整的文件名)。
+    文件名相同且大小一致 (远程大小未知时只看文件名) 视为已完整。
+    """
+    inventory = local_inventory(local_dir)
+    missing = []
+    complete = []
+    for item in files:
+        size = inventory.get(item["name"])
+        if size is not None and (item.get("size") is None or size == item["size"]):
+            complete.append(item["name"])
+        else:
+            missing.append(item)
+    return missing, complete
+
+
+def save_zip_stamp(zip_path, local_dir, remote=None):
+    """
+    ZIP 解压后 (删除前) 记下它的名称、大小、远程 ETag / Last-Modified 与各成员大小，供 zip_unchanged 判断。
+    remote 为 remote_stamp 的结果 (浏览器下载时为 None)
+    """
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        members = {info.filename: info.file_size for info in zf.infolist() if not info.is_dir()}
+    remote = remote or {}
+    stamp = {
+        "name": os.path.basename(zip_path),
+        "size": os.path.getsize(zip_path),
+        "etag": remote.get("etag"),
+        "last_modified": remote.get("last_modified"),
+        "members": members,
+    }
+    tmp_path = os.path.join(local_dir, ZIP_STAMP_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(local_dir, ZIP_STAMP_NAME))
+
+
+def zip_unchanged(local_dir, name=None, remote=None):
+    """
+    上次解压的 ZIP 是否仍是最新且成员都在：返回成员名列表，否则返回 None。
+    name: 浏览器下载时的建议文件名；remote: 直连时的 remote_stamp (大小及 ETag / Last-Modified 都要一致)
+    """
+    try:
+        with open(os.path.join(local_dir, ZIP_STAMP_NAME), "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if name is not None and name != stamp.get("name"):
+        return None
+    if remote is not None:
+        if remote.get("size") is None or remote["size"] != stamp.get("size"):
+            return None
+        for key in ("etag", "last_modified"):
+            if remote.get(key) and stamp.get(key) and remote[key] != stamp[key]:
+                return None
+    members = stamp.get("members") or {}
+    for member, size in members.items():
+        path = os.path.join(local_dir, member)
+        if not os.path.isfile(path) or os.path.getsize(path) != size:
+            return None
+    return list(members)
+
+
+def download_share_files(client, files, local_dir, headers=None, share_parallel=SHARE_PARALLEL):
+    """
+    并行下载分享里的文件，逐个文件输出进度与失败原因。
+    files: [{"name": 已清洗的文件名, "url": 地址, "size": 远程大小 (可选)}]
+    返回 (成功的文件名列表, 失败的文件名列表)，顺序与 files 一致
+    """
+    total = len(files)
+    done = [0]
+    total_bytes = [0]
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def fetch(item):
+        dest_path = os.path.join(local_dir, item["name"])
+        if os.path.exists(dest_path):
+            if item.get("size") is None or os.path.getsize(dest_path) == item["size"]:
+                print(f"      [Skip] 文件已存在: {item['name']}")
+                return True
+            print(f"      [HTTP] 本地文件大小与远程不符，重新下载: {item['name']}")
+        with _global_slots:
+            file_started = time.monotonic()
+            try:
+                size = download_file(client, item["url"], dest_path, headers=headers)
+            except Exception as e:
+                # .part 保留，下次运行续传
+                with lock:
+                    done[0] += 1
+                    print(f"      [HTTP] ({done[0]}/{total}) 失败 {item['name']}: {e}")
+                return False
+        with lock:
+            done[0] += 1
+            total_bytes[0] += size
+            print(f"      [HTTP] ({done[0]}/{total}) {item['name']} {size / 1048576:.1f} MB, {time.monotonic() - file_started:.1f}s")
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(1, min(share_parallel, total))) as pool:
+        results = list(pool.map(fetch, files))
+
+    downloaded = [item["name"] for item, ok in zip(files, results) if ok]
+    failed = [item["name"] for item, ok in zip(files, results) if not ok]
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"      [HTTP] 完成 {len(downloaded)}/{total} 个文件, {total_bytes[0] / 1048576:.1f} MB, {total_bytes[0] / 1048576 / elapsed:.1f} MB/s")
+    return downloaded, failed
@@ -0,0 +1,78 @@
+import os
+import time
+import zlib
+import shutil
+import zipfile
+
+# ================= ZIP 增量解压 =================
+# 替代 ZipFile.extractall：
+#   * 逐个成员流式解压 (按块读写，不把整个成员读进内存)，先写临时文件再原子改名，中断不会留下半个文件
+#   * 本地已有同名文件且大小 + CRC32 与 ZIP 记录一致时跳过，重跑不再重复解压
+#   * 成员路径限制在目标目录内 (防 ../ 穿越)
+#   * 结束时输出解压量与吞吐
+# 纯阻塞 IO + zlib (会释放 GIL)，协程版本通过 loop.run_in_executor 放到线程池执行，不阻塞事件循环。
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_crc32(path):
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+def _member_path(dest_dir, name):
+    """成员在目标目录下的路径，越界返回 None"""
+    root = os.path.abspath(dest_dir)
+    path = os.path.abspath(os.path.join(root, name))
+    if path != root and not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def _is_unchanged(path, info):
+    return (os.path.isfile(path) and os.path.getsize(path) == info.file_size
+            and file_crc32(path) == info.CRC)
+
+
+def extract_zip(zip_path, dest_dir):
+    """增量解压 zip_path 到 dest_dir，返回 (成员名列表, 统计)"""
+    stats = {"extracted": 0, "skipped": 0, "bytes": 0, "seconds": 0.0}
+    names = []
+    started = time.monotonic()
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            path = _member_path(dest_dir, info.filename)
+            if path is None:
+                print(f"      [Unzip] 跳过越界路径: {info.filename}")
+                continue
+            names.append(info.filename)
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            if _is_unchanged(path, info):
+                stats["skipped"] += 1
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".unzip"
+            try:
+                # ZipFile.open 读完时会校验 CRC，损坏的成员会抛 BadZipFile
+                with zf.open(info) as src, open(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try: os.remove(tmp_path)
+                except OSError: pass
+                raise
+            stats["extracted"] += 1
+            stats["bytes"] += info.file_size
+
+    stats["seconds"] = time.monotonic() - started
+    speed = stats["bytes"] / 1048576 / max(stats["seconds"], 1e-6)
+    print(f"      [Unzip] 解压 {stats['extracted']} 个 ({stats['bytes'] / 1048576:.1f} MB), "
+          f"跳过未变化 {stats['skipped']} 个, {stats['seconds']:.1f}s, {speed:.1f} MB/s")
+    return names, stats
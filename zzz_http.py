@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import http.client
+from urllib.parse import urlsplit, urljoin
+
+# ================= 共享 HTTP 客户端 =================
+# 基于标准库 http.client 的 keep-alive 连接池：
+#   * 同一 host 复用 TCP/TLS 连接，省去每次请求的握手
+#   * 每个 host 限制同时在途的请求数 (max_per_host)，多线程并发请求时自动排队
+# 各爬虫脚本需要直接发 HTTP 请求 (不经过浏览器) 时统一使用这里的 HttpClient。
+# 可选挂载 ResponseCache (磁盘缓存)，重复运行/调试时直接命中或仅做条件请求。
+# 大文件用 stream() 按块读取响应体，不整体读入内存。
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class HttpResponse:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers  # key 统一为小写
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class StreamResponse:
+    """流式响应：按块读取响应体，用完必须 close() (或用 with) 归还连接和并发槽位"""
+    def __init__(self, url, raw, conn, pool):
+        self.url = url
+        self.status = raw.status
+        self.headers = {k.lower(): v for k, v in raw.getheaders()}
+        self._raw = raw
+        self._conn = conn
+        self._pool = pool
+
+    def read(self, amt=None):
+        return self._raw.read(amt)
+
+    def iter_content(self, chunk_size=1024 * 1024):
+        while True:
+            chunk = self._raw.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        # read(amt) 遇到连接提前断开只会返回空串，按 Content-Length 补一个中断异常
+        if self._raw.length:
+            raise http.client.IncompleteRead(b"", self._raw.length)
+
+    def close(self):
+        if self._conn is None:
+            return
+        # 响应体读完且服务端没要求断开才放回连接池，否则连接上还有残留数据，直接关掉
+        if self._raw.isclosed() and not self._raw.will_close:
+            self._pool.checkin(self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+        self._pool.slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ResponseCache:
+    """
+    磁盘响应缓存：按 URL 存储 200 响应。
+    未过期 (TTL 内) 直接命中；过期后带 ETag/Last-Modified 做条件请求，304 则续期；
+    总大小超过 max_bytes 时按最近访问时间 (LRU) 淘汰。
+    """
+    def __init__(self, cache_dir, ttl=3600, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0}
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    self.index = json.load(f)
+            except: pass
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, key + ".body")
+
+    def lookup(self, url):
+        """返回 (entry, body)，未缓存返回 (None, None)"""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with self.lock:
+            entry = self.index.get(key)
+            if not entry:
+                return None, None
+            try:
+                with open(self._body_path(key), "rb") as f:
+                    body = f.read()
+            except OSError:
+                self.index.pop(key, None)
+                return None, None
+            entry["last_access"] = time.time()
+            return entry, body
+
+    def is_fresh(self, entry, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() - entry["stored_at"] < ttl
+
+    def validators(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def refresh(self, url):
+        """304 后续期"""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with self.lock:
+            if key in self.index:
+                self.index[key]["stored_at"] = time.time()
+
+    def discard(self, url):
+        """删除缓存条目 (调用方认定响应无效时，如接口返回错误码)"""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with self.lock:
+            if self.index.pop(key, None) is None:
+                return
+            try: os.remove(self._body_path(key))
+            except OSError: pass
+            self._save_index_locked()
+
+    def store(self, url, resp):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self.lock:
+            tmp_path = self._body_path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(resp.body)
+            os.replace(tmp_path, self._body_path(key))
+            self.index[key] = {
+                "url": url,
+                "etag": resp.headers.get("etag"),
+                "last_modified": resp.headers.get("last-modified"),
+                "headers": resp.headers,
+                "size": len(resp.body),
+                "stored_at": now,
+                "last_access": now,
+            }
+            self._evict_locked()
+            self._save_index_locked()
+
+    def _evict_locked(self):
+        total = sum(e["size"] for e in self.index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            try: os.remove(self._body_path(key))
+            except OSError: pass
+            del self.index[key]
+            total -= entry["size"]
+            self.stats["evictions"] += 1
+
+    def _save_index_locked(self):
+        try:
+            tmp_path = self.index_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            print(f"[Cache Warn] 索引写入失败: {e}")
+
+    def count(self, kind):
+        with self.lock:
+            self.stats[kind] += 1
+
+    def flush(self):
+        with self.lock:
+            self._save_index_locked()
+
+    def summary(self):
+        s = self.stats
+        return f"命中 {s['hits']} | 304 续期 {s['revalidated']} | 未命中 {s['misses']} | 淘汰 {s['evictions']}"
+
+
+class _HostPool:
+    """单个 host 的空闲连接栈 + 并发槽位"""
+    def __init__(self, max_conns):
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_conns)
+
+    def checkout(self):
+        with self.lock:
+            return self.idle.pop() if self.idle else None
+
+    def checkin(self, conn):
+        with self.lock:
+            self.idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            conns, self.idle = self.idle, []
+        for conn in conns:
+            try: conn.close()
+            except: pass
+
+
+class HttpClient:
+    """keep-alive 连接池客户端，线程安全"""
+    def __init__(self, headers=None, max_per_host=4, timeout=15, cache=None, limiter=None):
+        self.cache = cache
+        self.limiter = limiter  # zzz_rate_limit.RateLimiter，真正发出网络请求前按 host 取令牌
+        self.headers = dict(DEFAULT_HEADERS)
+        self.headers.update(headers or {})
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, scheme, netloc):
+        key = (scheme, netloc)
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = _HostPool(self.max_per_host)
+            return self._pools[key]
+
+    def _new_conn(self, scheme, netloc):
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _open(self, method, url, headers, body):
+        """发出请求并读完响应头，返回 StreamResponse (占用该 host 的一个并发槽位，直到 close)"""
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        merged = dict(self.headers)
+        merged.update(headers or {})
+
+        if self.limiter:
+            self.limiter.acquire(url)
+        pool = self._pool(parts.scheme, parts.netloc)
+        pool.slots.acquire()
+        try:
+            for attempt in range(2):
+                conn = pool.checkout()
+                reused = conn is not None
+                if conn is None:
+                    conn = self._new_conn(parts.scheme, parts.netloc)
+                try:
+                    conn.request(method, path, body=body, headers=merged)
+                    raw = conn.getresponse()
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    # 复用的空闲连接可能已被服务端关闭，换一条新连接重试一次
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                return StreamResponse(url, raw, conn, pool)
+        except BaseException:
+            pool.slots.release()
+            raise
+
+    def _request_once(self, method, url, headers, body):
+        with self._open(method, url, headers, body) as resp:
+            data = resp.read()
+        return HttpResponse(url, resp.status, resp.headers, data)
+
+    def request(self, method, url, headers=None, body=None, max_redirects=5):
+        """发送请求并读完响应体，自动跟随重定向"""
+        for _ in range(max_redirects + 1):
+            resp = self._request_once(method, url, headers, body)
+            location = resp.headers.get("location")
+            if resp.status not in REDIRECT_CODES or not location:
+                return resp
+            url = urljoin(url, location)
+            if resp.status == 303:
+                method, body = "GET", None
+        return resp
+
+    def stream(self, method, url, headers=None, max_redirects=5):
+        """
+        流式请求，自动跟随重定向，返回 StreamResponse (需 close)。
+        重定向到其他 host (如 CDN) 时不再携带 Cookie。
+        """
+        headers = dict(headers or {})
+        for hop in range(max_redirects + 1):
+            resp = self._open(method, url, headers, None)
+            location = resp.headers.get("location")
+            if resp.status not in REDIRECT_CODES or not location or hop == max_redirects:
+                return resp
+            resp.read()
+            resp.close()
+            next_url = urljoin(url, location)
+            if urlsplit(next_url).netloc != urlsplit(url).netloc:
+                headers = {k: v for k, v in headers.items() if k.lower() != "cookie"}
+            url = next_url
+
+    def get(self, url, headers=None, cache_ttl=None):
+        """GET；挂载了缓存时先查缓存 (cache_ttl 可覆盖默认 TTL)"""
+        if not self.cache:
+            return self.request("GET", url, headers=headers)
+
+        entry, body = self.cache.lookup(url)
+        if entry and self.cache.is_fresh(entry, cache_ttl):
+            self.cache.count("hits")
+            return HttpResponse(url, 200, entry["headers"], body)
+
+        req_headers = dict(headers or {})
+        if entry:
+            req_headers.update(self.cache.validators(entry))
+        resp = self.request("GET", url, headers=req_headers)
+        if entry and resp.status == 304:
+            self.cache.refresh(url)
+            self.cache.count("revalidated")
+            return HttpResponse(url, 200, entry["headers"], body)
+
+        self.cache.count("misses")
+        if resp.status == 200:
+            self.cache.store(url, resp)
+        return resp
+
+    def get_json(self, url, headers=None, cache_ttl=None, validate=None):
+        """
+        GET 并解析 JSON，非 200 时返回 None。
+        validate(data) 返回 False 时 (如米游社接口 retcode != 0 的风控 / 错误响应) 不保留缓存，
+        数据照常返回由调用方处理；解析失败同样删除缓存。
+        """
+        resp = self.get(url, headers=headers, cache_ttl=cache_ttl)
+        if resp.status != 200:
+            return None
+        try:
+            data = resp.json()
+        except ValueError:
+            if self.cache:
+                self.cache.discard(url)
+            raise
+        if validate and self.cache and not validate(data):
+            self.cache.discard(url)
+        return data
+
+    def close(self):
+        if self.cache:
+            self.cache.flush()
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
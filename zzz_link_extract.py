@@ -0,0 +1,281 @@
+import os
+import re
+import html
+import hashlib
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode
+
+# ================= 共享云盘链接提取 =================
+# 官网爬虫 / 滚动爬虫 / 米游社 API 爬虫统一使用这里的提取逻辑：
+#   * 所有网盘域名合并成一个预编译正则、提取码关键字合并成另一个，均以字面量开头，快速跳过无关文本
+#   * 链接按网盘规范化 (canonical_cloud_url)，同一分享的不同写法只保留第一次出现的原始写法，结果按出现顺序去重；
+#     打开 / 点击用原始链接 (保留查询参数、子路径与镜像域名)，规范形式只作去重与 folder_map 的 key
+#   * 每个链接与文本位置最近的提取码配对，登录时先试配对的码，避免 链接数 × 码数 次尝试
+# 新增网盘只需在 CLOUD_PROVIDERS 里加一行 (需要规范化时再在 CANONICAL_RULES 里加一行)。
+
+# 网盘名 -> 链接 (host + 路径前缀) 正则，host 前允许任意子域名
+CLOUD_PROVIDERS = [
+    ("minas", r"minas\.mihoyo\.com/"),
+    ("baidu", r"(?:pan|yun)\.baidu\.com/(?:s/|share/init\?)"),
+    ("aliyun", r"(?:aliyundrive|alipan)\.com/s/"),
+    ("189", r"cloud\.189\.cn/(?:t/|web/share\?)"),
+    ("lanzou", r"lanzou\w?\.com/"),
+    ("quark", r"quark\.cn/s/"),
+    ("123pan", r"123pan\.com/s/"),
+]
+CODE_KEYWORDS = ["密码", "提取码", "访问码", "口令", "code"]  # 英文关键字不区分大小写，且前面不能紧跟字母 (排除 barcode 等)
+
+# URL 只取 ASCII 合法字符，遇到中文标点 / 引号 / 尖括号即截断
+_URL_CHARS = r"[A-Za-z0-9\-._~:/?#\[\]@!$&*+,;=%]"
+# 链接与提取码分两个正则扫描，各自以字面量开头，正则引擎可以快速跳过无关位置
+# (合并成一个 "链接|关键字" 的交替正则时，每个位置都要逐个尝试所有分支，反而比旧实现慢)
+CLOUD_URL_PATTERN = re.compile(
+    r"https?://(?:[\w-]+\.)*(?:" + "|".join(p for _, p in CLOUD_PROVIDERS) + r")" + _URL_CHARS + r"*",
+    re.IGNORECASE,
+)
+# 提取码以关键字的最后一个字 + 冒号定位，命中后再核对前面的完整关键字 (见 _code_keyword_start)
+_CODE_KEYWORD_ENDS = "".join(sorted(set(c for k in CODE_KEYWORDS for c in (k[-1].lower(), k[-1].upper()))))
+CODE_PATTERN = re.compile(r"[" + _CODE_KEYWORD_ENDS + r"]\s*[:：]\s*(?P<code>[A-Za-z0-9_-]{4,})")
+_CODE_KEYWORD_MAX = max(len(k) for k in CODE_KEYWORDS)
+# HTML 标签替换为空格，<a href="..."> 保留 href，保证标签里的链接和被标签拆开的 "提取码：<b>xxxx</b>" 都能匹配到
+_TAG_PATTERN = re.compile(r"<(?:[^>]*?\bhref\s*=\s*[\"']?([^\"' >]+))?[^>]*>")
+_URL_TRAILING = ".,;:!?)]"
+
+
+def html_to_text(content):
+    """HTML 转为便于提取的纯文本 (保留 href)"""
+    return html.unescape(_TAG_PATTERN.sub(r" \1 ", content))
+
+
+def normalize_link(url):
+    """链接规范化：反转义 &amp;，去掉结尾标点"""
+    return html.unescape(url).rstrip(_URL_TRAILING)
+
+
+# 网盘 -> (host 正则, 分享 ID 正则 (匹配路径), 带 ID 的查询参数, 规范 URL)
+# 规范 URL 可以直接访问；分享 ID 保留原大小写 (百度等区分大小写)
+# 带 ID 的查询参数对应 pan.baidu.com/share/init?surl=xxx、cloud.189.cn/web/share?code=xxx 这类写法 (CLOUD_PROVIDERS 里同样收录)
+CANONICAL_RULES = [
+    ("baidu", r"(?:^|\.)(?:pan|yun)\.baidu\.com$", r"^/s/(1[\w-]+)", ("surl", "1{}"), "https://pan.baidu.com/s/{}"),
+    ("aliyun", r"(?:^|\.)(?:aliyundrive|alipan)\.com$", r"^/s/(\w+)", None, "https://www.alipan.com/s/{}"),
+    ("189", r"(?:^|\.)cloud\.189\.cn$", r"^/t/(\w+)", ("code", "{}"), "https://cloud.189.cn/t/{}"),
+    ("lanzou", r"(?:^|\.)lanzou\w?\.com$", r"^/(?:tp/)?(\w+)", None, "https://www.lanzoui.com/{}"),
+    ("quark", r"(?:^|\.)quark\.cn$", r"^/s/(\w+)", None, "https://pan.quark.cn/s/{}"),
+    ("123pan", r"(?:^|\.)123pan\.com$", r"^/s/([\w-]+?)(?:\.html)?$", None, "https://www.123pan.com/s/{}"),
+]
+_CANONICAL_RULES = [(name, re.compile(host), re.compile(path), query, template)
+                    for name, host, path, query, template in CANONICAL_RULES]
+# 已是规范形式的链接 (文章里最常见的写法) 直接返回，不再拆分 URL 与逐条匹配规则
+_CANONICAL_FORM = re.compile(
+    "|".join(re.escape(template.split("{}")[0]) + r"\w+" for *_, template in CANONICAL_RULES)
+    + r"|https://minas\.mihoyo\.com(?:/[\w.-]*\w)+"
+)
+# 链接里自带提取码的查询参数 (如百度的 ?pwd=xxxx)，规范化会去掉，提取时当作提取码
+_PWD_PARAMS = ("pwd", "password", "passcode")
+# 通用规范化只去掉这些跟踪参数 (及 utm_*)，其余查询参数可能就是分享 ID，保留
+_TRACKING_PARAMS = ("spm", "from", "share_from", "share_source", "share_medium", "source", "scene", "_t", "ts")
+_PWD_VALUE = re.compile(r"[A-Za-z0-9]{4,}")
+# 分享链接拆成 host / 路径 / 查询 / 片段 (比 urlsplit 快，提取时每个链接都要过一遍)
+_URL_PARTS = re.compile(r"(?:[A-Za-z]+:)?//(?:[^@/?#]*@)?([^:/?#]*)(?::\d*)?([^?#]*)(?:\?([^#]*))?(?:#(.*))?", re.S)
+
+
+@lru_cache(maxsize=4096)
+def canonical_cloud_url(url):
+    """
+    分享链接的规范形式，同一分享的各种写法 (http/https、子域名、镜像域名、跟踪参数、#片段、
+    HTML 转义、结尾标点与 /) 映射为同一个 URL，用作去重与 folder_map 的 key。
+    米哈游云盘等没有专门规则的链接只做通用规范化 (https、host 小写、去掉跟踪参数 / 提取码参数与页内锚点，
+    其余查询参数排序后保留)。
+    同一篇文章里链接常重复出现，结果做了缓存。
+    """
+    if _CANONICAL_FORM.fullmatch(url):
+        return url
+    m = _URL_PARTS.match(normalize_link(url.strip()))
+    if not m:
+        return url
+    host, path, query, fragment = m.group(1).lower(), m.group(2), m.group(3) or "", m.group(4) or ""
+    for _, host_re, path_re, id_param, template in _CANONICAL_RULES:
+        if not host_re.search(host):
+            continue
+        m = path_re.match(path)
+        if m:
+            return template.format(m.group(1))
+        if id_param and query:
+            share_id = dict(parse_qsl(query)).get(id_param[0])
+            if share_id:
+                return template.format(id_param[1].format(share_id))
+        break
+    # 单页应用的 #/s/xxx 路由属于地址本身 (路由里的查询参数同样过滤)，其余片段 (页内锚点) 去掉
+    if fragment.startswith("/"):
+        route, _, route_query = fragment.partition("?")
+        route_query = _identity_query(route_query)
+        fragment = route.rstrip("/") + ("?" + route_query if route_query else "")
+    else:
+        fragment = ""
+    query = _identity_query(query)
+    path = path.rstrip("/") or ("/" if fragment or query else "")
+    return "https://" + host + path + ("?" + query if query else "") + ("#" + fragment if fragment else "")
+
+
+def _identity_query(query):
+    """去掉跟踪参数与提取码参数，其余按名称排序，保证同一分享的不同写法得到同一个查询串"""
+    if not query:
+        return ""
+    kept = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True)
+            if k.lower() not in _TRACKING_PARAMS and k.lower() not in _PWD_PARAMS and not k.lower().startswith("utm_")]
+    return urlencode(sorted(kept))
+
+
+def _link_password(url):
+    """链接查询参数里自带的提取码，没有返回 None"""
+    if "?" not in url:
+        return None
+    m = _URL_PARTS.match(normalize_link(url))
+    query = dict(parse_qsl(m.group(3) or "")) if m else {}
+    for name in _PWD_PARAMS:
+        if _PWD_VALUE.fullmatch(query.get(name, "")):
+            return query[name]
+    return None
+
+
+def _code_keyword_start(text, end):
+    """end 之前紧挨着提取码关键字时返回关键字起始位置，否则返回 None"""
+    head = text[max(0, end - _CODE_KEYWORD_MAX):end].lower()
+    for keyword in CODE_KEYWORDS:
+        if head.endswith(keyword):
+            start = end - len(keyword)
+            # 英文关键字前不能紧跟字母
+            if keyword.isascii() and start > 0 and text[start - 1].isascii() and text[start - 1].isalpha():
+                return None
+            return start
+    return None
+
+
+def scan_cloud_text(text):
+    """
+    扫描文本，返回 (links, codes)，均按出现顺序、未去重。
+    links 为 (原始链接, 起始位置, 结束位置, 规范 key) 列表：原始链接 (反转义、去掉结尾标点) 用于打开 / 点击，
+    规范 key (canonical_cloud_url) 只用于去重、配对与 folder_map。
+    codes 为 (提取码, 起始位置, 结束位置) 列表；链接自带的提取码 (?pwd=) 以链接本身的位置计入，配对时优先配给该链接。
+    """
+    links = []
+    codes = []
+    for m in CLOUD_URL_PATTERN.finditer(text):
+        raw = normalize_link(m.group())
+        links.append((raw, m.start(), m.end(), canonical_cloud_url(raw)))
+        pwd = _link_password(raw)
+        if pwd:
+            codes.append((pwd, m.start(), m.end()))
+    link_codes = bool(codes)
+    for m in CODE_PATTERN.finditer(text):
+        start = _code_keyword_start(text, m.start() + 1)
+        if start is not None:
+            codes.append((m.group("code"), start, m.end()))
+    if link_codes:
+        codes.sort(key=lambda c: c[1])
+    return links, codes
+
+
+def _dedupe(items):
+    seen = set()
+    result = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            result.append(item)
+    return result
+
+
+def dedupe_links(links):
+    """按规范 key 去重，同一分享保留第一次出现的原始写法"""
+    seen = set()
+    result = []
+    for url in links:
+        key = canonical_cloud_url(url)
+        if key not in seen:
+            seen.add(key)
+            result.append(url)
+    return result
+
+
+def _is_minas(url):
+    return "minas.mihoyo.com" in url.lower()
+
+
+def extract_cloud_info(text, minas_only=False, is_html=False):
+    """
+    从文本中提取云盘链接和提取码，返回 (links, codes)，按出现顺序去重。
+    链接为原始写法，同一分享 (规范 key 相同) 只保留第一次出现的。
+    minas_only: 只要米哈游官方云盘 (minas.mihoyo.com)
+    is_html: 输入为 HTML 源码时先转成文本
+    """
+    if is_html:
+        text = html_to_text(text)
+    links, codes = scan_cloud_text(text)
+    links = dedupe_links(url for url, _, _, _ in links)
+    if minas_only:
+        links = [u for u in links if _is_minas(u)]
+    return links, _dedupe(code for code, _, _ in codes)
+
+
+def pair_codes(links, codes):
+    """
+    links / codes 为 scan_cloud_text 的返回值。
+    每个链接配对与它间隔最短的提取码 (间隔相同时取链接之后的)，返回 {规范 key: code}。
+    同一分享出现多次时以第一次出现为准。
+    """
+    paired = {}
+    if not codes:
+        return paired
+    for _, start, end, key in links:
+        if key in paired:
+            continue
+        best = min(codes, key=lambda c: (c[1] - end, 0) if c[1] >= end else (start - c[2], 1))
+        paired[key] = best[0]
+    return paired
+
+
+def extract_cloud_pairs(text, minas_only=False, is_html=False):
+    """
+    同 extract_cloud_info，额外返回链接与提取码的配对: (links, codes, paired)，paired 以规范 key 为键。
+    HTML 输入转文本后 href 留在原 <a> 标签的位置，因此配对同时反映了 DOM 上的远近。
+    """
+    if is_html:
+        text = html_to_text(text)
+    links, codes = scan_cloud_text(text)
+    paired = pair_codes(links, codes)
+    links = dedupe_links(url for url, _, _, _ in links)
+    if minas_only:
+        links = [u for u in links if _is_minas(u)]
+        keys = set(canonical_cloud_url(u) for u in links)
+        paired = {k: c for k, c in paired.items() if k in keys}
+    return links, _dedupe(code for code, _, _ in codes), paired
+
+
+def order_candidates(link, codes, paired):
+    """链接的候选提取码：配对的排最前，其余按出现顺序兜底"""
+    first = paired.get(canonical_cloud_url(link))
+    if not first:
+        return list(codes)
+    return [first] + [c for c in codes if c != first]
+
+
+# 抓到的文章正文存入基准测试语料目录 (bench_link_extract.py 的 data/article_corpus)，按真实页面测量提取耗时
+ARTICLE_CORPUS_LIMIT = 500  # 语料最多保存的篇数
+
+
+def save_article_sample(corpus_dir, key, content, ext=".html"):
+    """保存一篇文章正文 (key 为文章 URL / 帖子 ID，同一篇只存一次)，失败静默忽略"""
+    if not corpus_dir or not content:
+        return
+    try:
+        path = os.path.join(corpus_dir, hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:16] + ext)
+        if os.path.exists(path):
+            return
+        os.makedirs(corpus_dir, exist_ok=True)
+        if len(os.listdir(corpus_dir)) >= ARTICLE_CORPUS_LIMIT:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    except OSError:
+        pass
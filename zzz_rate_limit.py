@@ -0,0 +1,84 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+# ================= 共享限频器 =================
+# 按 host 的令牌桶：每个 host 以固定速率补充令牌，桶容量即允许的突发请求数。
+# 站点响应快时请求不再白白等待固定 sleep，请求密集时又能平滑到配置的速率以下。
+# 四个爬虫脚本共用同一个进程内实例 (limiter)，同步代码调 throttle()，协程里调 throttle_async()。
+
+# host (匹配自身及其子域名，越具体越优先) -> (每秒请求数, 突发容量)
+HOST_RATES = {
+    "zzz.mihoyo.com": (2.0, 4),
+    "minas.mihoyo.com": (2.0, 4),
+    "bbs-api-static.miyoushe.com": (5.0, 10),
+    "miyoushe.com": (2.0, 4),
+}
+# 未配置的 host
+DEFAULT_RATE = (5.0, 10)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """预定一个令牌，返回需要等待的秒数 (令牌允许透支，等待结束时即归还透支额度)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RateLimiter:
+    def __init__(self, rates=None, default_rate=DEFAULT_RATE):
+        self.rates = dict(HOST_RATES if rates is None else rates)
+        self.default_rate = default_rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+        # 按 host 长度倒序匹配，保证 bbs-api-static.miyoushe.com 先于 miyoushe.com
+        self._keys = sorted(self.rates, key=len, reverse=True)
+
+    def _rule_for(self, host):
+        for key in self._keys:
+            if host == key or host.endswith("." + key):
+                return key, self.rates[key]
+        return host, self.default_rate
+
+    def bucket_for(self, url):
+        host = (urlsplit(url).hostname or url).lower()
+        key, (rate, burst) = self._rule_for(host)
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(rate, burst)
+            return self.buckets[key]
+
+    def acquire(self, url):
+        wait = self.bucket_for(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        wait = self.bucket_for(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+limiter = RateLimiter()
+
+def throttle(url):
+    """同步代码：对 url 所在 host 取一个令牌 (必要时阻塞等待)"""
+    limiter.acquire(url)
+
+async def throttle_async(url):
+    """协程版 throttle，等待时不阻塞事件循环"""
+    await limiter.acquire_async(url)
@@ -7,6 +7,13 @@ import shutil
 import zipfile
 from urllib.parse import urljoin, urlparse
 from playwright.sync_api import sync_playwright
+from zzz_http import HttpClient
+from zzz_download import COLLECT_SHARE_FILES_JS, VALID_EXTS, GLOBAL_MAX_DOWNLOADS, share_headers, download_to_dir, download_share_files, fetch_remote_sizes, diff_manifest, remote_stamp, save_zip_stamp, zip_unchanged
+from zzz_extract import extract_zip
+from zzz_dedup import DedupStore
+from zzz_verify import ChecksumWriter, REDOWNLOAD_QUEUE_NAME, load_redownload_queue, save_redownload_queue
+from zzz_link_extract import extract_cloud_pairs, order_candidates, canonical_cloud_url, dedupe_links, save_article_sample
+from zzz_rate_limit import limiter, throttle
 
 # ================= 配置区域 =================
 # 目标页面：米游社-绝区零-官方资讯
@@ -25,7 +32,116 @@ SCROLL_PAUSE_TIME = 2.0    # 每次滚动后等待时间(秒)
 NO_NEW_DATA_LIMIT = 5      # 连续N次滚动没有新内容则停止
 HEADLESS = False           # 显示浏览器以便观察滚动效果
 MAX_PROCESS_LIMIT = 5000   # 最大详情页处理数 (不限数量)
-SLOW_MO = 100              # 下载时的操作延迟
+SLOW_MO = 0                # 操作延迟 (ms)，限频改由 zzz_rate_limit 按 host 统一控制
+PRUNE_HARVESTED_CARDS = False # 清空已收割的信息流卡片，长时间滚动时内存保持平稳 (会改动页面框架管理的节点，默认关闭)
+PRUNE_KEEP_LAST = 20       # 最近 N 张已收割卡片不清空 (保证无限滚动继续触发)
+MEMORY_REPORT_INTERVAL = 50 # 每 N 次滚动输出一次页面内存 (0 = 不输出)
+FEED_CAPTURE_MODE = "network" # "network" = 监听信息流接口 JSON 取文章并按 is_last 判断到底, "dom" = 只从页面链接收割
+CLOUD_READY_TIMEOUT = 10000    # 云盘页等待密码框/文件列表出现的上限 (毫秒)，出现即继续
+LOGIN_WAIT_TIMEOUT = 5000      # 提交提取码后等待密码框消失的上限 (毫秒)，超时视为密码错误
+DOWNLOAD_MODE = "http"         # "http" = 浏览器解锁后直连流式下载文件, "browser" = 全部经浏览器下载
+SHARE_DOWNLOAD_PARALLEL = 4    # 直连模式下单个分享内同时下载的文件数
+DEDUP_ENABLED = True           # 下载完成的文件按内容哈希去重，重复文件改为硬链接 (存储在 DOWNLOAD_ROOT/.blobs)
+CHECKSUM_MANIFEST = True       # 每个分享文件夹写 .checksums.json (SHA-256)，供 zzz_verify.py 校验
+ARTICLE_CORPUS_DIR = os.path.join(DATA_DIR, "article_corpus") # 保存文章正文作 bench_link_extract.py 的语料 (None = 不保存)
+
+# ================= 列表采集 (页内一次性收割) =================
+# 在页面内用 MutationObserver 记录新插入的文章链接，每次滚动后只取出"上次之后新增"的部分，
+# 一次 evaluate 往返即可完成收割，扫描成本与信息流总长度无关。
+HARVEST_NEW_ARTICLES_JS = """
+() => {
+    const SEL = "a[href*='/article/']";
+    if (!window.__zzzHarvest) {
+        const st = window.__zzzHarvest = { pending: [], seen: new Set(), harvested: [] };
+        const take = (node) => {
+            if (node.nodeType !== 1) return;
+            if (node.matches(SEL)) st.pending.push(node);
+            node.querySelectorAll(SEL).forEach((a) => st.pending.push(a));
+        };
+        take(document.body);
+        new MutationObserver((mutations) => {
+            for (const m of mutations) {
+                if (m.type === "attributes") take(m.target);
+                else m.addedNodes.forEach(take);
+            }
+        }).observe(document.body, { childList: true, subtree: true, attributes: true, attributeFilter: ["href"] });
+    }
+    const st = window.__zzzHarvest;
+    const batch = st.pending;
+    st.pending = [];
+    // 同一篇文章可能有多个链接 (封面 + 标题)，取文字最长的作为标题
+    const byHref = new Map();
+    for (const a of batch) {
+        const href = a.href;
+        if (!href || st.seen.has(href)) continue;
+        const title = (a.innerText || "").replace(/\\s+/g, " ").trim();
+        if (!byHref.has(href) || title.length > byHref.get(href).title.length) byHref.set(href, { title: title, node: a });
+    }
+    const out = [];
+    for (const [href, item] of byHref) {
+        st.seen.add(href);
+        st.harvested.push(item.node);
+        out.push({ href: href, title: item.title });
+    }
+    return out;
+}
+"""
+
+# 清空已收割的卡片 (保留卡片节点本身和原高度作为占位，不打乱页面框架的节点引用和滚动位置)，
+# 最近 keepLast 张卡片保持原样，作为无限滚动继续触发的哨兵。返回本次清空的卡片数。
+PRUNE_HARVESTED_CARDS_JS = """
+(keepLast) => {
+    const SEL = "a[href*='/article/']";
+    const st = window.__zzzHarvest;
+    if (!st) return 0;
+    // 兄弟节点是否为另一张卡片：已清空的占位，或含指向其他文章的链接
+    const isOtherCard = (c, href) => {
+        if (c.dataset.zzzPruned) return true;
+        for (const other of c.querySelectorAll(SEL)) {
+            if (other.href !== href) return true;
+        }
+        return false;
+    };
+    // 从链接沿祖先链向上找到卡片：紧邻的兄弟节点是另一张卡片时，当前节点即为卡片。
+    // 只看相邻的几个兄弟 (跳过不含文章链接的分隔 / 广告节点)，不遍历父节点的全部子节点，
+    // 否则前面已清空的占位越积越多，每次查找都要重扫一遍 (整体 O(n²))
+    const cardOf = (a) => {
+        let el = a;
+        while (el.parentElement && el.parentElement !== document.body) {
+            for (const step of ["previousElementSibling", "nextElementSibling"]) {
+                let c = el[step];
+                for (let i = 0; c && i < 3; i++, c = c[step]) {
+                    if (isOtherCard(c, a.href)) return el;
+                    if (c.querySelector(SEL)) break;
+                }
+            }
+            el = el.parentElement;
+        }
+        return null;
+    };
+    let pruned = 0;
+    while (st.harvested.length > keepLast) {
+        const a = st.harvested.shift();
+        if (!a.isConnected) continue;
+        const card = cardOf(a);
+        if (!card || card.dataset.zzzPruned) continue;
+        const height = card.offsetHeight;
+        card.replaceChildren();
+        card.style.height = height + "px";
+        card.dataset.zzzPruned = "1";
+        pruned++;
+    }
+    return pruned;
+}
+"""
+
+# 页面内存与 DOM 规模 (performance.memory 为 Chromium 专有)
+PAGE_MEMORY_JS = """
+() => ({
+    heap: (performance.memory && performance.memory.usedJSHeapSize) || 0,
+    nodes: document.getElementsByTagName("*").length,
+})
+"""
 
 # ================= 工具函数 =================
 def ensure_dirs():
@@ -44,6 +160,74 @@ def sanitize_filename(name, max_length=80):
     name = re.sub(r'\s+', ' ', name).strip()
     return name[:max_length]
 
+def harvest_new_articles(page):
+    """返回自上次调用以来新出现的文章 [(url, title)]"""
+    try:
+        items = page.evaluate(HARVEST_NEW_ARTICLES_JS)
+    except Exception as e:
+        print(f"    [Harvest Warn] 收割失败: {e}")
+        return []
+    results = []
+    for item in items:
+        full_url = urljoin(TARGET_URL, item.get("href") or "")
+        if "/article/" in full_url:
+            results.append((full_url, item.get("title") or ""))
+    return results
+
+def prune_harvested_cards(page):
+    """清空已收割的卡片，失败不影响采集"""
+    try:
+        return page.evaluate(PRUNE_HARVESTED_CARDS_JS, PRUNE_KEEP_LAST)
+    except Exception as e:
+        print(f"    [Prune Warn] 清理失败: {e}")
+        return 0
+
+def report_page_memory(page, scroll_index):
+    try:
+        mem = page.evaluate(PAGE_MEMORY_JS)
+        print(f"    [Memory] Scroll {scroll_index}: JS Heap {mem['heap'] / 1024 / 1024:.1f} MB | DOM 节点 {mem['nodes']}")
+    except Exception as e:
+        print(f"    [Memory Warn] {e}")
+
+# ================= 信息流接口捕获 =================
+FEED_API_KEYWORD = "getNewsList"  # 即 zzz_api_spider.MIYOUSHE_API_LIST 的接口
+ARTICLE_URL_PREFIX = "https://www.miyoushe.com/zzz/article/"
+
+class FeedCapture:
+    """监听页面自己请求的信息流接口，直接从 JSON 中取文章 ID / 标题和 is_last 翻页状态"""
+    def __init__(self):
+        self.pending = []
+        self.responses = 0
+        self.is_last = False
+        self.last_id = None
+
+    def on_response(self, resp):
+        if FEED_API_KEYWORD not in resp.url:
+            return
+        try:
+            data = resp.json()
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get("retcode") != 0:
+            return
+        payload = data.get("data") or {}
+        for item in payload.get("list", []):
+            post = item.get("post") or {}
+            post_id = post.get("post_id")
+            if post_id:
+                self.pending.append((f"{ARTICLE_URL_PREFIX}{post_id}", (post.get("subject") or "").strip()))
+        self.responses += 1
+        self.is_last = bool(payload.get("is_last"))
+        self.last_id = payload.get("last_id", self.last_id)
+
+    def attach(self, page):
+        page.on("response", self.on_response)
+
+    def drain(self):
+        """取出自上次调用以来捕获到的文章 [(url, title)]"""
+        items, self.pending = self.pending, []
+        return items
+
 def handle_fatal_error(browser, url, context_info):
     """处理致命错误并记录日志"""
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -83,25 +267,56 @@ def handle_fatal_error(browser, url, context_info):
 # ==============================================================================
 FOLDER_MAP_FILE = os.path.join(DATA_DIR, "folder_map.json")
 
-def get_assigned_folder(cloud_url, suggested_name, root_dir):
-    """
-    根据云盘 URL 获取固定的本地文件夹路径。
-    如果已存在映射，则复用；否则分配新名（处理重名）并保存映射。
-    """
-    # 1. 加载映射
+# folder_map.json: 规范化的云盘 URL -> {"path": 本地目录, "pwd": 上次可用的提取码, "url": 原始链接}
+# 无需密码的云盘记为 pwd = NO_PASSWORD，下次不再试提取码 (若又出现密码框仍会用候选码重试并覆盖)
+NO_PASSWORD = ""
+
+def load_folder_map():
     mapping = {}
     if os.path.exists(FOLDER_MAP_FILE):
         try:
             with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
                 mapping = json.load(f)
         except: pass
+    # 兼容旧格式：值直接是路径字符串
+    for key, entry in mapping.items():
+        if not isinstance(entry, dict):
+            mapping[key] = {"path": entry}
+    return mapping
+
+def save_folder_map(mapping):
+    try:
+        with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, indent=2, ensure_ascii=False)
+    except: pass
+
+def share_map_key(mapping, cloud_url):
+    """
+    云盘链接在 folder_map 中的 key：统一用规范形式 (canonical_cloud_url)，
+    迁移前按原始写法保存的旧条目、或按旧规则规范化的条目 (其 url 为原始链接) 若规范形式相同则沿用旧 key。
+    """
+    key = canonical_cloud_url(cloud_url)
+    if key in mapping:
+        return key
+    for old_key, entry in mapping.items():
+        if canonical_cloud_url(entry.get("url") or old_key) == key:
+            return old_key
+    return key
+
+def get_assigned_folder(cloud_url, suggested_name, root_dir):
+    """
+    根据云盘 URL 获取固定的本地文件夹路径。
+    如果已存在映射，则复用；否则分配新名（处理重名）并保存映射。
+    """
+    # 1. 加载映射
+    mapping = load_folder_map()
     
     # 2. 检查是否已分配
-    # 使用 url 的 path 部分作为 key 避免 query 参数干扰
-    map_key = cloud_url
+    # 按规范化后的链接作 key，同一分享的不同写法共用一个文件夹
+    map_key = share_map_key(mapping, cloud_url)
     
-    if map_key in mapping:
-        assigned_path = mapping[map_key]
+    if mapping.get(map_key, {}).get("path"):
+        assigned_path = mapping[map_key]["path"]
         if not os.path.exists(assigned_path):
              # 路径如果被手动删了，也需要创建父级
              parent = os.path.dirname(assigned_path)
@@ -112,7 +327,7 @@ def get_assigned_folder(cloud_url, suggested_name, root_dir):
     final_path = base_path
     
     # 获取所有已经被占用的路径集合
-    used_paths = set(p.lower().replace('\\', '/') for p in mapping.values())
+    used_paths = set(e["path"].lower().replace('\\', '/') for e in mapping.values() if e.get("path"))
     
     counter = 1
     # 冲突检测：路径物理存在 OR 路径已被其他 URL 预占
@@ -128,16 +343,60 @@ def get_assigned_folder(cloud_url, suggested_name, root_dir):
         counter += 1
         
     # 4. 保存映射
-    mapping[map_key] = final_path
-    try:
-        with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
-            json.dump(mapping, f, indent=2, ensure_ascii=False)
-    except: pass
+    entry = mapping.setdefault(map_key, {})
+    entry["path"] = final_path
+    entry.setdefault("url", cloud_url)  # 原始链接，按重下队列补下时用它打开
+    save_folder_map(mapping)
     
     return final_path
 
-def attempt_cloud_login(page, password_candidates):
-    """尝试云盘登录"""
+def get_share_password(cloud_url):
+    """上次可用的提取码；NO_PASSWORD 表示无需密码，None 表示未知"""
+    mapping = load_folder_map()
+    return mapping.get(share_map_key(mapping, cloud_url), {}).get("pwd")
+
+def remember_share_password(cloud_url, pwd):
+    """登录成功后记下可用的提取码 (pwd 为 None 表示登录失败，不记录)"""
+    if pwd is None:
+        return
+    mapping = load_folder_map()
+    entry = mapping.setdefault(share_map_key(mapping, cloud_url), {})
+    if entry.get("pwd") != pwd:
+        entry["pwd"] = pwd
+        save_folder_map(mapping)
+
+# 云盘页就绪判断：出现密码框、打包按钮或文件链接 (或已是 404 页) 即视为就绪
+CLOUD_READY_JS = """
+() => {
+    if (document.title.includes("404") || (document.body && document.body.innerText.includes("页面不存在"))) return true;
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const pwd = document.querySelectorAll("input[type='password'], input[placeholder*='密码'], input[placeholder*='提取']");
+    if (Array.from(pwd).some(visible)) return true;
+    const exts = [".jpg", ".png", ".gif", ".zip", ".rar", ".7z", ".mp4"];
+    return Array.from(document.querySelectorAll("a[href], button")).some((el) => {
+        if (!visible(el)) return false;
+        const t = (el.innerText || "").trim().toLowerCase();
+        return /zip|打包|全部下载/.test(t) || exts.some((e) => t.endsWith(e));
+    });
+}
+"""
+
+def wait_cloud_ready(page, timeout=CLOUD_READY_TIMEOUT):
+    """等待云盘页就绪 (条件满足立即返回，超时不报错，交给后续逻辑判断)"""
+    try:
+        page.wait_for_function(CLOUD_READY_JS, timeout=timeout)
+        return True
+    except:
+        return False
+
+def attempt_cloud_login(page, password_candidates, known_pwd=None):
+    """
+    尝试云盘登录 (候选码按优先级排列，与该链接配对的码在最前)。
+    known_pwd 为上次记下的提取码 / NO_PASSWORD。返回可用的提取码，无需密码返回 NO_PASSWORD，失败返回 None。
+    """
+    if known_pwd:
+        password_candidates = [known_pwd] + [c for c in password_candidates if c != known_pwd]
+
     input_selectors = ["input[type='password']", "input[placeholder*='密码']", "input[placeholder*='提取']"]
     confirm_selectors = ["button:has-text('确认')", "button:has-text('确定')", "button:has-text('进入')"]
 
@@ -148,10 +407,13 @@ def attempt_cloud_login(page, password_candidates):
             break
             
     if not found_input:
-        return None  # 无需密码
+        return NO_PASSWORD  # 无需密码
 
+    if known_pwd == NO_PASSWORD:
+        # 上次记为无需密码，分享后来加了密码：改用候选码，成功后覆盖记录
+        print("      [Login] 原记录无需密码，但出现了密码框，改用候选码尝试")
     print(f"      [Login] 发现密码框，开始尝试...")
-    for pwd in password_candidates:
+    for attempt, pwd in enumerate(password_candidates, 1):
         try:
             page.fill(found_input, pwd)
             clicked = False
@@ -163,9 +425,14 @@ def attempt_cloud_login(page, password_candidates):
             if not clicked:
                 page.press(found_input, "Enter")
             
-            time.sleep(1.5)
-            if not page.locator(found_input).is_visible():
-                return pwd
+            # 密码框消失即登录成功，超时视为密码错误
+            try:
+                page.locator(found_input).first.wait_for(state="hidden", timeout=LOGIN_WAIT_TIMEOUT)
+            except:
+                continue
+            print(f"      [Login] 第 {attempt} 次尝试成功")
+            wait_cloud_ready(page)
+            return pwd
         except:
             pass
     return None
@@ -193,12 +460,63 @@ def determine_local_folder(page, url):
             
     return sanitize_filename(folder_name)
 
+# 直连下载共用的 keep-alive 连接池 (请求同样经过共享限频器)，每个 host 的连接数与全局下载上限一致
+DOWNLOAD_CLIENT = HttpClient(max_per_host=GLOBAL_MAX_DOWNLOADS, timeout=60, limiter=limiter)
+# 内容寻址去重存储，哈希在后台线程池里做，不阻塞下载
+DEDUP_STORE = DedupStore(os.path.join(DOWNLOAD_ROOT, ".blobs")) if DEDUP_ENABLED else None
+# 校验清单在后台线程里增量更新；zzz_verify.py --requeue 写入的重下队列在启动时先处理
+CHECKSUM_WRITER = ChecksumWriter() if CHECKSUM_MANIFEST else None
+REDOWNLOAD_QUEUE_FILE = os.path.join(DATA_DIR, REDOWNLOAD_QUEUE_NAME)
+
+def share_request_headers(page):
+    """直连请求头：浏览器会话的 Cookie + UA，Referer 为分享页"""
+    cookies = page.context.cookies()
+    return share_headers(cookies, page.url, page.evaluate("navigator.userAgent"))
+
+def collect_share_files(page):
+    """直连模式：收集已解锁分享页上的文件 ([{name, url}]) 及请求头"""
+    found = page.evaluate(COLLECT_SHARE_FILES_JS, list(VALID_EXTS))
+    files = [{"name": sanitize_filename(f["name"]), "url": f["url"]} for f in found]
+    return files, share_request_headers(page)
+
+def share_manifest(page):
+    """清单：已解锁分享页上的文件 ([{name, url, size}]) 及请求头，直连模式下补全远程大小；失败返回 ([], None)"""
+    try:
+        files, headers = collect_share_files(page)
+    except Exception as e:
+        print(f"      [Manifest] 列出文件失败: {e}")
+        return [], None
+    if files and DOWNLOAD_MODE == "http":
+        fetch_remote_sizes(DOWNLOAD_CLIENT, files, headers, SHARE_DOWNLOAD_PARALLEL)
+    return files, headers
+
+def direct_zip_url(page, btn):
+    """打包按钮是真实下载地址的 <a href> 时返回绝对地址，否则返回 None (只能点击后由浏览器下载)"""
+    try:
+        href = btn.get_attribute("href")
+    except:
+        return None
+    url = urljoin(page.url, href) if href else ""
+    return url if url.startswith(("http://", "https://")) else None
+
 def download_content(page, local_dir):
     """核心下载逻辑：优先ZIP，降级逐个文件"""
     downloaded_files = []
     mode = "failed"
     
-    # 1. 尝试 ZIP
+    # 0. 清单比对：列出分享里的文件及大小，与本地文件夹比较；已完整则整个跳过，只缺部分时只补缺的文件
+    files, headers = share_manifest(page)
+    complete = []
+    if files:
+        missing, complete = diff_manifest(files, local_dir)
+        if not missing:
+            print(f"      [Manifest] 本地已完整 ({len(complete)} 个文件)，跳过下载")
+            return "up_to_date", complete
+        if complete:
+            print(f"      [Manifest] 本地已有 {len(complete)}/{len(files)} 个文件，只补下缺少的 {len(missing)} 个")
+        files = missing
+    
+    # 1. 尝试 ZIP (本地已有部分文件时不再整包下载)
     zip_btns = page.locator("button, a").filter(has_text=re.compile("ZIP|打包|全部下载", re.IGNORECASE)).all()
     target_btn = None
     for btn in zip_btns:
@@ -206,23 +524,50 @@ def download_content(page, local_dir):
             target_btn = btn
             break
             
-    if target_btn:
+    if target_btn and not complete:
         print(f"      [ZIP] 发现打包下载按钮，尝试下载...")
         try:
-            with page.expect_download(timeout=60000) as download_info:
-                target_btn.click()
-            
-            download = download_info.value
-            safe_name = sanitize_filename(download.suggested_filename)
+            remote = None
+            zip_url = direct_zip_url(page, target_btn) if DOWNLOAD_MODE == "http" else None
+            if zip_url:
+                # 直连流式下载；远程 ZIP 与上次解压的一致且成员都在时不再下载
+                headers = share_request_headers(page)
+                try:
+                    remote = remote_stamp(DOWNLOAD_CLIENT, zip_url, headers)
+                except Exception:
+                    remote = None
+                members = zip_unchanged(local_dir, remote=remote) if remote else None
+                if members:
+                    print(f"      [ZIP] 远程 ZIP 未变化，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                safe_name, _ = download_to_dir(DOWNLOAD_CLIENT, zip_url, local_dir, headers, sanitize_filename)
+            else:
+                throttle(page.url)
+                with page.expect_download(timeout=60000) as download_info:
+                    target_btn.click()
+                
+                download = download_info.value
+                safe_name = sanitize_filename(download.suggested_filename)
+                # 浏览器下载拿不到大小，按文件名与解压出的成员判断
+                members = zip_unchanged(local_dir, name=safe_name)
+                if members:
+                    download.cancel()
+                    print(f"      [ZIP] {safe_name} 上次已解压，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                if os.path.exists(os.path.join(local_dir, safe_name)):
+                    # 上次已下载 (未解压或不是 ZIP)，不再重复下载
+                    download.cancel()
+                    print(f"      [Skip] 文件已存在: {safe_name}")
+                else:
+                    download.save_as(os.path.join(local_dir, safe_name))
             save_path = os.path.join(local_dir, safe_name)
-            download.save_as(save_path)
             
-            # 解压处理
+            # 解压处理 (逐个成员增量解压，未变化的文件跳过)
             if zipfile.is_zipfile(save_path):
                 try:
-                    with zipfile.ZipFile(save_path, 'r') as zf:
-                        zf.extractall(local_dir)
-                        downloaded_files.extend(zf.namelist())
+                    names, _ = extract_zip(save_path, local_dir)
+                    downloaded_files.extend(names)
+                    save_zip_stamp(save_path, local_dir, remote) # 删除前记下 ZIP 的大小 / ETag 与成员，重跑时据此跳过
                     os.remove(save_path) # 删除原 ZIP
                     mode = "zip_extracted"
                 except Exception as e:
@@ -239,6 +584,15 @@ def download_content(page, local_dir):
     # 2. 降级：逐个文件
     print("      [Fallback] 尝试逐个文件下载...")
     valid_exts = ('.jpg', '.png', '.gif', '.zip', '.rar', '.7z', '.mp4')
+    if DOWNLOAD_MODE == "http":
+        # 文件链接在清单阶段已收集 (只剩本地缺少的)
+        if files:
+            print(f"      [HTTP] 直连下载 {len(files)} 个文件...")
+            downloaded, failed = download_share_files(DOWNLOAD_CLIENT, files, local_dir, headers, SHARE_DOWNLOAD_PARALLEL)
+            if not failed:
+                return "http_files", complete + downloaded
+            # 已下载的文件在下面的循环里会按 "已存在" 跳过
+            print(f"      [HTTP] {len(failed)} 个文件直连失败，交给浏览器补下...")
     try:
         links = page.locator("a[href]").all()
         file_links = [l for l in links if l.is_visible() and l.inner_text().lower().endswith(valid_exts)]
@@ -251,7 +605,7 @@ def download_content(page, local_dir):
             safe_fname = sanitize_filename(fname)
             
             # 检查文件是否已存在 (去重)
-            if os.path.exists(os.path.join(local_dir, safe_fname)):
+            if safe_fname in complete or os.path.exists(os.path.join(local_dir, safe_fname)):
                 print(f"      [Skip] 文件已存在: {safe_fname}")
                 downloaded_files.append(safe_fname)
                 continue
@@ -259,16 +613,16 @@ def download_content(page, local_dir):
             # 重试逻辑
             for attempt in range(2):
                 try:
+                    throttle(page.url)
                     with page.expect_download(timeout=15000) as di:
                         link.click(timeout=3000)
                     dl = di.value
                     sname = sanitize_filename(dl.suggested_filename) or safe_fname
                     dl.save_as(os.path.join(local_dir, sname))
                     downloaded_files.append(sname)
-                    time.sleep(0.5)
                     break
                 except:
-                    if attempt == 0: time.sleep(1)
+                    pass
         
         if downloaded_files:
             mode = "individual_files"
@@ -280,47 +634,6 @@ def download_content(page, local_dir):
 
 # ================= 核心逻辑 =================
 
-def extract_cloud_info_from_text(text):
-    """从文本中提取云盘链接和密码"""
-    # 常见网盘域名
-    pan_domains = [
-        r"pan\.baidu\.com/s/[\w-]+", 
-        r"yun\.baidu\.com/s/[\w-]+",
-        r"aliyundrive\.com/s/[\w-]+",
-        r"alipan\.com/s/[\w-]+",
-        r"cloud\.189\.cn/t/[\w-]+",
-        r"lanzou\w?\.com/[\w]+",
-        r"quark\.cn/s/[\w-]+",
-        r"123pan\.com/s/[\w-]+"
-    ]
-    
-    found_links = []
-    # 1. 简单正则提取 URL
-    urls = re.findall(r"https?://[^\s\"')<>]+", text)
-    # 优先匹配 minas (米哈游专用)
-    minas_links = [u for u in urls if "minas.mihoyo.com" in u]
-    
-    # 其他网盘
-    other_links = []
-    for u in urls:
-        for domain_pat in pan_domains:
-            if re.search(domain_pat, u):
-                other_links.append(u)
-                break
-    
-    # 2. 提取密码/提取码
-    codes = []
-    code_patterns = [
-        r"(?:密码|提取码|访问码|口令)\s*[:：]\s*([A-Za-z0-9]{4,})",
-        r"(?:code)\s*[:：]\s*([A-Za-z0-9]{4,})"
-    ]
-    for pat in code_patterns:
-        found = re.findall(pat, text)
-        codes.extend(found)
-        
-    # 合并去重
-    return list(set(minas_links + other_links)), list(set(codes))
-
 def process_single_article(context, browser, article_url, title):
     """(Refactored) 处理单个详情页，包含提取云盘链接和下载"""
     worker_page = None
@@ -329,6 +642,7 @@ def process_single_article(context, browser, article_url, title):
         print(f"  [Processing] 分析: {title[:30]}...")
         
         # 访问详情页
+        throttle(article_url)
         response = worker_page.goto(article_url, wait_until="domcontentloaded", timeout=45000)
         if response and response.status == 404:
             handle_fatal_error(browser, article_url, f"Article Detail Page (文章详情) - Title: {title}")
@@ -371,11 +685,15 @@ def process_single_article(context, browser, article_url, title):
         
         content_html = worker_page.content()
         content_text = worker_page.inner_text("body")
+        save_article_sample(ARTICLE_CORPUS_DIR, article_url, content_html)
         
         # 提取链接
-        links_html, _ = extract_cloud_info_from_text(content_html)
-        links_text, codes = extract_cloud_info_from_text(content_text)
-        all_cloud_links = list(set(links_html + links_text))
+        links_html, _, paired_html = extract_cloud_pairs(content_html, is_html=True)
+        links_text, codes, paired = extract_cloud_pairs(content_text)
+        # 纯文本里配不上码的链接，用 HTML (DOM 位置) 的配对补上
+        for key, code in paired_html.items():
+            paired.setdefault(key, code)
+        all_cloud_links = dedupe_links(links_html + links_text)
         
         if not all_cloud_links:
              # print("    -> 无云盘链接")
@@ -399,6 +717,7 @@ def process_single_article(context, browser, article_url, title):
                     
                     if link_locator.count() > 0 and link_locator.is_visible():
                         print("      [Action] 模拟点击进入 (新标签页)...")
+                        throttle(link)
                         with context.expect_page(timeout=10000) as new_page_info:
                             # 按住 Control 点击以在新标签页打开
                             worker_page.keyboard.down("Control")
@@ -412,19 +731,21 @@ def process_single_article(context, browser, article_url, title):
                     # 降级：直接新建页面访问
                     print(f"      [Action] 元素未定位或点击失败，转为直接访问: {e}")
                     cloud_page = context.new_page()
+                    throttle(link)
                     response = cloud_page.goto(link, wait_until="domcontentloaded")
                     if response and response.status == 404:
                         handle_fatal_error(browser, link, "Cloud Disk Direct Access (网盘直连)")
 
                 # 在 cloud_page 上执行后续操作
-                time.sleep(1)
+                wait_cloud_ready(cloud_page)
                 
                 # 检测 404 (如果是点击进来的，response 对象可能拿不到，检查标题或内容)
                 if "404" in cloud_page.title() or "页面不存在" in cloud_page.inner_text("body"):
                      handle_fatal_error(browser, link, "Cloud Disk Clicked Page (网盘页面404特征检测)")
 
                 # 尝试登录
-                attempt_cloud_login(cloud_page, codes)
+                used_pwd = attempt_cloud_login(cloud_page, order_candidates(link, codes, paired), get_share_password(link))
+                remember_share_password(link, used_pwd)
 
                 # 确定文件夹
                 folder_name = determine_local_folder(cloud_page, link)
@@ -440,6 +761,10 @@ def process_single_article(context, browser, article_url, title):
                 
                 # 执行下载 (传入 cloud_page)
                 mode, files = download_content(cloud_page, local_path)
+                if DEDUP_STORE and files:
+                    DEDUP_STORE.submit_dir(local_path)
+                if CHECKSUM_WRITER and files:
+                    CHECKSUM_WRITER.submit(local_path)
                 
                 # 记录结果 (文件级别)
                 record = {
@@ -476,6 +801,39 @@ def process_single_article(context, browser, article_url, title):
             except: pass
 
 
+def process_redownload_queue(context):
+    """启动时先补下 zzz_verify.py --requeue 记录的损坏 / 缺失文件 (用记住的提取码直接打开分享)"""
+    queue = load_redownload_queue(REDOWNLOAD_QUEUE_FILE)
+    if not queue:
+        return
+    print(f"--> [Requeue] 重下队列中有 {len(queue)} 个分享")
+    page = context.new_page()
+    remaining = []
+    for item in queue:
+        link, local_path = item["url"], item["path"]
+        try:
+            throttle(link)
+            page.goto(link, wait_until="domcontentloaded", timeout=45000)
+            wait_cloud_ready(page)
+            candidates = [item["pwd"]] if item.get("pwd") else []
+            if attempt_cloud_login(page, candidates, get_share_password(link)) is None:
+                raise Exception("提取码已失效")
+            os.makedirs(local_path, exist_ok=True)
+            mode, files = download_content(page, local_path)
+            print(f"    -> [Requeue] {local_path}: {mode}, {len(files)} 个文件")
+            if mode in ("failed", "no_files_found"):
+                raise Exception(mode)
+            if DEDUP_STORE:
+                DEDUP_STORE.submit_dir(local_path)
+            if CHECKSUM_WRITER:
+                CHECKSUM_WRITER.submit(local_path)
+        except Exception as e:
+            print(f"    -> [Requeue Warn] {link}: {e}")
+            remaining.append(item)
+    page.close()
+    save_redownload_queue(REDOWNLOAD_QUEUE_FILE, remaining)
+
+
 def run_spider():
     ensure_dirs()
     
@@ -487,9 +845,16 @@ def run_spider():
             viewport={'width': 1280, 'height': 800},
             accept_downloads=True
         )
+        process_redownload_queue(context)
         page = context.new_page()
         
+        # 接口捕获需在打开页面前挂上监听，首屏数据也能拿到
+        feed_capture = FeedCapture()
+        if FEED_CAPTURE_MODE == "network":
+            feed_capture.attach(page)
+        
         print(f"--> 打开页面: {TARGET_URL}")
+        throttle(TARGET_URL)
         response = page.goto(TARGET_URL, wait_until="domcontentloaded")
         if response and response.status == 404:
             handle_fatal_error(browser, TARGET_URL, "Main Feed Page (入口页)")
@@ -505,26 +870,17 @@ def run_spider():
         # 用于记录已处理过的 URL，防止重复
         processed_urls = set()
         
+        reached_limit = False
         for i in range(MAX_SCROLL_ATTEMPTS):
-            # 1. 扫描当前页面上的所有文章链接
-            elements = page.locator("a[href*='/article/']").all()
-            
-            # 识别本次扫描到的新内容
+            # 1. 收割新文章：接口捕获的结果优先 (标题更准确)，页内链接收割兜底
+            # is_last 须在 drain 之前读取：处理文章期间才到达的最后一页留到下一轮取出后再停止
+            reached_last = feed_capture.is_last
             new_items = []
-            
-            for el in elements:
-                try:
-                    href = el.get_attribute("href")
-                    title = el.inner_text().replace('\n', ' ').strip()
-                    if href:
-                        full_url = urljoin(TARGET_URL, href)
-                        if "/article/" in full_url:
-                            # 关键：只添加尚未处理过的
-                            if full_url not in processed_urls:
-                                item = (full_url, title)
-                                new_items.append(item)
-                                processed_urls.add(full_url)
-                except: continue
+            for full_url, title in feed_capture.drain() + harvest_new_articles(page):
+                # 关键：只添加尚未处理过的
+                if full_url not in processed_urls:
+                    new_items.append((full_url, title))
+                    processed_urls.add(full_url)
             
             current_total_count = len(processed_urls)
             print(f"    [Loop {i+1}] 累计发现文章: {current_total_count} | 本次新增: {len(new_items)}")
@@ -537,26 +893,44 @@ def run_spider():
                 
                 for idx, (url, title) in enumerate(new_items):
                     if len(processed_urls) > MAX_PROCESS_LIMIT:
-                        print("    -> 已达到最大处理限制，停止。")
-                        browser.close()
-                        return
+                        reached_limit = True
+                        break
 
                     process_single_article(context, browser, url, title)
             else:
                 no_change_counter += 1
             
-            # 3. 检查是否需要停止 (即使没有新内容，也可能因为还没滚动到底部)
-            if no_change_counter >= NO_NEW_DATA_LIMIT:
+            # 达到上限也走下面的收尾流程，去重存储与校验清单需要落盘
+            if reached_limit:
+                print("    -> 已达到最大处理限制，停止。")
+                break
+            
+            # 3. 检查是否需要停止：优先使用接口的 is_last，连续空滚动只作为兜底
+            if reached_last:
+                print("    -> 信息流接口返回 is_last，已到底，停止滚动。")
+                break
+            if no_change_counter >= NO_NEW_DATA_LIMIT and not feed_capture.pending:
                 print("    -> 连续多次未发现新文章，停止滚动。")
                 break
                 
-            # 4. 执行滚动加载更多
+            # 4. 清理已收割的卡片，定期输出页面内存
+            if PRUNE_HARVESTED_CARDS:
+                prune_harvested_cards(page)
+            if MEMORY_REPORT_INTERVAL and (i + 1) % MEMORY_REPORT_INTERVAL == 0:
+                report_page_memory(page, i + 1)
+                
+            # 5. 执行滚动加载更多
             print("    -> 滚动加载下一页...")
+            throttle(TARGET_URL)
             page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
             try:
                 page.wait_for_timeout(SCROLL_PAUSE_TIME * 1000)
             except: pass
 
+        if DEDUP_STORE:
+            DEDUP_STORE.close()
+        if CHECKSUM_WRITER:
+            CHECKSUM_WRITER.close()
         print(f"--> 全部完成，结果已保存至: {OUTPUT_FILE}")
         browser.close()
 
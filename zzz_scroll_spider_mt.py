@@ -8,6 +8,14 @@ import zipfile
 import asyncio
 from urllib.parse import urljoin, urlparse
 from playwright.async_api import async_playwright
+from zzz_http import HttpClient
+from zzz_download import COLLECT_SHARE_FILES_JS, VALID_EXTS, GLOBAL_MAX_DOWNLOADS, share_headers, download_to_dir, download_share_files, fetch_remote_sizes, diff_manifest, remote_stamp, save_zip_stamp, zip_unchanged
+from zzz_extract import extract_zip
+from zzz_dedup import DedupStore
+from zzz_verify import ChecksumWriter, REDOWNLOAD_QUEUE_NAME, load_redownload_queue, save_redownload_queue
+from zzz_link_extract import extract_cloud_pairs, order_candidates, canonical_cloud_url, dedupe_links, save_article_sample
+from zzz_rate_limit import limiter, throttle_async
+from zzz_concurrency import AdaptiveLimiter, SingleFlight, classify_outcome
 
 # ================= 配置区域 =================
 # 目标页面：米游社-绝区零-官方资讯
@@ -28,14 +36,128 @@ SCROLL_PAUSE_TIME = 2.0      # 每次滚动后等待时间(秒)
 NO_NEW_DATA_LIMIT = 5        # 连续N次滚动没有新内容则停止
 HEADLESS = True             # 显示浏览器
 MAX_PROCESS_LIMIT = 1000000  # 最大详情页处理数 (不限)
-SLOW_MO = 100                # 操作延迟 (ms)
-CONCURRENCY_LIMIT = 3        # 最大并发数 (多线程/多协程)
+SLOW_MO = 0                  # 操作延迟 (ms)，限频改由 zzz_rate_limit 按 host 统一控制
+CONCURRENCY_LIMIT = 3        # 初始并发数 (运行中按 AIMD 自适应调整)
+CONCURRENCY_MIN = 1          # 自适应并发下限
+CONCURRENCY_MAX = 12         # 自适应并发上限 (同时也是处理协程数)
+QUEUE_MAX_SIZE = CONCURRENCY_LIMIT * 4  # 待处理队列上限 (队列满时滚动暂停，形成背压)
+ARTICLE_RETRY_ROUNDS = 2     # 被限流 (429/503) 或 soft 404 的文章，列表处理完后重新入队的轮数
+ARTICLE_RETRY_DELAY = 30     # 每轮重新入队前等待的秒数 (给风控冷却时间)
+PRUNE_HARVESTED_CARDS = False # 清空已收割的信息流卡片，长时间滚动时内存保持平稳 (会改动页面框架管理的节点，默认关闭)
+PRUNE_KEEP_LAST = 20         # 最近 N 张已收割卡片不清空 (保证无限滚动继续触发)
+MEMORY_REPORT_INTERVAL = 50  # 每 N 次滚动输出一次页面内存 (0 = 不输出)
+FEED_CAPTURE_MODE = "network"  # "network" = 监听信息流接口 JSON 取文章并按 is_last 判断到底, "dom" = 只从页面链接收割
+CLOUD_READY_TIMEOUT = 10000    # 云盘页等待密码框/文件列表出现的上限 (毫秒)，出现即继续
+LOGIN_WAIT_TIMEOUT = 5000      # 提交提取码后等待密码框消失的上限 (毫秒)，超时视为密码错误
+DOWNLOAD_MODE = "http"         # "http" = 浏览器解锁后直连流式下载文件, "browser" = 全部经浏览器下载
+SHARE_DOWNLOAD_PARALLEL = 4    # 直连模式下单个分享内同时下载的文件数
+DEDUP_ENABLED = True           # 下载完成的文件按内容哈希去重，重复文件改为硬链接 (存储在 DOWNLOAD_ROOT/.blobs)
+CHECKSUM_MANIFEST = True       # 每个分享文件夹写 .checksums.json (SHA-256)，供 zzz_verify.py 校验
+ARTICLE_CORPUS_DIR = os.path.join(DATA_DIR, "article_corpus") # 保存文章正文作 bench_link_extract.py 的语料 (None = 不保存)
 
 # ================= 全局锁 =================
 file_write_lock = asyncio.Lock()
 folder_map_lock = asyncio.Lock()
 error_log_lock = asyncio.Lock()
 
+# ================= 列表采集 (页内一次性收割) =================
+# 在页面内用 MutationObserver 记录新插入的文章链接，每次滚动后只取出"上次之后新增"的部分，
+# 一次 evaluate 往返即可完成收割，扫描成本与信息流总长度无关。
+HARVEST_NEW_ARTICLES_JS = """
+() => {
+    const SEL = "a[href*='/article/']";
+    if (!window.__zzzHarvest) {
+        const st = window.__zzzHarvest = { pending: [], seen: new Set(), harvested: [] };
+        const take = (node) => {
+            if (node.nodeType !== 1) return;
+            if (node.matches(SEL)) st.pending.push(node);
+            node.querySelectorAll(SEL).forEach((a) => st.pending.push(a));
+        };
+        take(document.body);
+        new MutationObserver((mutations) => {
+            for (const m of mutations) {
+                if (m.type === "attributes") take(m.target);
+                else m.addedNodes.forEach(take);
+            }
+        }).observe(document.body, { childList: true, subtree: true, attributes: true, attributeFilter: ["href"] });
+    }
+    const st = window.__zzzHarvest;
+    const batch = st.pending;
+    st.pending = [];
+    // 同一篇文章可能有多个链接 (封面 + 标题)，取文字最长的作为标题
+    const byHref = new Map();
+    for (const a of batch) {
+        const href = a.href;
+        if (!href || st.seen.has(href)) continue;
+        const title = (a.innerText || "").replace(/\\s+/g, " ").trim();
+        if (!byHref.has(href) || title.length > byHref.get(href).title.length) byHref.set(href, { title: title, node: a });
+    }
+    const out = [];
+    for (const [href, item] of byHref) {
+        st.seen.add(href);
+        st.harvested.push(item.node);
+        out.push({ href: href, title: item.title });
+    }
+    return out;
+}
+"""
+
+# 清空已收割的卡片 (保留卡片节点本身和原高度作为占位，不打乱页面框架的节点引用和滚动位置)，
+# 最近 keepLast 张卡片保持原样，作为无限滚动继续触发的哨兵。返回本次清空的卡片数。
+PRUNE_HARVESTED_CARDS_JS = """
+(keepLast) => {
+    const SEL = "a[href*='/article/']";
+    const st = window.__zzzHarvest;
+    if (!st) return 0;
+    // 兄弟节点是否为另一张卡片：已清空的占位，或含指向其他文章的链接
+    const isOtherCard = (c, href) => {
+        if (c.dataset.zzzPruned) return true;
+        for (const other of c.querySelectorAll(SEL)) {
+            if (other.href !== href) return true;
+        }
+        return false;
+    };
+    // 从链接沿祖先链向上找到卡片：紧邻的兄弟节点是另一张卡片时，当前节点即为卡片。
+    // 只看相邻的几个兄弟 (跳过不含文章链接的分隔 / 广告节点)，不遍历父节点的全部子节点，
+    // 否则前面已清空的占位越积越多，每次查找都要重扫一遍 (整体 O(n²))
+    const cardOf = (a) => {
+        let el = a;
+        while (el.parentElement && el.parentElement !== document.body) {
+            for (const step of ["previousElementSibling", "nextElementSibling"]) {
+                let c = el[step];
+                for (let i = 0; c && i < 3; i++, c = c[step]) {
+                    if (isOtherCard(c, a.href)) return el;
+                    if (c.querySelector(SEL)) break;
+                }
+            }
+            el = el.parentElement;
+        }
+        return null;
+    };
+    let pruned = 0;
+    while (st.harvested.length > keepLast) {
+        const a = st.harvested.shift();
+        if (!a.isConnected) continue;
+        const card = cardOf(a);
+        if (!card || card.dataset.zzzPruned) continue;
+        const height = card.offsetHeight;
+        card.replaceChildren();
+        card.style.height = height + "px";
+        card.dataset.zzzPruned = "1";
+        pruned++;
+    }
+    return pruned;
+}
+"""
+
+# 页面内存与 DOM 规模 (performance.memory 为 Chromium 专有)
+PAGE_MEMORY_JS = """
+() => ({
+    heap: (performance.memory && performance.memory.usedJSHeapSize) || 0,
+    nodes: document.getElementsByTagName("*").length,
+})
+"""
+
 # ================= 工具函数 =================
 def ensure_dirs():
     if not os.path.exists(DATA_DIR):
@@ -54,6 +176,74 @@ def sanitize_filename(name, max_length=80):
     name = re.sub(r'\s+', ' ', name).strip()
     return name[:max_length]
 
+async def harvest_new_articles(page):
+    """返回自上次调用以来新出现的文章 [(url, title)]"""
+    try:
+        items = await page.evaluate(HARVEST_NEW_ARTICLES_JS)
+    except Exception as e:
+        print(f"    [Harvest Warn] 收割失败: {e}")
+        return []
+    results = []
+    for item in items:
+        full_url = urljoin(TARGET_URL, item.get("href") or "")
+        if "/article/" in full_url:
+            results.append((full_url, item.get("title") or ""))
+    return results
+
+async def prune_harvested_cards(page):
+    """清空已收割的卡片，失败不影响采集"""
+    try:
+        return await page.evaluate(PRUNE_HARVESTED_CARDS_JS, PRUNE_KEEP_LAST)
+    except Exception as e:
+        print(f"    [Prune Warn] 清理失败: {e}")
+        return 0
+
+async def report_page_memory(page, scroll_index):
+    try:
+        mem = await page.evaluate(PAGE_MEMORY_JS)
+        print(f"    [Memory] Scroll {scroll_index}: JS Heap {mem['heap'] / 1024 / 1024:.1f} MB | DOM 节点 {mem['nodes']}")
+    except Exception as e:
+        print(f"    [Memory Warn] {e}")
+
+# ================= 信息流接口捕获 =================
+FEED_API_KEYWORD = "getNewsList"  # 即 zzz_api_spider.MIYOUSHE_API_LIST 的接口
+ARTICLE_URL_PREFIX = "https://www.miyoushe.com/zzz/article/"
+
+class FeedCapture:
+    """监听页面自己请求的信息流接口，直接从 JSON 中取文章 ID / 标题和 is_last 翻页状态"""
+    def __init__(self):
+        self.pending = []
+        self.responses = 0
+        self.is_last = False
+        self.last_id = None
+
+    async def on_response(self, resp):
+        if FEED_API_KEYWORD not in resp.url:
+            return
+        try:
+            data = await resp.json()
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get("retcode") != 0:
+            return
+        payload = data.get("data") or {}
+        for item in payload.get("list", []):
+            post = item.get("post") or {}
+            post_id = post.get("post_id")
+            if post_id:
+                self.pending.append((f"{ARTICLE_URL_PREFIX}{post_id}", (post.get("subject") or "").strip()))
+        self.responses += 1
+        self.is_last = bool(payload.get("is_last"))
+        self.last_id = payload.get("last_id", self.last_id)
+
+    def attach(self, page):
+        page.on("response", self.on_response)
+
+    def drain(self):
+        """取出自上次调用以来捕获到的文章 [(url, title)]"""
+        items, self.pending = self.pending, []
+        return items
+
 async def handle_fatal_error(browser, url, context_info):
     """处理致命错误并记录日志"""
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -92,6 +282,42 @@ async def handle_fatal_error(browser, url, context_info):
 # ==============================================================================
 # Helper: Folder Mapping Manager
 # ==============================================================================
+# folder_map.json: 规范化的云盘 URL -> {"path": 本地目录, "pwd": 上次可用的提取码, "url": 原始链接}
+# 无需密码的云盘记为 pwd = NO_PASSWORD，下次不再试提取码 (若又出现密码框仍会用候选码重试并覆盖)
+NO_PASSWORD = ""
+
+def load_folder_map():
+    mapping = {}
+    if os.path.exists(FOLDER_MAP_FILE):
+        try:
+            with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
+                mapping = json.load(f)
+        except: pass
+    # 兼容旧格式：值直接是路径字符串
+    for key, entry in mapping.items():
+        if not isinstance(entry, dict):
+            mapping[key] = {"path": entry}
+    return mapping
+
+def save_folder_map(mapping):
+    try:
+        with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, indent=2, ensure_ascii=False)
+    except: pass
+
+def share_map_key(mapping, cloud_url):
+    """
+    云盘链接在 folder_map 中的 key：统一用规范形式 (canonical_cloud_url)，
+    迁移前按原始写法保存的旧条目、或按旧规则规范化的条目 (其 url 为原始链接) 若规范形式相同则沿用旧 key。
+    """
+    key = canonical_cloud_url(cloud_url)
+    if key in mapping:
+        return key
+    for old_key, entry in mapping.items():
+        if canonical_cloud_url(entry.get("url") or old_key) == key:
+            return old_key
+    return key
+
 async def get_assigned_folder(cloud_url, suggested_name, root_dir):
     """
     根据云盘 URL 获取固定的本地文件夹路径。
@@ -99,17 +325,12 @@ async def get_assigned_folder(cloud_url, suggested_name, root_dir):
     """
     async with folder_map_lock:
         # 1. 加载映射 (Sync IO is acceptable here for simplicity, inside lock)
-        mapping = {}
-        if os.path.exists(FOLDER_MAP_FILE):
-            try:
-                with open(FOLDER_MAP_FILE, 'r', encoding='utf-8') as f:
-                    mapping = json.load(f)
-            except: pass
+        mapping = load_folder_map()
         
         # 2. 检查是否已分配
-        map_key = cloud_url
-        if map_key in mapping:
-            assigned_path = mapping[map_key]
+        map_key = share_map_key(mapping, cloud_url)
+        if mapping.get(map_key, {}).get("path"):
+            assigned_path = mapping[map_key]["path"]
             # 路径如果被手动删了，只是返回路径，后续负责创建
             return assigned_path
         
@@ -117,7 +338,7 @@ async def get_assigned_folder(cloud_url, suggested_name, root_dir):
         base_path = os.path.join(root_dir, suggested_name)
         final_path = base_path
         
-        used_paths = set(p.lower().replace('\\', '/') for p in mapping.values())
+        used_paths = set(e["path"].lower().replace('\\', '/') for e in mapping.values() if e.get("path"))
         
         counter = 1
         while True:
@@ -132,18 +353,64 @@ async def get_assigned_folder(cloud_url, suggested_name, root_dir):
             counter += 1
             
         # 4. 保存映射
-        mapping[map_key] = final_path
-        try:
-            with open(FOLDER_MAP_FILE, 'w', encoding='utf-8') as f:
-                json.dump(mapping, f, indent=2, ensure_ascii=False)
-        except: pass
+        entry = mapping.setdefault(map_key, {})
+        entry["path"] = final_path
+        entry.setdefault("url", cloud_url)  # 原始链接，按重下队列补下时用它打开
+        save_folder_map(mapping)
         
         return final_path
 
+async def get_share_password(cloud_url):
+    """上次可用的提取码；NO_PASSWORD 表示无需密码，None 表示未知"""
+    async with folder_map_lock:
+        mapping = load_folder_map()
+        return mapping.get(share_map_key(mapping, cloud_url), {}).get("pwd")
+
+async def remember_share_password(cloud_url, pwd):
+    """登录成功后记下可用的提取码 (pwd 为 None 表示登录失败，不记录)"""
+    if pwd is None:
+        return
+    async with folder_map_lock:
+        mapping = load_folder_map()
+        entry = mapping.setdefault(share_map_key(mapping, cloud_url), {})
+        if entry.get("pwd") != pwd:
+            entry["pwd"] = pwd
+            save_folder_map(mapping)
+
 # ================= Playwright Helpers (Async) =================
 
-async def attempt_cloud_login(page, password_candidates):
-    """尝试云盘登录"""
+# 云盘页就绪判断：出现密码框、打包按钮或文件链接 (或已是 404 页) 即视为就绪
+CLOUD_READY_JS = """
+() => {
+    if (document.title.includes("404") || (document.body && document.body.innerText.includes("页面不存在"))) return true;
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const pwd = document.querySelectorAll("input[type='password'], input[placeholder*='密码'], input[placeholder*='提取']");
+    if (Array.from(pwd).some(visible)) return true;
+    const exts = [".jpg", ".png", ".gif", ".zip", ".rar", ".7z", ".mp4"];
+    return Array.from(document.querySelectorAll("a[href], button")).some((el) => {
+        if (!visible(el)) return false;
+        const t = (el.innerText || "").trim().toLowerCase();
+        return /zip|打包|全部下载/.test(t) || exts.some((e) => t.endsWith(e));
+    });
+}
+"""
+
+async def wait_cloud_ready(page, timeout=CLOUD_READY_TIMEOUT):
+    """等待云盘页就绪 (条件满足立即返回，超时不报错，交给后续逻辑判断)"""
+    try:
+        await page.wait_for_function(CLOUD_READY_JS, timeout=timeout)
+        return True
+    except:
+        return False
+
+async def attempt_cloud_login(page, password_candidates, known_pwd=None):
+    """
+    尝试云盘登录 (候选码按优先级排列，与该链接配对的码在最前)。
+    known_pwd 为上次记下的提取码 / NO_PASSWORD。返回可用的提取码，无需密码返回 NO_PASSWORD，失败返回 None。
+    """
+    if known_pwd:
+        password_candidates = [known_pwd] + [c for c in password_candidates if c != known_pwd]
+
     input_selectors = ["input[type='password']", "input[placeholder*='密码']", "input[placeholder*='提取']"]
     confirm_selectors = ["button:has-text('确认')", "button:has-text('确定')", "button:has-text('进入')"]
 
@@ -154,10 +421,13 @@ async def attempt_cloud_login(page, password_candidates):
             break
             
     if not found_input:
-        return None  # 无需密码
+        return NO_PASSWORD  # 无需密码
 
+    if known_pwd == NO_PASSWORD:
+        # 上次记为无需密码，分享后来加了密码：改用候选码，成功后覆盖记录
+        print("      [Login] 原记录无需密码，但出现了密码框，改用候选码尝试")
     print(f"      [Login] 发现密码框，开始尝试...")
-    for pwd in password_candidates:
+    for attempt, pwd in enumerate(password_candidates, 1):
         try:
             await page.fill(found_input, pwd)
             clicked = False
@@ -169,9 +439,14 @@ async def attempt_cloud_login(page, password_candidates):
             if not clicked:
                 await page.press(found_input, "Enter")
             
-            await asyncio.sleep(1.5)
-            if not await page.locator(found_input).is_visible():
-                return pwd
+            # 密码框消失即登录成功，超时视为密码错误
+            try:
+                await page.locator(found_input).first.wait_for(state="hidden", timeout=LOGIN_WAIT_TIMEOUT)
+            except:
+                continue
+            print(f"      [Login] 第 {attempt} 次尝试成功")
+            await wait_cloud_ready(page)
+            return pwd
         except:
             pass
     return None
@@ -199,12 +474,66 @@ async def determine_local_folder(page, url):
             
     return sanitize_filename(folder_name)
 
+# 直连下载共用的 keep-alive 连接池 (请求同样经过共享限频器)，每个 host 的连接数与全局下载上限一致
+DOWNLOAD_CLIENT = HttpClient(max_per_host=GLOBAL_MAX_DOWNLOADS, timeout=60, limiter=limiter)
+# 内容寻址去重存储，哈希在后台线程池里做，不阻塞下载
+DEDUP_STORE = DedupStore(os.path.join(DOWNLOAD_ROOT, ".blobs")) if DEDUP_ENABLED else None
+# 校验清单在后台线程里增量更新；zzz_verify.py --requeue 写入的重下队列在启动时先处理
+CHECKSUM_WRITER = ChecksumWriter() if CHECKSUM_MANIFEST else None
+REDOWNLOAD_QUEUE_FILE = os.path.join(DATA_DIR, REDOWNLOAD_QUEUE_NAME)
+# 同一分享链接 (按规范化 URL) 同时只由一个任务下载，其余任务等待并复用结果
+CLOUD_FLIGHTS = SingleFlight("云盘链接")
+
+async def share_request_headers(page):
+    """直连请求头：浏览器会话的 Cookie + UA，Referer 为分享页"""
+    cookies = await page.context.cookies()
+    return share_headers(cookies, page.url, await page.evaluate("navigator.userAgent"))
+
+async def collect_share_files(page):
+    """直连模式：收集已解锁分享页上的文件 ([{name, url}]) 及请求头"""
+    found = await page.evaluate(COLLECT_SHARE_FILES_JS, list(VALID_EXTS))
+    files = [{"name": sanitize_filename(f["name"]), "url": f["url"]} for f in found]
+    return files, await share_request_headers(page)
+
+async def share_manifest(page):
+    """清单：已解锁分享页上的文件 ([{name, url, size}]) 及请求头，直连模式下补全远程大小；失败返回 ([], None)"""
+    try:
+        files, headers = await collect_share_files(page)
+    except Exception as e:
+        print(f"      [Manifest] 列出文件失败: {e}")
+        return [], None
+    if files and DOWNLOAD_MODE == "http":
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, fetch_remote_sizes, DOWNLOAD_CLIENT, files, headers, SHARE_DOWNLOAD_PARALLEL)
+    return files, headers
+
+async def direct_zip_url(page, btn):
+    """打包按钮是真实下载地址的 <a href> 时返回绝对地址，否则返回 None (只能点击后由浏览器下载)"""
+    try:
+        href = await btn.get_attribute("href")
+    except:
+        return None
+    url = urljoin(page.url, href) if href else ""
+    return url if url.startswith(("http://", "https://")) else None
+
 async def download_content(page, local_dir):
     """核心下载逻辑：优先ZIP，降级逐个文件"""
     downloaded_files = []
     mode = "failed"
     
-    # 1. 尝试 ZIP
+    # 0. 清单比对：列出分享里的文件及大小，与本地文件夹比较；已完整则整个跳过，只缺部分时只补缺的文件
+    files, headers = await share_manifest(page)
+    complete = []
+    if files:
+        missing, complete = diff_manifest(files, local_dir)
+        if not missing:
+            print(f"      [Manifest] 本地已完整 ({len(complete)} 个文件)，跳过下载")
+            return "up_to_date", complete
+        if complete:
+            print(f"      [Manifest] 本地已有 {len(complete)}/{len(files)} 个文件，只补下缺少的 {len(missing)} 个")
+        files = missing
+    
+    # 1. 尝试 ZIP (本地已有部分文件时不再整包下载)
     zip_btns = await page.locator("button, a").filter(has_text=re.compile("ZIP|打包|全部下载", re.IGNORECASE)).all()
     target_btn = None
     for btn in zip_btns:
@@ -212,23 +541,52 @@ async def download_content(page, local_dir):
             target_btn = btn
             break
             
-    if target_btn:
+    if target_btn and not complete:
         print(f"      [ZIP] 发现打包下载按钮，尝试下载...")
         try:
-            async with page.expect_download(timeout=60000) as download_info:
-                await target_btn.click()
-            
-            download = await download_info.value
-            safe_name = sanitize_filename(download.suggested_filename)
+            remote = None
+            zip_url = await direct_zip_url(page, target_btn) if DOWNLOAD_MODE == "http" else None
+            if zip_url:
+                # 直连流式下载 (阻塞 IO 放到线程池)；远程 ZIP 与上次解压的一致且成员都在时不再下载
+                headers = await share_request_headers(page)
+                loop = asyncio.get_running_loop()
+                try:
+                    remote = await loop.run_in_executor(None, remote_stamp, DOWNLOAD_CLIENT, zip_url, headers)
+                except Exception:
+                    remote = None
+                members = zip_unchanged(local_dir, remote=remote) if remote else None
+                if members:
+                    print(f"      [ZIP] 远程 ZIP 未变化，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                safe_name, _ = await loop.run_in_executor(None, download_to_dir, DOWNLOAD_CLIENT, zip_url, local_dir, headers, sanitize_filename)
+            else:
+                await throttle_async(page.url)
+                async with page.expect_download(timeout=60000) as download_info:
+                    await target_btn.click()
+                
+                download = await download_info.value
+                safe_name = sanitize_filename(download.suggested_filename)
+                # 浏览器下载拿不到大小，按文件名与解压出的成员判断
+                members = zip_unchanged(local_dir, name=safe_name)
+                if members:
+                    await download.cancel()
+                    print(f"      [ZIP] {safe_name} 上次已解压，本地已有全部 {len(members)} 个成员，跳过下载")
+                    return "up_to_date", members
+                if os.path.exists(os.path.join(local_dir, safe_name)):
+                    # 上次已下载 (未解压或不是 ZIP)，不再重复下载
+                    await download.cancel()
+                    print(f"      [Skip] 文件已存在: {safe_name}")
+                else:
+                    await download.save_as(os.path.join(local_dir, safe_name))
             save_path = os.path.join(local_dir, safe_name)
-            await download.save_as(save_path)
             
-            # 解压处理 (ZipFile is locking, run in executor if very large, but ok here)
+            # 解压处理 (逐个成员增量解压，放到线程池里避免阻塞 Loop)
             if zipfile.is_zipfile(save_path):
                 try:
-                    with zipfile.ZipFile(save_path, 'r') as zf:
-                        zf.extractall(local_dir)
-                        downloaded_files.extend(zf.namelist())
+                    loop = asyncio.get_running_loop()
+                    names, _ = await loop.run_in_executor(None, extract_zip, save_path, local_dir)
+                    downloaded_files.extend(names)
+                    save_zip_stamp(save_path, local_dir, remote) # 删除前记下 ZIP 的大小 / ETag 与成员，重跑时据此跳过
                     os.remove(save_path) # 删除原 ZIP
                     mode = "zip_extracted"
                 except Exception as e:
@@ -245,6 +603,16 @@ async def download_content(page, local_dir):
     # 2. 降级：逐个文件
     print("      [Fallback] 尝试逐个文件下载...")
     valid_exts = ('.jpg', '.png', '.gif', '.zip', '.rar', '.7z', '.mp4')
+    if DOWNLOAD_MODE == "http":
+        # 文件链接在清单阶段已收集 (只剩本地缺少的)
+        if files:
+            print(f"      [HTTP] 直连下载 {len(files)} 个文件...")
+            loop = asyncio.get_running_loop()
+            downloaded, failed = await loop.run_in_executor(None, download_share_files, DOWNLOAD_CLIENT, files, local_dir, headers, SHARE_DOWNLOAD_PARALLEL)
+            if not failed:
+                return "http_files", complete + downloaded
+            # 已下载的文件在下面的循环里会按 "已存在" 跳过
+            print(f"      [HTTP] {len(failed)} 个文件直连失败，交给浏览器补下...")
     try:
         links = await page.locator("a[href]").all()
         file_links = []
@@ -262,7 +630,7 @@ async def download_content(page, local_dir):
             safe_fname = sanitize_filename(fname)
             
             # 检查文件是否已存在 (去重)
-            if os.path.exists(os.path.join(local_dir, safe_fname)):
+            if safe_fname in complete or os.path.exists(os.path.join(local_dir, safe_fname)):
                 print(f"      [Skip] 文件已存在: {safe_fname}")
                 downloaded_files.append(safe_fname)
                 continue
@@ -270,16 +638,16 @@ async def download_content(page, local_dir):
             # 重试逻辑
             for attempt in range(2):
                 try:
+                    await throttle_async(page.url)
                     async with page.expect_download(timeout=15000) as di:
                         await link.click(timeout=3000)
                     dl = await di.value
                     sname = sanitize_filename(dl.suggested_filename) or safe_fname
                     await dl.save_as(os.path.join(local_dir, sname))
                     downloaded_files.append(sname)
-                    await asyncio.sleep(0.5)
                     break
                 except:
-                    if attempt == 0: await asyncio.sleep(1)
+                    pass
         
         if downloaded_files:
             mode = "individual_files"
@@ -288,66 +656,135 @@ async def download_content(page, local_dir):
         
     return mode, downloaded_files
 
-def extract_cloud_info_from_text(text):
-    """从文本中提取云盘链接和密码"""
-    pan_domains = [
-        r"pan\.baidu\.com/s/[\w-]+", 
-        r"yun\.baidu\.com/s/[\w-]+",
-        r"aliyundrive\.com/s/[\w-]+",
-        r"alipan\.com/s/[\w-]+",
-        r"cloud\.189\.cn/t/[\w-]+",
-        r"lanzou\w?\.com/[\w]+",
-        r"quark\.cn/s/[\w-]+",
-        r"123pan\.com/s/[\w-]+"
-    ]
+# ================= 任务处理器 =================
+
+# 米游社 soft 404 / 风控页特征 (HTTP 200 但内容是错误页)
+SOFT_404_KEYWORDS = ["页面丢失", "帖子不存在", "文章不存在", "系统繁忙", "偏离了地球", "404 Not Found", "该内容已被隐藏"]
+
+async def is_soft_404_page(page):
+    try:
+        page_title = await page.title()
+        page_text_start = (await page.inner_text("body"))[:500]
+    except Exception:
+        return False
+    return any(k in page_title or k in page_text_start for k in SOFT_404_KEYWORDS)
+
+async def download_share(context, worker_page, browser_ref, link, codes, paired, title):
+    """
+    打开分享 (优先模拟点击)、登录并下载到映射的文件夹，返回 (local_path, mode, files, failed_codes)。
+    failed_codes: 登录成功为 None，失败时为试过的提取码列表
+    """
+    cloud_page = None
+    try:
+        # 模拟点击 / 新标签页打开
+        # 尝试寻找元素
+        try:
+            link_locator = worker_page.locator(f"a[href*='{link}']").first
+            if (await link_locator.count()) > 0 and (await link_locator.is_visible()):
+                print("      [Action] 模拟点击进入 (新标签页)...")
+                await throttle_async(link)
+                async with context.expect_page(timeout=10000) as new_page_info:
+                    await worker_page.keyboard.down("Control")
+                    await link_locator.click()
+                    await worker_page.keyboard.up("Control")
+                cloud_page = await new_page_info.value
+                await cloud_page.wait_for_load_state("domcontentloaded")
+            else:
+                raise Exception("Element not found")
+        except Exception as e:
+            # 降级：直连
+            # print(f"      [Info] 元素查找失败: {e}, 转直连")
+            cloud_page = await context.new_page()
+            await throttle_async(link)
+            response = await cloud_page.goto(link, wait_until="domcontentloaded")
+            if response and response.status == 404:
+                await handle_fatal_error(browser_ref, link, "Cloud Disk Direct Access")
+
+        await wait_cloud_ready(cloud_page)
     
-    found_links = []
-    urls = re.findall(r"https?://[^\s\"')<>]+", text)
-    minas_links = [u for u in urls if "minas.mihoyo.com" in u]
-    other_links = []
-    for u in urls:
-        for domain_pat in pan_domains:
-            if re.search(domain_pat, u):
-                other_links.append(u)
-                break
+        # 404 Check
+        if "404" in (await cloud_page.title()) or "页面不存在" in (await cloud_page.inner_text("body")):
+            await handle_fatal_error(browser_ref, link, "Cloud Disk Page 404 Check")
+
+        # Login
+        known_pwd = await get_share_password(link)
+        candidates = order_candidates(link, codes, paired)
+        used_pwd = await attempt_cloud_login(cloud_page, candidates, known_pwd)
+        await remember_share_password(link, used_pwd)
+        failed_codes = None if used_pwd is not None else [c for c in [known_pwd] + candidates if c]
+
+        # Folder Name
+        folder_name = await determine_local_folder(cloud_page, link)
+    
+        # Get/Assign Local Path (Thread Safe)
+        local_path = await get_assigned_folder(link, folder_name, DOWNLOAD_ROOT)
+    
+        if not os.path.exists(local_path):
+            os.makedirs(local_path)
     
-    codes = []
-    code_patterns = [
-        r"(?:密码|提取码|访问码|口令)\s*[:：]\s*([A-Za-z0-9]{4,})",
-        r"(?:code)\s*[:：]\s*([A-Za-z0-9]{4,})"
-    ]
-    for pat in code_patterns:
-        found = re.findall(pat, text)
-        codes.extend(found)
+        print(f"    [Disk] 下载中: {local_path} FROM {title[:15]}")
+    
+        # Download
+        mode, files = await download_content(cloud_page, local_path)
+        if DEDUP_STORE and files:
+            DEDUP_STORE.submit_dir(local_path)
+        if CHECKSUM_WRITER and files:
+            CHECKSUM_WRITER.submit(local_path)
         
-    return list(set(minas_links + other_links)), list(set(codes))
+        # Cleanup
+        if not files:
+            try:
+                if not os.listdir(local_path):
+                    os.rmdir(local_path)
+            except: pass
+        return local_path, mode, files, failed_codes
+    finally:
+        if cloud_page:
+            try: await cloud_page.close()
+            except: pass
 
-# ================= 任务处理器 =================
+def retry_with_own_codes(codes):
+    """SingleFlight 的 retry：执行者登录失败，而本文有它没试过的提取码时，自己重新打开分享"""
+    return lambda share: share[3] is not None and bool(set(codes) - set(share[3]))
 
-async def process_article(context, browser_ref, article_url, title, semaphore):
-    """单个文章的处理逻辑，由 semaphore 控制并发"""
-    async with semaphore:
+async def process_article(context, browser_ref, article_url, title, concurrency):
+    """单个文章的处理逻辑，由自适应并发限制器 concurrency 控制并发，并把结果反馈给它；被限流 / soft 404 时返回 True (需重试)"""
+    async with concurrency.slot() as slot:
         print(f"  [Task] 开始处理: {title[:30]}...")
         worker_page = None
         try:
             worker_page = await context.new_page()
             
             # 访问详情页
+            await throttle_async(article_url)
             response = await worker_page.goto(article_url, wait_until="domcontentloaded", timeout=45000)
+            if response and response.status in (429, 503):
+                slot.outcome = classify_outcome(status_code=response.status)
+                print(f"    [Throttled] HTTP {response.status}，稍后重试: {title[:15]}...")
+                return True
             if response and response.status == 404:
                 await handle_fatal_error(browser_ref, article_url, f"Article Detail Page - Title: {title}")
 
             try:
                 await worker_page.wait_for_load_state("networkidle", timeout=3000)
             except: pass
+            # 错误提示由前端渲染，需等内容加载后再判断
+            if await is_soft_404_page(worker_page):
+                slot.outcome = classify_outcome(soft_404=True)
+                print(f"    [Soft 404] 页面内容异常，稍后重试: {title[:15]}...")
+                return True
             
             content_html = await worker_page.content()
             content_text = await worker_page.inner_text("body")
+            save_article_sample(ARTICLE_CORPUS_DIR, article_url, content_html)
             
             # 提取链接
-            links_html, _ = extract_cloud_info_from_text(content_html)
-            links_text, codes = extract_cloud_info_from_text(content_text)
-            all_cloud_links = list(set(links_html + links_text))
+            links_html, _, paired_html = extract_cloud_pairs(content_html, is_html=True)
+            links_text, codes, paired = extract_cloud_pairs(content_text)
+            # 纯文本里配不上码的链接，用 HTML (DOM 位置) 的配对补上
+            for key, code in paired_html.items():
+                paired.setdefault(key, code)
+            all_cloud_links = dedupe_links(links_html + links_text)
             
             if not all_cloud_links:
                 # print(f"    -> 无云盘链接: {title[:15]}...")
@@ -357,55 +794,13 @@ async def process_article(context, browser_ref, article_url, title, semaphore):
             
             for link in all_cloud_links:
                 print(f"    --> 处理链接: {link}")
-                cloud_page = None
-                created_dir_path = None
-                
                 try:
-                    # 模拟点击 / 新标签页打开
-                    # 尝试寻找元素
-                    try:
-                        link_locator = worker_page.locator(f"a[href*='{link}']").first
-                        if (await link_locator.count()) > 0 and (await link_locator.is_visible()):
-                            print("      [Action] 模拟点击进入 (新标签页)...")
-                            async with context.expect_page(timeout=10000) as new_page_info:
-                                await worker_page.keyboard.down("Control")
-                                await link_locator.click()
-                                await worker_page.keyboard.up("Control")
-                            cloud_page = await new_page_info.value
-                            await cloud_page.wait_for_load_state("domcontentloaded")
-                        else:
-                            raise Exception("Element not found")
-                    except Exception as e:
-                        # 降级：直连
-                        # print(f"      [Info] 元素查找失败: {e}, 转直连")
-                        cloud_page = await context.new_page()
-                        response = await cloud_page.goto(link, wait_until="domcontentloaded")
-                        if response and response.status == 404:
-                            await handle_fatal_error(browser_ref, link, "Cloud Disk Direct Access")
-
-                    await asyncio.sleep(1)
-                    
-                    # 404 Check
-                    if "404" in (await cloud_page.title()) or "页面不存在" in (await cloud_page.inner_text("body")):
-                        await handle_fatal_error(browser_ref, link, "Cloud Disk Page 404 Check")
-
-                    # Login
-                    await attempt_cloud_login(cloud_page, codes)
-
-                    # Folder Name
-                    folder_name = await determine_local_folder(cloud_page, link)
-                    
-                    # Get/Assign Local Path (Thread Safe)
-                    local_path = await get_assigned_folder(link, folder_name, DOWNLOAD_ROOT)
-                    
-                    if not os.path.exists(local_path):
-                        os.makedirs(local_path)
-                    created_dir_path = local_path
-                    
-                    print(f"    [Disk] 下载中: {local_path} FROM {title[:15]}")
-                    
-                    # Download
-                    mode, files = await download_content(cloud_page, local_path)
+                    # 同一分享正被其他文章下载时不再重复打开，等待并复用其结果
+                    (local_path, mode, files, _), shared = await CLOUD_FLIGHTS.run(
+                        canonical_cloud_url(link), download_share, context, worker_page, browser_ref, link, codes, paired, title,
+                        retry=retry_with_own_codes(codes))
+                    if shared:
+                        print(f"    [SingleFlight] {link} 正由其他任务下载，复用其结果")
                     
                     # Save Record
                     record = {
@@ -418,28 +813,62 @@ async def process_article(context, browser_ref, article_url, title, semaphore):
                         "time": time.strftime("%Y-%m-%d %H:%M:%S")
                     }
                     await save_record(record)
-                    
-                    # Cleanup
-                    if not files and created_dir_path:
-                        try:
-                            if not os.listdir(created_dir_path):
-                                os.rmdir(created_dir_path)
-                        except: pass
-                        
                 except Exception as e:
                     print(f"    [Disk Error] {e} @ {link}")
-                finally:
-                    if cloud_page:
-                        try: await cloud_page.close()
-                        except: pass
 
         except Exception as e:
+            slot.outcome = classify_outcome(error=e)
             print(f"    [Post Error] {title} 处理失败: {e}")
         finally:
             if worker_page:
                 try: await worker_page.close()
                 except: pass
 
+async def article_worker(queue, context, browser_ref, concurrency, retry_items):
+    """消费者：从队列取文章处理，收到 None 时退出；被限流 / soft 404 的文章记入 retry_items"""
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                return
+            url, title = item
+            if await process_article(context, browser_ref, url, title, concurrency):
+                retry_items.append(item)
+        finally:
+            queue.task_done()
+
+async def process_redownload_queue(context):
+    """启动时先补下 zzz_verify.py --requeue 记录的损坏 / 缺失文件 (用记住的提取码直接打开分享)"""
+    queue = load_redownload_queue(REDOWNLOAD_QUEUE_FILE)
+    if not queue:
+        return
+    print(f"--> [Requeue] 重下队列中有 {len(queue)} 个分享")
+    page = await context.new_page()
+    remaining = []
+    for item in queue:
+        link, local_path = item["url"], item["path"]
+        try:
+            await throttle_async(link)
+            await page.goto(link, wait_until="domcontentloaded", timeout=45000)
+            await wait_cloud_ready(page)
+            candidates = [item["pwd"]] if item.get("pwd") else []
+            if await attempt_cloud_login(page, candidates, await get_share_password(link)) is None:
+                raise Exception("提取码已失效")
+            os.makedirs(local_path, exist_ok=True)
+            mode, files = await download_content(page, local_path)
+            print(f"    -> [Requeue] {local_path}: {mode}, {len(files)} 个文件")
+            if mode in ("failed", "no_files_found"):
+                raise Exception(mode)
+            if DEDUP_STORE:
+                DEDUP_STORE.submit_dir(local_path)
+            if CHECKSUM_WRITER:
+                CHECKSUM_WRITER.submit(local_path)
+        except Exception as e:
+            print(f"    -> [Requeue Warn] {link}: {e}")
+            remaining.append(item)
+    await page.close()
+    save_redownload_queue(REDOWNLOAD_QUEUE_FILE, remaining)
+
 async def run_spider_async():
     ensure_dirs()
     
@@ -451,79 +880,119 @@ async def run_spider_async():
             viewport={'width': 1280, 'height': 800},
             accept_downloads=True
         )
+        await process_redownload_queue(context)
         
         page = await context.new_page()
         
-        # === 阶段 1: 采集列表 (单线程) ===
+        # === 流水线: 滚动采集 (生产者) 与详情处理 (消费者) 同时进行 ===
+        # 有界队列：消费者处理不过来时 put 会阻塞，滚动随之暂停
+        # 协程数按上限启动，实际同时处理的数量由自适应限制器决定
+        queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
+        retry_items = []
+        concurrency = AdaptiveLimiter(CONCURRENCY_LIMIT, CONCURRENCY_MIN, CONCURRENCY_MAX, name="文章并发")
+        workers = [
+            asyncio.create_task(article_worker(queue, context, browser, concurrency, retry_items))
+            for _ in range(CONCURRENCY_MAX)
+        ]
+        print(f"--> 已启动 {CONCURRENCY_MAX} 个处理协程 (初始并发: {CONCURRENCY_LIMIT}, 队列上限: {QUEUE_MAX_SIZE})")
+        
+        # 接口捕获需在打开页面前挂上监听，首屏数据也能拿到
+        feed_capture = FeedCapture()
+        if FEED_CAPTURE_MODE == "network":
+            feed_capture.attach(page)
+        
         print(f"--> 打开页面: {TARGET_URL}")
+        await throttle_async(TARGET_URL)
         response = await page.goto(TARGET_URL, wait_until="domcontentloaded")
         if response and response.status == 404:
             await handle_fatal_error(browser, TARGET_URL, "Main Feed Page")
         await asyncio.sleep(3)
         
-        print("--> 开始滚动采集列表...")
-        last_item_count = 0
+        print("--> 开始滚动采集列表 (边滚动边处理)...")
         no_change_counter = 0
-        collected_links = set()
+        collected_urls = set()
+        queued_count = 0
         
         for i in range(MAX_SCROLL_ATTEMPTS):
-            elements = await page.locator("a[href*='/article/']").all()
+            new_items = []
+            # 接口捕获的结果优先 (标题更准确)，页内链接收割兜底
+            # is_last 须在 drain 之前读取：入队等待期间才到达的最后一页留到下一轮取出后再停止
+            reached_last = feed_capture.is_last
+            for full_url, title in feed_capture.drain() + await harvest_new_articles(page):
+                if full_url not in collected_urls:
+                    collected_urls.add(full_url)
+                    new_items.append((full_url, title))
             
-            current_batch = set()
-            for el in elements:
-                try:
-                    href = await el.get_attribute("href")
-                    title = (await el.inner_text()).replace('\n', ' ').strip()
-                    if href:
-                        full_url = urljoin(TARGET_URL, href)
-                        if "/article/" in full_url:
-                            current_batch.add((full_url, title))
-                except: continue
-                
-            for item in current_batch:
-                collected_links.add(item)
+            reached_limit = False
+            for item in new_items:
+                if MAX_PROCESS_LIMIT and queued_count >= MAX_PROCESS_LIMIT:
+                    reached_limit = True
+                    break
+                await queue.put(item)
+                queued_count += 1
                 
-            current_count = len(collected_links)
-            print(f"    [Scroll {i+1}] 当前捕获文章数: {current_count}")
+            print(f"    [Scroll {i+1}] 当前捕获文章数: {len(collected_urls)} | 本次新增: {len(new_items)} | 队列积压: {queue.qsize()} | 并发上限: {concurrency.limit}")
             
-            if current_count > last_item_count:
-                last_item_count = current_count
+            if reached_limit:
+                print("    -> 已达到最大处理限制，停止滚动。")
+                break
+            
+            if new_items:
                 no_change_counter = 0
             else:
                 no_change_counter += 1
                 
-            if no_change_counter >= NO_NEW_DATA_LIMIT:
+            if reached_last:
+                print("    -> 信息流接口返回 is_last，已到底，停止滚动。")
+                break
+            if no_change_counter >= NO_NEW_DATA_LIMIT and not feed_capture.pending:
                 print("    -> 连续多次未发现新文章，停止滚动。")
                 break
             
+            # Prune & Memory
+            if PRUNE_HARVESTED_CARDS:
+                await prune_harvested_cards(page)
+            if MEMORY_REPORT_INTERVAL and (i + 1) % MEMORY_REPORT_INTERVAL == 0:
+                await report_page_memory(page, i + 1)
+            
             # Scroll
+            await throttle_async(TARGET_URL)
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
             try:
                 await asyncio.sleep(SCROLL_PAUSE_TIME)
             except: pass
             
-        print(f"--> 列表采集完成，共 {len(collected_links)} 篇文章。")
+        print(f"--> 列表采集完成，共 {len(collected_urls)} 篇文章，等待剩余任务处理...")
         await page.close() # 关闭列表页，释放资源
         
-        # === 阶段 2: 多线程/多协程 处理 ===
-        print(f"--> 开始并发处理任务 (并发数: {CONCURRENCY_LIMIT})...")
-        
-        semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-        tasks = []
+        # 被限流 / soft 404 的文章等队列处理完后重新入队，有限轮数
+        await queue.join()
+        for round_no in range(1, ARTICLE_RETRY_ROUNDS + 1):
+            if not retry_items:
+                break
+            items = list(retry_items)
+            retry_items.clear()
+            print(f"--> [Retry] 第 {round_no} 轮: {ARTICLE_RETRY_DELAY}s 后重新处理 {len(items)} 篇被限流 / soft 404 的文章")
+            await asyncio.sleep(ARTICLE_RETRY_DELAY)
+            for item in items:
+                await queue.put(item)
+            await queue.join()
+        if retry_items:
+            print(f"--> [Retry] 仍有 {len(retry_items)} 篇文章失败，已放弃: " + ", ".join(url for url, _ in retry_items[:5]))
         
-        # 转换为列表以便切片限制
-        all_items = list(collected_links)
-        if MAX_PROCESS_LIMIT and MAX_PROCESS_LIMIT < len(all_items):
-            all_items = all_items[:MAX_PROCESS_LIMIT]
-            
-        for idx, (url, title) in enumerate(all_items):
-             task = asyncio.create_task(process_article(context, browser, url, title, semaphore))
-             tasks.append(task)
-             
-        # 等待所有任务
-        if tasks:
-            await asyncio.gather(*tasks)
+        # 通知消费者退出，并等待队列清空
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        print(f"--> [Metrics] {concurrency.summary()}")
+        print(f"--> [Metrics] {CLOUD_FLIGHTS.summary()}")
             
+        if DEDUP_STORE:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, DEDUP_STORE.close)
+        if CHECKSUM_WRITER:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, CHECKSUM_WRITER.close)
         print(f"--> 全部完成，结果已保存至: {OUTPUT_FILE}")
         await browser.close()
 
@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# ================= 校验清单与完整性校验 =================
+# 下载时：每个分享文件夹写一份 .checksums.json，记录各文件 (相对路径) 的大小、修改时间与 SHA-256，
+#         由 ChecksumWriter 在后台线程里增量更新 (大小与修改时间没变的文件不重新哈希)。
+# 校验时：python zzz_verify.py <下载根目录> [--workers N] [--requeue <folder_map.json>]
+#         扫描根目录下所有清单，多进程 (默认每个 CPU 核一个) 以 mmap 方式重新哈希，
+#         报告缺失 / 截断 / 损坏的文件；--requeue 时删除坏文件并把所在分享写入重下队列，
+#         爬虫下次启动时先按队列补下 (见各爬虫的 process_redownload_queue)。
+#         去重存储 (zzz_dedup) 里与坏文件是同一个 inode 的 blob 一并删除，否则补下的文件入库时会被链接回坏 blob。
+
+MANIFEST_NAME = ".checksums.json"
+REDOWNLOAD_QUEUE_NAME = "redownload_queue.json"  # 与 folder_map.json 放在同一目录
+BLOB_DIR_NAME = ".blobs"  # 去重存储默认位置：下载根目录下 (见 zzz_dedup)
+SKIP_SUFFIXES = (".part", ".part.json", ".unzip", ".dedup", ".zip_source.json", MANIFEST_NAME, MANIFEST_NAME + ".tmp")
+
+STATUS_OK = "ok"
+STATUS_MISSING = "missing"
+STATUS_TRUNCATED = "truncated"  # 比清单记录的短 (下载中断后被当成完整文件)
+STATUS_CORRUPT = "corrupt"      # 大小不符 (变长) 或哈希不符
+
+
+def mmap_sha256(path):
+    """以内存映射方式读取文件计算 SHA-256 (大文件不经过 Python 层的逐块读取)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return h.hexdigest()  # 空文件不能 mmap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            h.update(mm)
+    return h.hexdigest()
+
+
+def manifest_path(local_dir):
+    return os.path.join(local_dir, MANIFEST_NAME)
+
+
+def load_manifest(local_dir):
+    try:
+        with open(manifest_path(local_dir), "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(local_dir, files):
+    path = manifest_path(local_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "files": files}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def write_manifest(local_dir):
+    """增量更新文件夹的校验清单，返回本次重新哈希的文件数"""
+    old = load_manifest(local_dir)
+    files = {}
+    hashed = 0
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            if name.endswith(SKIP_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, local_dir).replace("\\", "/")
+            st = os.stat(path)
+            entry = old.get(rel)
+            if entry and entry.get("size") == st.st_size and entry.get("mtime") == int(st.st_mtime):
+                files[rel] = entry
+                continue
+            files[rel] = {"size": st.st_size, "mtime": int(st.st_mtime), "sha256": mmap_sha256(path)}
+            hashed += 1
+    # 已记录但本地没有的文件保留在清单里，校验时报告为缺失
+    for rel, entry in old.items():
+        files.setdefault(rel, entry)
+    save_manifest(local_dir, files)
+    return hashed
+
+
+class ChecksumWriter:
+    """
+    下载完成后在后台写校验清单，不阻塞下载：
+        writer.submit(local_dir)
+        writer.close()
+    """
+    def __init__(self, workers=1):
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self.folders = 0
+        self.hashed = 0
+
+    def submit(self, local_dir):
+        self._pool.submit(self._write, local_dir)
+
+    def _write(self, local_dir):
+        try:
+            self.hashed += write_manifest(local_dir)
+            self.folders += 1
+        except Exception as e:
+            print(f"      [Checksum Warn] {local_dir}: {e}")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        print(f"--> [Checksum] 更新清单 {self.folders} 个文件夹, 新哈希 {self.hashed} 个文件")
+
+
+def _verify_file(job):
+    """子进程中执行：返回 (状态, 路径, 实际大小, 读取字节数)"""
+    path, size, digest = job
+    try:
+        actual = os.path.getsize(path)
+    except OSError:
+        return STATUS_MISSING, path, None, 0
+    if actual < size:
+        return STATUS_TRUNCATED, path, actual, 0
+    if actual > size:
+        return STATUS_CORRUPT, path, actual, 0
+    try:
+        ok = mmap_sha256(path) == digest
+    except OSError:
+        return STATUS_MISSING, path, None, 0
+    return (STATUS_OK if ok else STATUS_CORRUPT), path, actual, actual
+
+
+def collect_jobs(root_dir):
+    """扫描根目录下的所有清单，返回 ([(路径, 大小, 哈希)], {路径: 所在分享文件夹})"""
+    jobs = []
+    owners = {}
+    for root, _, names in os.walk(root_dir):
+        if MANIFEST_NAME not in names:
+            continue
+        for rel, entry in load_manifest(root).items():
+            path = os.path.join(root, *rel.split("/"))
+            jobs.append((path, entry["size"], entry["sha256"]))
+            owners[path] = root
+    # 大文件先发，避免最后剩一个大文件拖时间
+    jobs.sort(key=lambda j: -j[1])
+    return jobs, owners
+
+
+def verify_tree(root_dir, workers=None):
+    """并行校验整个下载目录，返回 ({状态: [路径]}, {路径: 所在分享文件夹})"""
+    jobs, owners = collect_jobs(root_dir)
+    total_bytes = sum(j[1] for j in jobs)
+    print(f"[Verify] {root_dir}: {len(set(owners.values()))} 个分享文件夹, {len(jobs)} 个文件, {total_bytes / 1024 ** 3:.2f} GB")
+    results = {STATUS_OK: [], STATUS_MISSING: [], STATUS_TRUNCATED: [], STATUS_CORRUPT: []}
+    started = time.monotonic()
+    read_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for i, (status, path, actual, nbytes) in enumerate(pool.map(_verify_file, jobs, chunksize=16), 1):
+            results[status].append(path)
+            read_bytes += nbytes
+            if status != STATUS_OK:
+                print(f"  [{status}] {path}" + (f" (实际 {actual} 字节)" if actual is not None else ""))
+            if i % 1000 == 0:
+                elapsed = time.monotonic() - started
+                print(f"  ... {i}/{len(jobs)} | {read_bytes / 1024 ** 3:.2f} GB | {read_bytes / 1048576 / max(elapsed, 1e-6):.0f} MB/s")
+    elapsed = time.monotonic() - started
+    print(f"[Verify] 完成: 正常 {len(results[STATUS_OK])} | 缺失 {len(results[STATUS_MISSING])} | "
+          f"截断 {len(results[STATUS_TRUNCATED])} | 损坏 {len(results[STATUS_CORRUPT])} | "
+          f"{elapsed:.1f}s, {read_bytes / 1048576 / max(elapsed, 1e-6):.0f} MB/s")
+    return results, owners
+
+
+def load_redownload_queue(queue_file):
+    try:
+        with open(queue_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_redownload_queue(queue_file, queue):
+    if not queue:
+        try: os.remove(queue_file)
+        except OSError: pass
+        return
+    with open(queue_file, "w", encoding="utf-8") as f:
+        json.dump(queue, f, indent=2, ensure_ascii=False)
+
+
+def drop_shared_blob(path, folder, store_dir):
+    """坏文件是去重存储里某个 blob 的硬链接时删除该 blob (blob 同样已损坏)，返回是否删除"""
+    rel = os.path.relpath(path, folder).replace("\\", "/")
+    digest = load_manifest(folder).get(rel, {}).get("sha256")
+    if not digest or not store_dir:
+        return False
+    blob = os.path.join(store_dir, digest[:2], digest)
+    try:
+        if not os.path.samefile(path, blob):
+            return False
+        os.remove(blob)
+    except OSError:
+        return False
+    print(f"  [Requeue] 删除已损坏的去重 blob: {blob}")
+    return True
+
+
+def requeue_bad_files(results, owners, folder_map_file, store_dir=None):
+    """删除截断 / 损坏的文件 (及其共享的去重 blob)，并把所在分享 (按 folder_map.json 反查云盘链接) 写入重下队列"""
+    try:
+        with open(folder_map_file, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Verify Error] 无法读取 {folder_map_file}: {e}")
+        return 0
+    by_path = {}
+    for url, entry in mapping.items():
+        if not isinstance(entry, dict):
+            entry = {"path": entry}
+        if entry.get("path"):
+            # key 是规范化链接，打开分享用原始链接 (保留查询参数 / 子路径)
+            by_path[os.path.normcase(os.path.abspath(entry["path"]))] = (entry.get("url") or url, entry.get("pwd"), entry["path"])
+
+    bad = {}
+    for status in (STATUS_MISSING, STATUS_TRUNCATED, STATUS_CORRUPT):
+        for path in results[status]:
+            folder = owners[path]
+            if status != STATUS_MISSING:
+                drop_shared_blob(path, folder, store_dir)
+                try: os.remove(path)
+                except OSError: pass
+            bad.setdefault(folder, []).append(os.path.relpath(path, folder).replace("\\", "/"))
+
+    queue_file = os.path.join(os.path.dirname(folder_map_file), REDOWNLOAD_QUEUE_NAME)
+    queue = {item["url"]: item for item in load_redownload_queue(queue_file)}
+    for folder, files in bad.items():
+        found = by_path.get(os.path.normcase(os.path.abspath(folder)))
+        if not found:
+            print(f"  [Requeue Warn] folder_map 中找不到对应链接: {folder}")
+            continue
+        url, pwd, path = found
+        # 路径沿用 folder_map 里的写法，爬虫补下时与映射一致
+        item = queue.setdefault(url, {"url": url, "path": path, "pwd": pwd, "files": []})
+        item["files"] = sorted(set(item["files"]) | set(files))
+    save_redownload_queue(queue_file, list(queue.values()))
+    print(f"[Verify] 已加入重下队列: {len(queue)} 个分享 -> {queue_file}")
+    return len(queue)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按 .checksums.json 并行校验下载目录")
+    parser.add_argument("root", help="下载根目录 (DOWNLOAD_ROOT)")
+    parser.add_argument("--workers", type=int, default=None, help="校验进程数，默认 CPU 核数")
+    parser.add_argument("--requeue", metavar="FOLDER_MAP", help="删除坏文件并按该 folder_map.json 写入重下队列")
+    parser.add_argument("--blobs", metavar="STORE_DIR", default=None,
+                        help=f"去重存储目录，--requeue 时一并删除损坏的 blob，默认 <root>/{BLOB_DIR_NAME}")
+    args = parser.parse_args()
+
+    results, owners = verify_tree(args.root, args.workers)
+    if args.requeue:
+        requeue_bad_files(results, owners, args.requeue, args.blobs or os.path.join(args.root, BLOB_DIR_NAME))
+    if len(results[STATUS_OK]) != len(owners):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()